@@ -6,81 +6,85 @@ It wraps the `container` command-line tool and exposes it through the MCP protoc
 Usage:
   python3 acms.py --port 8765              # HTTP server on port 8765
   python3 acms.py --ssl --port 8443        # HTTPS server with SSL on port 8443
+  python3 acms.py --transport stdio        # MCP over stdin/stdout for a single local client
 """
 
-from typing import Optional, List
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, Optional, List
+from contextlib import asynccontextmanager, contextmanager
+import importlib.util
 import argparse
 import logging
+import tempfile
 import asyncio
 import shutil
+import socket
+import atexit
+import stat
+import json
 import sys
 import os
 
-from fastmcp.server.auth.providers.azure import AzureProvider
-from dotenv import load_dotenv
-import uvicorn
-import fastmcp
+# fastmcp, uvicorn, the auth stack and the tools are imported where they are first
+# needed, so --help, argument errors and the --workers supervisor start without them
+if TYPE_CHECKING:
+    import fastmcp
+
+# Event loop and HTTP parser pairs selectable with --engine
+ENGINES = {
+    "uvloop": {"loop": "uvloop", "http": "httptools"},
+    "asyncio": {"loop": "asyncio", "http": "h11"},
+}
+
+# Serialized command line arguments handed from the supervisor to worker processes
+WORKER_ARGS_ENV = "ACMS_WORKER_ARGS"
+
+LOGGER_LEVELS = {
+    # Reduce noise from third-party libraries
+    "uvicorn": logging.INFO,
+    "uvicorn.access": logging.WARNING,
+    "uvicorn.error": logging.INFO,
+    "uvicorn.asgi": logging.WARNING,
+    "uvicorn.protocols": logging.WARNING,
+    "uvicorn.protocols.http": logging.WARNING,
+    "fastmcp": logging.INFO,
+    "mcp": logging.INFO,
+    "mcp.server.lowlevel.server": logging.WARNING,
+    "mcp.server.streamable_http": logging.WARNING,
+    "mcp.server.streamable_http_manager": logging.INFO,
+    "starlette": logging.WARNING,
+    "httpx": logging.WARNING,
+    "httpcore": logging.WARNING,
+    "asyncio": logging.WARNING,
+    "sse_starlette": logging.WARNING,
+    "sse_starlette.sse": logging.WARNING,
+}
 
-from tools.registry import registry
+logger = logging.getLogger("ACMS")
 
-# Load environment variables
-load_dotenv()
+# Mirrors tools._common.compression.DEFAULT_MINIMUM_SIZE; parse_arguments must not import the
+# tools package, whose modules read ACMS_* settings before setup_environment has loaded .env
+COMPRESSION_MIN_SIZE = 1024
 
-# Configure enhanced logging to stderr to avoid interfering with stdio communication
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - [PID:%(process)d] [%(funcName)s:%(lineno)d] - %(message)s",
-    stream=sys.stderr,
-    force=True,  # Ensure our config overrides any existing config
-)
-logger = logging.getLogger("ACMS")
 
-# Set up logging levels - reduce noise from third-party libraries
-logging.getLogger("uvicorn").setLevel(logging.INFO)
-logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
-logging.getLogger("uvicorn.error").setLevel(logging.INFO)
-logging.getLogger("uvicorn.asgi").setLevel(logging.WARNING)
-logging.getLogger("uvicorn.protocols").setLevel(logging.WARNING)
-logging.getLogger("uvicorn.protocols.http").setLevel(logging.WARNING)
-logging.getLogger("fastmcp").setLevel(logging.INFO)
-logging.getLogger("mcp").setLevel(logging.INFO)
-logging.getLogger("mcp.server.lowlevel.server").setLevel(logging.WARNING)
-logging.getLogger("mcp.server.streamable_http").setLevel(logging.WARNING)
-logging.getLogger("mcp.server.streamable_http_manager").setLevel(logging.INFO)
-logging.getLogger("starlette").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
-logging.getLogger("asyncio").setLevel(logging.WARNING)
-logging.getLogger("sse_starlette").setLevel(logging.WARNING)
-logging.getLogger("sse_starlette.sse").setLevel(logging.WARNING)
-
-# Force all loggers to use our stderr handler with consistent format
-for logger_name in [
-    "uvicorn",
-    "uvicorn.access",
-    "uvicorn.error",
-    "uvicorn.asgi",
-    "uvicorn.protocols",
-    "uvicorn.protocols.http",
-    "fastmcp",
-    "mcp",
-    "mcp.server.lowlevel.server",
-    "mcp.server.streamable_http",
-    "mcp.server.streamable_http_manager",
-    "starlette",
-    "sse_starlette",
-    "sse_starlette.sse",
-]:
-    specific_logger = logging.getLogger(logger_name)
-    specific_logger.handlers.clear()
-    stderr_handler = logging.StreamHandler(sys.stderr)
-    stderr_handler.setFormatter(
-        logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - [PID:%(process)d] - %(message)s"
-        )
-    )
-    specific_logger.addHandler(stderr_handler)
-    specific_logger.propagate = False
+def setup_environment() -> None:
+    """
+    Load .env and configure logging for a server process.
+
+    Runs before any tools module is imported, so ACMS_* settings from .env
+    apply to the module-level configuration read at import time.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    # Imported only now: importing the tools package reads ACMS_* settings
+    from tools._common.logging_setup import configure_logging
+
+    # fastmcp is imported after this point; stop it attaching its own non-propagating handlers
+    os.environ.setdefault("FASTMCP_LOG_ENABLED", "false")
+    # Route all logging to stderr through a background writer thread, so log writes never
+    # block the event loop and never interfere with stdio communication
+    configure_logging(LOGGER_LEVELS)
 
 
 def check_container_available() -> bool:
@@ -93,11 +97,26 @@ def check_container_available() -> bool:
     return available
 
 
+@asynccontextmanager
+async def server_lifespan(server: "fastmcp.FastMCP") -> AsyncIterator[Dict[str, Any]]:
+    """Run background services for as long as the server is up."""
+    from tools._common.disk_watcher import disk_watcher
+
+    if disk_watcher is not None:
+        disk_watcher.start()
+    try:
+        yield {}
+    finally:
+        if disk_watcher is not None:
+            await disk_watcher.stop()
+
+
 def create_fastmcp_server(
     enable_auth: bool = False,
     resource_server_url: Optional[str] = None,
     required_scopes: Optional[List[str]] = None,
-) -> fastmcp.FastMCP:
+    session_store: Optional[str] = None,
+) -> "fastmcp.FastMCP":
     """
     Create a FastMCP server with container tools.
 
@@ -105,11 +124,19 @@ def create_fastmcp_server(
         enable_auth: Enable OAuth 2.1 authentication with Microsoft Entra ID
         resource_server_url: URL of this MCP server
         required_scopes: List of OAuth scopes required for authentication
+        session_store: URL of a store shared by all instances for OAuth client
+            registrations and tokens (default: FastMCP's local disk store)
 
     Returns:
         FastMCP server instance with optional OAuth authentication
     """
 
+    import fastmcp
+
+    from tools._common.admin import register_admin_routes
+    from tools._common import tracing
+    from tools.registry import registry
+
     logger.info("Creating FastMCP server instance...")
 
     # Configure OAuth authentication if enabled
@@ -139,22 +166,30 @@ def create_fastmcp_server(
                 raise ValueError(
                     "At least one scope must be specified via ENTRA_REQUIRED_SCOPES or --required-scopes"
                 )
+            from tools._common.session_store import create_session_store
+            from tools._common.auth_cache import CachedAzureProvider
+
             logger.info(client_id)
-            # Create AzureProvider with configuration
-            auth_provider = AzureProvider(
+            # Create AzureProvider with token and JWKS caching
+            auth_provider = CachedAzureProvider(
                 client_id=client_id,
                 client_secret=client_secret,
                 tenant_id=tenant_id,
                 base_url=resource_server_url
                 or os.getenv("MCP_SERVER_BASE_URL", "http://localhost:8765"),
                 required_scopes=scopes_list,
+                client_storage=(
+                    create_session_store(session_store, encryption_secret=client_secret)
+                    if session_store
+                    else None
+                ),
             )
 
             logger.info(f"  Resource Server URL: {resource_server_url or 'http://localhost:8765'}")
             logger.info(f"  Required Scopes: {required_scopes or []}")
 
             # Create FastMCP with OAuth
-            mcp = fastmcp.FastMCP("ACMS", auth=auth_provider)
+            mcp = fastmcp.FastMCP("ACMS", auth=auth_provider, lifespan=server_lifespan)
 
             logger.info("FastMCP server created with OAuth authentication")
 
@@ -163,12 +198,36 @@ def create_fastmcp_server(
             logger.critical("Cannot start server without valid OAuth configuration. Exiting.")
             sys.exit(1)
     else:
-        mcp = fastmcp.FastMCP("ACMS")
+        mcp = fastmcp.FastMCP("ACMS", lifespan=server_lifespan)
+
+    # Trace every tool call when an export destination is configured
+    if tracing.tracing_enabled():
+        from tools._common.tracing_middleware import TracingMiddleware
+
+        exporter = tracing.TraceExporter(path=tracing.TRACE_FILE, endpoint=tracing.TRACE_ENDPOINT)
+        mcp.add_middleware(TracingMiddleware(exporter))
+        atexit.register(exporter.shutdown)
+        destinations = [d for d in (tracing.TRACE_FILE, tracing.TRACE_ENDPOINT) if d]
+        logger.info(f"Tool call tracing enabled: {', '.join(destinations)}")
+
+    # Let any call cap its command output via max_output_bytes
+    from tools._common.output_budget_middleware import OutputBudgetMiddleware
+
+    mcp.add_middleware(OutputBudgetMiddleware())
+
+    # Let retried mutating calls attach to the original run via idempotency_key
+    from tools._common.idempotency import IdempotencyStore
+    from tools._common.idempotency_middleware import IdempotencyMiddleware
+
+    mcp.add_middleware(IdempotencyMiddleware(IdempotencyStore()))
 
     # Register all tools from the modular structure
     tool_count = registry.register_all(mcp)
     logger.info(f"Registered {tool_count} tools from modular structure")
 
+    # Authenticated diagnostics (/admin/profile, /admin/metrics)
+    register_admin_routes(mcp)
+
     # Create a custom connection logger that will track all MCP connections
     connection_logger = logging.getLogger("mcp-connections")
     connection_logger.info("Connection logger initialized")
@@ -187,6 +246,14 @@ Examples:
   python3 acms.py --host 127.0.0.1   # HTTP server on localhost""",
     )
 
+    parser.add_argument(
+        "--transport",
+        choices=["http", "stdio"],
+        default="http",
+        help="Serve streamable HTTP, or MCP over stdin/stdout for a client that launches ACMS "
+        "as a subprocess; logs always go to stderr (default: http)",
+    )
+
     parser.add_argument(
         "--port",
         "-p",
@@ -202,6 +269,21 @@ Examples:
         help="Host/IP to bind the server to (default: 127.0.0.1)",
     )
 
+    parser.add_argument(
+        "--uds",
+        type=str,
+        metavar="PATH",
+        help="Serve over a Unix domain socket at PATH instead of TCP (ignores --host/--port)",
+    )
+
+    parser.add_argument(
+        "--uds-mode",
+        type=lambda value: int(value, 8),
+        default=0o600,
+        help="Octal file mode of the Unix domain socket; controls which local users may "
+        "connect (default: 600, owner only)",
+    )
+
     parser.add_argument(
         "--ssl",
         action="store_true",
@@ -248,33 +330,199 @@ Examples:
         help="Required OAuth scopes for authentication (space-separated)",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="Disable gzip/brotli/zstd compression of HTTP responses",
+    )
 
+    parser.add_argument(
+        "--compression-min-size",
+        type=int,
+        default=COMPRESSION_MIN_SIZE,
+        help="Smallest response in bytes that will be compressed "
+        f"(default: {COMPRESSION_MIN_SIZE})",
+    )
 
-async def main() -> None:
-    logger.info("=" * 50)
-    logger.info("Starting Apple Container MCP Server (ACMS)")
-    logger.info("=" * 50)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes to pre-fork; ACMS_MAX_CONCURRENT is enforced "
+        "across all of them (default: 1)",
+    )
+
+    parser.add_argument(
+        "--stateless",
+        action="store_true",
+        help="Serve streamable HTTP without server-side sessions so requests can be load "
+        "balanced across instances (implied by --workers > 1)",
+    )
+
+    parser.add_argument(
+        "--session-store",
+        type=str,
+        help="Store shared by all instances for OAuth state: sqlite:///DIR, redis://HOST:PORT/DB "
+        "or memory:// (default: FastMCP's local disk store)",
+    )
+
+    parser.add_argument(
+        "--engine",
+        choices=["auto", *ENGINES],
+        default="auto",
+        help="Event loop and HTTP parser: uvloop (uvloop + httptools), asyncio (asyncio + h11), "
+        "or auto to use uvloop when installed (default: auto)",
+    )
+
+    args = parser.parse_args()
+    try:
+        args.engine = resolve_engine(args.engine)
+    except RuntimeError as e:
+        parser.error(str(e))
+    if args.uds and args.ssl:
+        parser.error("--ssl cannot be combined with --uds")
+    if args.transport == "stdio":
+        http_only = [
+            flag
+            for flag, used in (
+                ("--uds", args.uds),
+                ("--ssl", args.ssl),
+                ("--enable-auth", args.enable_auth),
+                ("--session-store", args.session_store),
+                ("--workers", args.workers > 1),
+            )
+            if used
+        ]
+        if http_only:
+            parser.error(f"--transport stdio cannot be combined with {', '.join(http_only)}")
+    if args.session_store and not args.enable_auth:
+        # Only the OAuth proxy keeps state in the session store
+        parser.error("--session-store requires --enable-auth")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and not args.stateless:
+        # Requests are spread across workers, and a session created by one is unknown to the rest
+        args.stateless = True
+
+    return args
+
+
+def resolve_engine(engine: str) -> str:
+    """
+    Resolve an --engine choice to an installed engine.
+
+    Args:
+        engine: auto, uvloop or asyncio
+
+    Returns:
+        Key into ENGINES
+
+    Raises:
+        RuntimeError: If uvloop was requested but uvloop or httptools is missing
+    """
+    fast_available = all(importlib.util.find_spec(name) for name in ("uvloop", "httptools"))
+    if engine == "auto":
+        return "uvloop" if fast_available else "asyncio"
+    if engine == "uvloop" and not fast_available:
+        raise RuntimeError("--engine uvloop requires the uvloop and httptools packages")
+    return engine
+
+
+def create_http_app(args: argparse.Namespace):
+    """
+    Create the Starlette app that serves MCP over streamable HTTP.
+
+    Args:
+        args: Parsed command line arguments, with resource_url resolved
+
+    Returns:
+        ASGI application with response compression applied if enabled
+    """
+    from starlette.middleware import Middleware
+
+    from tools._common.compression import CompressionMiddleware, available_encodings
+
+    # Create FastMCP server with optional OAuth authentication
+    mcp = create_fastmcp_server(
+        enable_auth=args.enable_auth,
+        resource_server_url=args.resource_url,
+        required_scopes=args.required_scopes or [],
+        session_store=args.session_store,
+    )
+
+    # Negotiate response compression with clients that advertise support
+    middleware = []
+    if not args.no_compression:
+        middleware.append(Middleware(CompressionMiddleware, minimum_size=args.compression_min_size))
+        logger.info(
+            f"Response compression enabled: {', '.join(available_encodings())} "
+            f"(min size: {args.compression_min_size} bytes)"
+        )
+
+    # Stateless mode keeps no per-session state, so any instance can serve any request
+    return mcp.http_app(middleware=middleware, stateless_http=args.stateless)
+
+
+def create_worker_app():
+    """App factory called by uvicorn in each worker process when --workers > 1."""
+    setup_environment()
+    args = argparse.Namespace(**json.loads(os.environ[WORKER_ARGS_ENV]))
+    return create_http_app(args)
+
+
+def bind_unix_socket(path: str, mode: int) -> socket.socket:
+    """
+    Bind a listening Unix domain socket with restricted file permissions.
+
+    The socket is created under a umask that already matches ``mode``, so it is
+    never reachable with broader permissions, even briefly. A stale socket left
+    by a previous run is replaced; a live one is an error.
+
+    Args:
+        path: Filesystem path for the socket
+        mode: Permission bits for the socket file, e.g. 0o600
+
+    Returns:
+        Bound socket ready to hand to uvicorn
+
+    Raises:
+        RuntimeError: If the path is in use or is not a socket
+    """
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise RuntimeError(f"Refusing to replace non-socket file: {path}")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            raise RuntimeError(f"Unix socket already in use: {path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+        finally:
+            probe.close()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o777 & ~mode)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    os.chmod(path, mode)
+    return sock
 
-    # Parse command line arguments
-    args = parse_arguments()
 
-    port = args.port
-    host = args.host
+@contextmanager
+def server_config(args: argparse.Namespace) -> Iterator[Dict[str, Any]]:
+    """
+    Validate the HTTP serving options and yield the uvicorn configuration.
+
+    With --uds the socket is bound here and removed again on exit.
+
+    Args:
+        args: Parsed command line arguments, with resource_url resolved
+    """
     use_ssl = args.ssl
     cert_file = args.cert_file
     key_file = args.key_file
-    enable_auth = args.enable_auth
-    required_scopes = args.required_scopes if args.required_scopes else []
-
-    # Determine resource server URL
-    protocol = "https" if use_ssl else "http"
-    resource_url = args.resource_url if args.resource_url else f"{protocol}://{host}:{port}"
-
-    # Log environment info
-    if not check_container_available():
-        logger.critical("container CLI not found. Please install Apple's container tool.")
-        logger.critical("See: https://github.com/apple/container for installation instructions.")
 
     # Validate SSL configuration if SSL is enabled
     if use_ssl:
@@ -294,43 +542,143 @@ async def main() -> None:
 
         logger.info(f"SSL enabled - using cert: {cert_file}, key: {key_file}")
 
-    logger.info(f"ACMS: {resource_url}/mcp")
+    if args.uds:
+        logger.info(f"ACMS: unix:{args.uds} ({args.resource_url}/mcp, mode {args.uds_mode:o})")
+    else:
+        logger.info(f"ACMS: {args.resource_url}/mcp")
+    if args.stateless:
+        logger.info("Stateless HTTP mode: no server-side MCP sessions")
+
+    # Uvicorn config with consistent logging
+    config_kwargs = {
+        "host": args.host,
+        "port": args.port,
+        "log_level": "info",
+        "log_config": None,  # Keep uvicorn on the ACMS logging pipeline
+        "access_log": True,
+        "ws": "websockets-sansio",
+        **ENGINES[args.engine],
+    }
+    logger.info(
+        f"Engine: {args.engine} "
+        f"(loop: {config_kwargs['loop']}, http: {config_kwargs['http']})"
+    )
+
+    # Add SSL configuration if enabled
+    if use_ssl:
+        config_kwargs.update({"ssl_certfile": cert_file, "ssl_keyfile": key_file})
+        logger.info(f"SSL configuration: certfile={cert_file}, keyfile={key_file}")
+
+    if not args.uds:
+        yield config_kwargs
+        return
 
+    # Serve from a pre-bound socket so uvicorn does not widen its permissions
+    uds_socket = bind_unix_socket(args.uds, args.uds_mode)
+    del config_kwargs["host"], config_kwargs["port"]
+    config_kwargs["fd"] = uds_socket.fileno()
     try:
-        # Create FastMCP server with optional OAuth authentication
-        mcp = create_fastmcp_server(
-            enable_auth=enable_auth,
-            resource_server_url=resource_url,
-            required_scopes=required_scopes,
-        )
+        yield config_kwargs
+    finally:
+        uds_socket.close()
+        if os.path.exists(args.uds):
+            os.unlink(args.uds)
 
-        # Get the HTTP app
-        app = mcp.http_app()
 
-        # Uvicorn config with consistent logging
-        config_kwargs = {
-            "app": app,
-            "host": host,
-            "port": port,
-            "log_level": "info",
-            "access_log": True,
-            "use_colors": True,
-            "loop": "asyncio",
-            "ws": "websockets-sansio",
-        }
+def prepare_startup(args: argparse.Namespace) -> None:
+    """Log the startup banner, resolve the resource server URL and check for the container CLI."""
+    logger.info("=" * 50)
+    logger.info("Starting Apple Container MCP Server (ACMS)")
+    logger.info("=" * 50)
+
+    # Determine resource server URL
+    protocol = "https" if args.ssl else "http"
+    default_url = "http://localhost" if args.uds else f"{protocol}://{args.host}:{args.port}"
+    args.resource_url = args.resource_url if args.resource_url else default_url
+
+    # Log environment info
+    if not check_container_available():
+        logger.critical("container CLI not found. Please install Apple's container tool.")
+        logger.critical("See: https://github.com/apple/container for installation instructions.")
+
 
-        # Add SSL configuration if enabled
-        if use_ssl:
-            config_kwargs.update({"ssl_certfile": cert_file, "ssl_keyfile": key_file})
-            logger.info(f"SSL configuration: certfile={cert_file}, keyfile={key_file}")
+def serve_workers(args: argparse.Namespace) -> None:
+    """
+    Serve the app from several pre-forked uvicorn worker processes.
+
+    Workers share a file-lock based limiter so ACMS_MAX_CONCURRENT applies to
+    the whole server rather than to each worker, and record the commands they
+    run so leftovers can be waited for once every worker has exited.
+
+    Runs outside any event loop: uvicorn's supervisor blocks in uvicorn.run
+    and installs its own signal handlers.
+
+    Args:
+        args: Parsed command line arguments
+    """
+    import uvicorn
 
-        config = uvicorn.Config(**config_kwargs)
+    from tools._common.utils import shutdown_workers_gracefully
 
-        # Create and run server
-        server = uvicorn.Server(config)
+    prepare_startup(args)
+    limit_dir = tempfile.mkdtemp(prefix="acms-limit-")
+    # Inherited by the spawned workers before they import the tools
+    os.environ["ACMS_SHARED_LIMIT_DIR"] = limit_dir
+    os.environ[WORKER_ARGS_ENV] = json.dumps(vars(args))
 
-        # Run the server (this blocks until shutdown)
-        await server.serve()
+    logger.info(f"Starting {args.workers} workers (shared limiter: {limit_dir})")
+    try:
+        with server_config(args) as config_kwargs:
+            # Blocks until the supervisor has stopped every worker
+            uvicorn.run(
+                "acms:create_worker_app", factory=True, workers=args.workers, **config_kwargs
+            )
+    finally:
+        asyncio.run(shutdown_workers_gracefully(limit_dir))
+        shutil.rmtree(limit_dir, ignore_errors=True)
+        logger.info("ACMS shutdown complete")
+
+
+async def serve_stdio() -> None:
+    """
+    Serve the registry-built FastMCP server over stdin/stdout.
+
+    stdout carries only MCP messages; logging stays on stderr.
+    """
+    from tools._common.utils import shutdown_gracefully
+
+    mcp = create_fastmcp_server()
+    logger.info("ACMS: stdio")
+    try:
+        await mcp.run_stdio_async(show_banner=False)
+    finally:
+        await shutdown_gracefully()
+
+
+async def main(args: Optional[argparse.Namespace] = None) -> None:
+    # Parse command line arguments
+    if args is None:
+        args = parse_arguments()
+    prepare_startup(args)
+
+    if args.transport == "stdio":
+        try:
+            await serve_stdio()
+        finally:
+            logger.info("ACMS shutdown complete")
+        return
+
+    try:
+        with server_config(args) as config_kwargs:
+            import uvicorn
+
+            config = uvicorn.Config(app=create_http_app(args), **config_kwargs)
+
+            # Create and run server
+            server = uvicorn.Server(config)
+
+            # Run the server (this blocks until shutdown)
+            await server.serve()
 
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt, shutting down gracefully")
@@ -343,8 +691,20 @@ async def main() -> None:
 
 def cli_main():
     """Entry point for the pip-installed acms command."""
+    # Load .env before anything imports the tools package, which reads ACMS_* at import time
+    setup_environment()
+    args = parse_arguments()
     try:
-        asyncio.run(main())
+        if args.transport != "stdio" and args.workers > 1:
+            # The supervisor must not run inside an event loop
+            serve_workers(args)
+        # The loop is created here, so the engine must be chosen before main() runs
+        elif args.engine == "uvloop":
+            import uvloop
+
+            uvloop.run(main(args))
+        else:
+            asyncio.run(main(args))
     except KeyboardInterrupt:
         print("Server stopped by user", file=sys.stderr)
     except Exception as e:
@@ -0,0 +1,166 @@
+"""
+Benchmark script comparing ACMS throughput and tail latency under each --engine.
+
+Starts acms.py once per engine, drives the same MCP workload against it and
+prints requests per second and latency percentiles.
+
+Usage:
+  python3 tests/bench-engines.py
+  python3 tests/bench-engines.py --requests 5000 --concurrency 64
+  python3 tests/bench-engines.py --tool acms_system_status   # include the container CLI
+"""
+
+from typing import Dict, List, Optional
+from pathlib import Path
+import subprocess
+import importlib.util
+import argparse
+import asyncio
+import logging
+import socket
+import json
+import time
+import sys
+
+import httpx
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("acms-engine-benchmark")
+
+ACMS = Path(__file__).parent.parent / "acms.py"
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def available_engines() -> List[str]:
+    engines = ["asyncio"]
+    if all(importlib.util.find_spec(name) for name in ("uvloop", "httptools")):
+        engines.append("uvloop")
+    return engines
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"ACMS did not start listening on port {port} within {timeout}s")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_workload(
+    url: str, requests: int, concurrency: int, tool: Optional[str]
+) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        init = {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {
+                "protocolVersion": "2025-06-18",
+                "capabilities": {},
+                "clientInfo": {"name": "acms-engine-benchmark", "version": "1.0"},
+            },
+        }
+        response = await client.post(url, headers=HEADERS, json=init)
+        response.raise_for_status()
+        headers = dict(HEADERS)
+        if "mcp-session-id" in response.headers:
+            headers["Mcp-Session-Id"] = response.headers["mcp-session-id"]
+        await client.post(
+            url, headers=headers, json={"jsonrpc": "2.0", "method": "notifications/initialized"}
+        )
+
+        if tool:
+            method, params = "tools/call", {"name": tool, "arguments": {}}
+        else:
+            method, params = "tools/list", {}
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies: List[float] = []
+        errors = 0
+
+        async def one(request_id: int) -> None:
+            nonlocal errors
+            body = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    r = await client.post(url, headers=headers, content=json.dumps(body))
+                    r.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        # Warm up connections and caches before timing
+        await asyncio.gather(*(one(i) for i in range(1, min(requests, concurrency) + 1)))
+        latencies.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(1, requests + 1)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    if not latencies:
+        raise RuntimeError("Every request failed")
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "max": latencies[-1] * 1000,
+        "errors": errors,
+    }
+
+
+def benchmark_engine(engine: str, args: argparse.Namespace) -> Dict[str, float]:
+    port = free_port()
+    cmd = [sys.executable, str(ACMS), "--engine", engine, "--port", str(port)]
+    logger.info(f"Starting ACMS with --engine {engine} on port {port}")
+    server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        url = f"http://127.0.0.1:{port}/mcp"
+        return asyncio.run(run_workload(url, args.requests, args.concurrency, args.tool))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare ACMS engines")
+    parser.add_argument("--engines", nargs="*", default=available_engines())
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tool", type=str, help="Call this tool instead of tools/list")
+    args = parser.parse_args()
+
+    results = {engine: benchmark_engine(engine, args) for engine in args.engines}
+
+    print()
+    print(f"{'engine':<10} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'errors':>7}")
+    for engine, r in results.items():
+        print(f"{engine:<10} {r['rps']:>10.1f} {r['p50']:>9.2f} {r['p95']:>9.2f} "
+              f"{r['p99']:>9.2f} {r['max']:>9.2f} {r['errors']:>7}")
+
+    fastest = max(results, key=lambda e: results[e]["rps"])
+    print(f"\nFastest on this host: --engine {fastest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
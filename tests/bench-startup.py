@@ -0,0 +1,192 @@
+"""
+Benchmark script for ACMS startup time.
+
+Records the cost of importing acms and of everything a server imports while
+building its app (`python -X importtime`), `acms.py --help`, and the time from
+launching acms.py to its first successful tools/list response. With budgets
+set, exits non-zero when a median exceeds its budget, so CI can catch
+startup regressions.
+
+Usage:
+  python3 tests/bench-startup.py
+  python3 tests/bench-startup.py --runs 10 --top 15
+  python3 tests/bench-startup.py --import-budget-ms 300 --tools-list-budget-ms 4000
+  python3 tests/bench-startup.py --json > startup.json
+"""
+
+from typing import Dict, List, Tuple
+from pathlib import Path
+import subprocess
+import statistics
+import argparse
+import logging
+import socket
+import json
+import time
+import sys
+
+import httpx
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("acms-startup-benchmark")
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+ROOT = Path(__file__).parent.parent
+ACMS = ROOT / "acms.py"
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Builds the app exactly as a single-process server does, without serving it
+SERVER_IMPORTS = (
+    "import sys, acms; sys.argv = ['acms.py', '--stateless']; "
+    "acms.setup_environment(); args = acms.parse_arguments(); "
+    "args.resource_url = 'http://127.0.0.1:8765'; acms.create_http_app(args)"
+)
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        Total milliseconds spent importing, and self milliseconds per module
+    """
+    total = 0.0
+    self_times: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        self_times[module] = self_times.get(module, 0.0) + int(self_us) / 1000
+        total += int(self_us) / 1000
+    return total, self_times
+
+
+def measure_imports(code: str) -> Tuple[float, Dict[str, float]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_help() -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(ACMS), "--help"], cwd=ROOT, capture_output=True, check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_first_tools_list(timeout: float = 60.0) -> float:
+    """Return milliseconds from launching acms.py to its first successful tools/list."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/mcp"
+    body = {"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}}
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, str(ACMS), "--port", str(port), "--stateless"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=5) as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    response = client.post(url, headers=HEADERS, json=body)
+                    if response.status_code == 200 and '"tools"' in response.text:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    raise RuntimeError(f"No tools/list response within {timeout}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure ACMS startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to report")
+    parser.add_argument("--import-budget-ms", type=float, help="Fail if import acms is slower")
+    parser.add_argument(
+        "--tools-list-budget-ms", type=float, help="Fail if the first tools/list is slower"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    import_times: List[float] = []
+    server_import_times: List[float] = []
+    module_times: Dict[str, List[float]] = {}
+    help_times: List[float] = []
+    tools_list_times: List[float] = []
+
+    for run in range(1, args.runs + 1):
+        import_times.append(measure_imports("import acms")[0])
+        total, self_times = measure_imports(SERVER_IMPORTS)
+        server_import_times.append(total)
+        for module, ms in self_times.items():
+            module_times.setdefault(module, []).append(ms)
+        help_times.append(measure_help())
+        tools_list_times.append(measure_first_tools_list())
+        logger.info(
+            f"Run {run}/{args.runs}: import acms {import_times[-1]:.1f}ms, "
+            f"server imports {total:.1f}ms, --help {help_times[-1]:.1f}ms, "
+            f"first tools/list {tools_list_times[-1]:.1f}ms"
+        )
+
+    slowest = sorted(
+        ((statistics.median(times), module) for module, times in module_times.items()),
+        reverse=True,
+    )[: args.top]
+    results = {
+        "import_acms_ms": statistics.median(import_times),
+        "server_imports_ms": statistics.median(server_import_times),
+        "help_ms": statistics.median(help_times),
+        "first_tools_list_ms": statistics.median(tools_list_times),
+        "slowest_modules_ms": {module: round(ms, 2) for ms, module in slowest},
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print()
+        print(f"import acms (median):          {results['import_acms_ms']:>9.1f} ms")
+        print(f"server imports (median):       {results['server_imports_ms']:>9.1f} ms")
+        print(f"acms.py --help (median):       {results['help_ms']:>9.1f} ms")
+        print(f"first tools/list (median):     {results['first_tools_list_ms']:>9.1f} ms")
+        print(f"\nSlowest server imports by self time (median of {args.runs} runs):")
+        for ms, module in slowest:
+            print(f"  {ms:>9.2f} ms  {module}")
+
+    failed = False
+    if args.import_budget_ms and results["import_acms_ms"] > args.import_budget_ms:
+        logger.error(
+            f"import acms took {results['import_acms_ms']:.1f}ms, "
+            f"budget {args.import_budget_ms:.1f}ms"
+        )
+        failed = True
+    if args.tools_list_budget_ms and results["first_tools_list_ms"] > args.tools_list_budget_ms:
+        logger.error(
+            f"First tools/list took {results['first_tools_list_ms']:.1f}ms, "
+            f"budget {args.tools_list_budget_ms:.1f}ms"
+        )
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import AsyncMock, patch
 import sys
+import os
+import json
 from pathlib import Path
 
 # Add project root to path for imports
@@ -412,5 +414,2344 @@ class TestEdgeCases:
         assert formatted is not None
 
 
+class TestResponseCompression:
+    """Test negotiated HTTP response compression."""
+
+    def _client(self, body: bytes, media_type: str = "application/json"):
+        from starlette.applications import Starlette
+        from starlette.middleware import Middleware
+        from starlette.responses import Response
+        from starlette.routing import Route
+        from starlette.testclient import TestClient
+        from tools._common.compression import CompressionMiddleware
+
+        async def endpoint(request):
+            return Response(body, media_type=media_type)
+
+        app = Starlette(
+            routes=[Route("/", endpoint)],
+            middleware=[Middleware(CompressionMiddleware, minimum_size=64, encodings=["gzip"])],
+        )
+        return TestClient(app)
+
+    def test_negotiate_encoding_prefers_server_order(self):
+        """Verify equal q-values fall back to server preference."""
+        from tools._common.compression import negotiate_encoding
+
+        assert negotiate_encoding("gzip, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+        assert negotiate_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+        assert negotiate_encoding("identity", ["gzip"]) is None
+        assert negotiate_encoding("*;q=0", ["gzip"]) is None
+
+    def test_large_response_is_compressed(self):
+        """Verify responses above the threshold are gzip encoded."""
+        body = b'{"stdout": "' + b"x" * 4096 + b'"}'
+        response = self._client(body).get("/", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.content == body
+
+    def test_small_response_is_not_compressed(self):
+        """Verify responses below the threshold skip compression."""
+        response = self._client(b"{}").get("/", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.content == b"{}"
+
+
+class TestSharedSemaphore:
+    """Test the cross-process command limiter used in multi-worker mode."""
+
+    @pytest.mark.asyncio
+    async def test_permits_are_shared_between_instances(self, tmp_path):
+        """Verify two limiters on the same directory share one permit pool."""
+        import asyncio
+        from tools._common.limiter import SharedSemaphore
+
+        first = SharedSemaphore(str(tmp_path), 1)
+        second = SharedSemaphore(str(tmp_path), 1)
+
+        slot = await first.acquire()
+        assert second.available() == 0
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(second.acquire(), timeout=0.2)
+
+        first.release(slot)
+        other_slot = await asyncio.wait_for(second.acquire(), timeout=1)
+        second.release(other_slot)
+
+    @pytest.mark.asyncio
+    async def test_record_pid_is_visible_to_other_instances(self, tmp_path):
+        """Verify command PIDs recorded by one worker are readable by the supervisor."""
+        import time
+        from tools._common.limiter import SharedSemaphore
+
+        worker = SharedSemaphore(str(tmp_path), 2)
+        slot = await worker.acquire()
+        worker.record_pid(slot, 4242)
+
+        [(pid, recorded_at)] = SharedSemaphore(str(tmp_path), 2).recorded_pids()
+        assert pid == 4242 and recorded_at <= time.time()
+
+        worker.release(slot)
+        assert SharedSemaphore(str(tmp_path), 2).recorded_pids() == []
+
+    @pytest.mark.asyncio
+    async def test_shutdown_leaves_reused_pids_alone(self, tmp_path):
+        """Verify only PIDs that are still the recorded container commands are killed."""
+        import subprocess
+        import time
+        from tools._common.limiter import SharedSemaphore, is_recorded_process
+        from tools._common.utils import shutdown_workers_gracefully
+
+        unrelated = subprocess.Popen(["sleep", "30"])
+        try:
+            time.sleep(0.1)
+            assert is_recorded_process(unrelated.pid, time.time(), "sleep")
+            assert not is_recorded_process(unrelated.pid, time.time())
+            assert not is_recorded_process(unrelated.pid, time.time() - 60, "sleep")
+
+            # A crashed worker recorded this PID long before the unrelated process reused it
+            worker = SharedSemaphore(str(tmp_path), 2)
+            slot = await worker.acquire()
+            with patch("time.time", return_value=time.time() - 60):
+                worker.record_pid(slot, unrelated.pid)
+            with patch("tools._common.utils.MAX_CONCURRENT_COMMANDS", 2):
+                await shutdown_workers_gracefully(str(tmp_path), timeout=0)
+            assert unrelated.poll() is None
+        finally:
+            unrelated.kill()
+            unrelated.wait()
+
+    @pytest.mark.asyncio
+    async def test_untraced_commands_do_not_probe_free_slots(self, tmp_path, caplog):
+        """Verify free shared slots are only counted for traced calls or debug logging."""
+        import logging
+        from tools._common import utils
+        from tools._common.limiter import SharedSemaphore
+
+        caplog.set_level(logging.INFO, logger="ACMS")
+        semaphore = SharedSemaphore(str(tmp_path), 2)
+        with patch.object(utils, "_command_semaphore", semaphore), patch.object(
+            semaphore, "available", side_effect=AssertionError("probed")
+        ), patch("asyncio.create_subprocess_exec", side_effect=FileNotFoundError("container")):
+            with pytest.raises(RuntimeError, match="Failed to execute"):
+                await utils.run_container_command("list")
+
+    def test_parse_arguments_rejects_zero_workers(self):
+        """Verify --workers must be positive."""
+        from acms import parse_arguments
+
+        with patch("sys.argv", ["acms.py", "--workers", "0"]):
+            with pytest.raises(SystemExit):
+                parse_arguments()
+
+
+class TestSessionStore:
+    """Test the pluggable session store used for horizontal scaling."""
+
+    @pytest.mark.asyncio
+    async def test_encrypted_sqlite_store_round_trip(self, tmp_path):
+        """Verify values written by one instance can be read by another."""
+        from tools._common.session_store import create_session_store
+
+        url = f"sqlite://{tmp_path}"
+        writer = create_session_store(url, encryption_secret="shared-secret")
+        await writer.put("client-1", {"redirect_uri": "http://localhost"}, collection="clients")
+
+        reader = create_session_store(url, encryption_secret="shared-secret")
+        assert await reader.get("client-1", collection="clients") == {
+            "redirect_uri": "http://localhost"
+        }
+
+    def test_unsupported_scheme_is_rejected(self):
+        """Verify unknown store URLs fail with a clear error."""
+        from tools._common.session_store import create_session_store
+
+        with pytest.raises(ValueError, match="Unsupported session store URL"):
+            create_session_store("ftp://example.com/store")
+
+    def test_workers_imply_stateless_mode(self):
+        """Verify multi-worker mode never relies on in-memory sessions."""
+        from acms import parse_arguments
+
+        with patch("sys.argv", ["acms.py", "--workers", "4"]):
+            args = parse_arguments()
+            assert args.stateless is True
+
+        with patch("sys.argv", ["acms.py"]):
+            args = parse_arguments()
+            assert args.stateless is False
+
+
+class TestUnixSocketListener:
+    """Test the Unix domain socket listener."""
+
+    def test_bind_unix_socket_applies_mode(self, tmp_path):
+        """Verify the socket file is created with the requested permissions."""
+        import stat
+        from acms import bind_unix_socket
+
+        path = str(tmp_path / "acms.sock")
+        sock = bind_unix_socket(path, 0o600)
+        try:
+            assert stat.S_ISSOCK(os.stat(path).st_mode)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        finally:
+            sock.close()
+
+    def test_bind_unix_socket_replaces_stale_socket(self, tmp_path):
+        """Verify a socket left by a previous run is replaced."""
+        from acms import bind_unix_socket
+
+        path = str(tmp_path / "acms.sock")
+        bind_unix_socket(path, 0o600).close()
+
+        sock = bind_unix_socket(path, 0o660)
+        sock.close()
+
+    def test_bind_unix_socket_refuses_regular_file(self, tmp_path):
+        """Verify a regular file at the socket path is never removed."""
+        from acms import bind_unix_socket
+
+        path = tmp_path / "acms.sock"
+        path.write_text("data")
+        with pytest.raises(RuntimeError, match="non-socket"):
+            bind_unix_socket(str(path), 0o600)
+        assert path.read_text() == "data"
+
+    def test_parse_arguments_uds(self):
+        """Verify --uds and an octal --uds-mode are parsed, and SSL is rejected."""
+        from acms import parse_arguments
+
+        with patch("sys.argv", ["acms.py", "--uds", "/tmp/acms.sock", "--uds-mode", "660"]):
+            args = parse_arguments()
+            assert args.uds == "/tmp/acms.sock"
+            assert args.uds_mode == 0o660
+
+        with patch("sys.argv", ["acms.py", "--uds", "/tmp/acms.sock", "--ssl"]):
+            with pytest.raises(SystemExit):
+                parse_arguments()
+
+
+class TestEngineSelection:
+    """Test event loop and HTTP parser engine selection."""
+
+    @patch("importlib.util.find_spec")
+    def test_auto_falls_back_to_asyncio(self, mock_find_spec):
+        """Verify auto picks asyncio when uvloop is not installed."""
+        from acms import resolve_engine
+
+        mock_find_spec.return_value = None
+        assert resolve_engine("auto") == "asyncio"
+        with pytest.raises(RuntimeError, match="requires the uvloop"):
+            resolve_engine("uvloop")
+
+    @patch("importlib.util.find_spec")
+    def test_auto_prefers_uvloop(self, mock_find_spec):
+        """Verify auto picks uvloop and httptools when both are installed."""
+        from acms import ENGINES, resolve_engine
+
+        mock_find_spec.return_value = object()
+        assert resolve_engine("auto") == "uvloop"
+        assert ENGINES["uvloop"] == {"loop": "uvloop", "http": "httptools"}
+        assert resolve_engine("asyncio") == "asyncio"
+
+
+class LocalIdentityProvider:
+    """Stand-in identity provider that signs RS256 tokens and serves its JWKS over HTTP."""
+
+    def __init__(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.issuer = "https://login.example.test/tenant/v2.0"
+        self.audience = "acms-client-id"
+        self.rotate()
+
+        idp = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(idp.jwks).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.jwks_uri = f"http://127.0.0.1:{self._server.server_address[1]}/keys"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def rotate(self):
+        """Replace the signing key, as the real IdP does periodically."""
+        import uuid
+        from authlib.jose import JsonWebKey
+        from fastmcp.server.auth.providers.jwt import RSAKeyPair
+
+        self.key_pair = RSAKeyPair.generate()
+        self.kid = uuid.uuid4().hex
+        jwk = JsonWebKey.import_key(self.key_pair.public_key, {"kty": "RSA"}).as_dict()
+        self.jwks = {"keys": [{**jwk, "kid": self.kid, "use": "sig", "alg": "RS256"}]}
+
+    def issue(self, expires_in_seconds: int = 3600) -> str:
+        return self.key_pair.create_token(
+            issuer=self.issuer,
+            audience=self.audience,
+            kid=self.kid,
+            expires_in_seconds=expires_in_seconds,
+        )
+
+    def close(self):
+        self._server.shutdown()
+
+
+class TestAuthCaching:
+    """Test verified-token and JWKS caching for authenticated mode."""
+
+    @pytest.fixture
+    def idp(self):
+        provider = LocalIdentityProvider()
+        yield provider
+        provider.close()
+
+    def _verifier(self, idp):
+        from tools._common.auth_cache import RefreshingJWTVerifier
+
+        return RefreshingJWTVerifier(
+            jwks_uri=idp.jwks_uri, issuer=idp.issuer, audience=idp.audience
+        )
+
+    @pytest.mark.asyncio
+    async def test_jwks_fetched_once_for_repeat_tokens(self, idp):
+        """Verify known keys are served from memory."""
+        verifier = self._verifier(idp)
+
+        for _ in range(3):
+            assert await verifier.verify_token(idp.issue()) is not None
+        assert verifier.fetch_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_key_id_triggers_refetch(self, idp):
+        """Verify a rotated signing key is picked up on first use."""
+        verifier = self._verifier(idp)
+        assert await verifier.verify_token(idp.issue()) is not None
+
+        idp.rotate()
+        with patch("tools._common.auth_cache.JWKS_MIN_REFETCH_INTERVAL", 0):
+            assert await verifier.verify_token(idp.issue()) is not None
+        assert verifier.fetch_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_jwks_refreshes_in_background(self, idp):
+        """Verify a stale key set is still used while a refresh runs."""
+        import asyncio
+
+        verifier = self._verifier(idp)
+        verifier.refresh_interval = 0
+        token = idp.issue()
+        assert await verifier.verify_token(token) is not None
+
+        assert await verifier.verify_token(token) is not None
+        await asyncio.wait_for(verifier._refresh_task, timeout=5)
+        assert verifier.fetch_count == 2
+
+    def test_token_cache_respects_token_expiry(self):
+        """Verify expired tokens are never cached and LRU eviction applies."""
+        import time
+        from fastmcp.server.auth.auth import AccessToken
+        from tools._common.auth_cache import TokenCache
+
+        cache = TokenCache(ttl=300, max_entries=2)
+        expired = AccessToken(token="t", client_id="c", scopes=[], expires_at=int(time.time()) - 1)
+        cache.put("expired", expired)
+        assert cache.get("expired") is None
+
+        for name in ("a", "b", "c"):
+            cache.put(name, AccessToken(token=name, client_id="c", scopes=[]))
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert len(cache) == 2
+
+    @pytest.mark.asyncio
+    async def test_provider_verifies_repeat_token_once(self):
+        """Verify a repeat caller skips full token verification."""
+        from fastmcp.server.auth.auth import AccessToken
+        from tools._common.auth_cache import CachedAzureProvider
+
+        provider = CachedAzureProvider(
+            client_id="test-client",
+            client_secret="test-secret",
+            tenant_id="test-tenant",
+            base_url="http://localhost:8765",
+            required_scopes=["scope1"],
+        )
+        validated = AccessToken(token="upstream", client_id="test-client", scopes=["scope1"])
+
+        with patch(
+            "fastmcp.server.auth.oauth_proxy.OAuthProxy.load_access_token",
+            new=AsyncMock(return_value=validated),
+        ) as mock_load:
+            assert await provider.verify_token("bearer-token") is validated
+            assert await provider.verify_token("bearer-token") is validated
+            assert mock_load.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_revoked_upstream_token_rejected_immediately(self):
+        """Verify revoking the swapped upstream token evicts the client's cached bearer token."""
+        from fastmcp.server.auth.auth import AccessToken
+        from tools._common.auth_cache import CachedAzureProvider
+
+        provider = CachedAzureProvider(
+            client_id="test-client",
+            client_secret="test-secret",
+            tenant_id="test-tenant",
+            base_url="http://localhost:8765",
+            required_scopes=["scope1"],
+        )
+        validated = AccessToken(token="upstream", client_id="test-client", scopes=["scope1"])
+
+        with patch(
+            "fastmcp.server.auth.oauth_proxy.OAuthProxy.load_access_token",
+            new=AsyncMock(side_effect=[validated, None]),
+        ), patch("fastmcp.server.auth.oauth_proxy.OAuthProxy.revoke_token", new=AsyncMock()):
+            assert await provider.verify_token("fastmcp-jwt") is validated
+            await provider.revoke_token(validated)
+            assert len(provider.token_cache) == 0
+            assert await provider.verify_token("fastmcp-jwt") is None
+
+
+class TestLoggingPipeline:
+    """Test the queue-based structured logging pipeline."""
+
+    def _record(self, msg, level=None, name="ACMS"):
+        import logging
+
+        return logging.LogRecord(name, level or logging.INFO, __file__, 1, msg, None, None)
+
+    def test_json_formatter_emits_single_line(self):
+        """Verify records become compact one-line JSON objects."""
+        from tools._common.logging_setup import JsonFormatter
+
+        record = self._record("Executing: container list\nsecond line")
+        line = JsonFormatter().format(record)
+
+        assert "\n" not in line
+        entry = json.loads(line)
+        assert entry["logger"] == "ACMS"
+        assert entry["level"] == "INFO"
+        assert entry["msg"] == "Executing: container list\nsecond line"
+
+    def test_sampling_keeps_every_nth_message(self):
+        """Verify high-volume prefixes are sampled and drops are counted."""
+        from tools._common.logging_setup import RateLimitFilter
+
+        log_filter = RateLimitFilter(sampling={"Executing:": 0.25})
+        records = [self._record(f"Executing: container list {i}") for i in range(8)]
+        kept = [r for r in records if log_filter.filter(r)]
+
+        assert len(kept) == 2
+        assert getattr(kept[1], "dropped", 0) == 3
+        assert log_filter.filter(self._record("Registered 54 tools"))
+
+    def test_rate_limit_never_drops_warnings(self):
+        """Verify per-logger rate limits apply below WARNING only."""
+        import logging
+        from tools._common.logging_setup import RateLimitFilter
+
+        log_filter = RateLimitFilter(rate_limits={"ACMS": 2})
+        infos = [log_filter.filter(self._record("Completed successfully")) for _ in range(5)]
+        assert infos.count(True) == 2
+        assert log_filter.filter(self._record("Failed", level=logging.WARNING))
+
+    def test_parse_ratio_spec(self):
+        """Verify environment specs parse, including names containing spaces."""
+        from tools._common.logging_setup import parse_ratio_spec
+
+        assert parse_ratio_spec("Executing:=0.1, Completed successfully=0.5") == {
+            "Executing:": 0.1,
+            "Completed successfully": 0.5,
+        }
+        with pytest.raises(ValueError):
+            parse_ratio_spec("ACMS")
+
+
+class TestToolCallTracing:
+    """Test per-call tracing spans and their OTLP export."""
+
+    @pytest.mark.asyncio
+    @patch("asyncio.create_subprocess_exec")
+    async def test_tool_call_exports_phase_spans(self, mock_subprocess, tmp_path):
+        """Verify a traced tool call exports one span per phase under its request ID."""
+        import fastmcp
+        from tools._common.tracing import TraceExporter
+        from tools._common.tracing_middleware import TracingMiddleware
+        from tools.container import list as container_list
+
+        mock_process = AsyncMock()
+        mock_process.communicate = AsyncMock(return_value=(b"[]", b""))
+        mock_process.returncode = 0
+        mock_process.pid = 4242
+        mock_subprocess.return_value = mock_process
+
+        trace_file = tmp_path / "traces.jsonl"
+        exporter = TraceExporter(path=str(trace_file))
+        mcp = fastmcp.FastMCP("ACMS")
+        mcp.add_middleware(TracingMiddleware(exporter))
+        container_list.register(mcp)
+
+        async with fastmcp.Client(mcp) as client:
+            await client.call_tool("acms_container_list", {})
+        exporter.shutdown()
+
+        lines = trace_file.read_text().splitlines()
+        assert len(lines) == 1
+        spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        by_name = {s["name"]: s for s in spans}
+        assert set(by_name) == {
+            "tools/call acms_container_list",
+            "validate",
+            "semaphore.wait",
+            "process.spawn",
+            "container.run",
+            "format_result",
+        }
+
+        root = by_name["tools/call acms_container_list"]
+        root_attrs = {a["key"]: a["value"] for a in root["attributes"]}
+        assert "mcp.request_id" in root_attrs
+        assert all(s["traceId"] == root["traceId"] for s in spans)
+        assert all(s.get("parentSpanId") == root["spanId"] for s in spans if s is not root)
+
+        run_attrs = {a["key"]: a["value"] for a in by_name["container.run"]["attributes"]}
+        assert run_attrs["process.exit_code"] == {"intValue": "0"}
+
+    def test_untraced_span_is_noop(self):
+        """Verify phases outside a traced call record nothing."""
+        from tools._common.tracing import current_trace, span
+
+        with span("format_result") as recorded:
+            assert recorded is None
+        assert current_trace() is None
+
+
+class TestAdminProfiler:
+    """Test the authenticated sampling profiler route."""
+
+    def _client(self):
+        import fastmcp
+        from starlette.testclient import TestClient
+        from tools._common.admin import register_admin_routes
+
+        mcp = fastmcp.FastMCP("ACMS")
+        assert register_admin_routes(mcp)
+        return TestClient(mcp.http_app())
+
+    def test_collapsed_stacks_format(self):
+        """Verify samples are emitted as 'frame;frame count' lines rooted at the thread."""
+        import time
+        from tools._common.profiler import SamplingProfiler
+
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        time.sleep(0.05)
+        profiler.stop()
+
+        lines = profiler.collapsed().splitlines()
+        assert profiler.samples > 0
+        assert any(line.startswith("MainThread;") for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_admin_routes_disabled_without_credentials(self):
+        """Verify no admin route is exposed when nobody can authenticate."""
+        import fastmcp
+        from tools._common.admin import register_admin_routes
+
+        with patch("tools._common.admin.ADMIN_TOKEN", None):
+            assert not register_admin_routes(fastmcp.FastMCP("ACMS"))
+
+    @pytest.mark.asyncio
+    async def test_oauth_callers_need_admin_scope(self):
+        """Verify OAuth tokens only reach admin routes when ACMS_ADMIN_SCOPE is granted."""
+        from types import SimpleNamespace
+        from tools._common.admin import _authorized, register_admin_routes
+
+        class FakeAuth:
+            async def verify_token(self, token):
+                scopes = ["acms:admin"] if token == "admin-user" else ["acms:tools"]
+                return SimpleNamespace(scopes=scopes)
+
+        def request(token):
+            return SimpleNamespace(headers={"authorization": f"Bearer {token}"})
+
+        auth = FakeAuth()
+        with patch("tools._common.admin.ADMIN_TOKEN", None):
+            with patch("tools._common.admin.ADMIN_SCOPE", None):
+                assert not register_admin_routes(SimpleNamespace(auth=auth))
+                assert not await _authorized(request("admin-user"), auth)
+            with patch("tools._common.admin.ADMIN_SCOPE", "acms:admin"):
+                assert not await _authorized(request("tool-user"), auth)
+                assert await _authorized(request("admin-user"), auth)
+
+    @patch("tools._common.admin.ADMIN_TOKEN", "admin-secret")
+    def test_profile_requires_bearer_token(self):
+        """Verify the profile route rejects missing or wrong tokens."""
+        client = self._client()
+
+        assert client.get("/admin/profile?seconds=0").status_code == 401
+        response = client.get(
+            "/admin/profile?seconds=0", headers={"Authorization": "Bearer wrong"}
+        )
+        assert response.status_code == 401
+
+    @patch("tools._common.admin.ADMIN_TOKEN", "admin-secret")
+    def test_profile_returns_collapsed_stacks(self):
+        """Verify an authorized profile returns a collapsed-stack attachment."""
+        client = self._client()
+        headers = {"Authorization": "Bearer admin-secret"}
+
+        response = client.get("/admin/profile?seconds=0.1&interval_ms=2", headers=headers)
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+        assert int(response.headers["x-acms-samples"]) > 0
+        assert response.text.strip()
+
+        assert client.get("/admin/profile?seconds=3600", headers=headers).status_code == 400
+
+    @patch("tools._common.admin.ADMIN_TOKEN", "admin-secret")
+    def test_profile_with_task_dump(self):
+        """Verify tasks=1 adds an asyncio task dump including the handling task."""
+        client = self._client()
+
+        response = client.get(
+            "/admin/profile?seconds=0&tasks=1", headers={"Authorization": "Bearer admin-secret"}
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert "collapsed" in body
+        assert any(task["current"] and task["stack"] for task in body["tasks"])
+
+
+class TestStartupImports:
+    """Test that heavy dependencies are imported only when needed."""
+
+    def test_import_and_argument_parsing_skip_heavy_modules(self):
+        """Verify importing acms and parsing arguments loads no server stack."""
+        import subprocess
+        import sys
+
+        code = (
+            "import sys, acms; sys.argv = ['acms.py', '--workers', '2']; acms.parse_arguments(); "
+            "print(','.join(m for m in ('fastmcp', 'uvicorn', 'dotenv', 'mcp') "
+            "if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == ""
+
+    def test_dotenv_settings_apply_to_tools(self, tmp_path):
+        """Verify ACMS_* values from .env reach settings the tools read at import time."""
+        import subprocess
+        import sys
+
+        (tmp_path / ".env").write_text("ACMS_MAX_CONCURRENT=3\n")
+        code = (
+            "import sys, acms\n"
+            "async def main(args):\n"
+            "    from tools._common import utils\n"
+            "    print(utils.MAX_CONCURRENT_COMMANDS)\n"
+            "acms.main = main\n"
+            "sys.argv = ['acms', '--transport', 'stdio']\n"
+            "acms.cli_main()\n"
+        )
+        env = {k: v for k, v in os.environ.items() if not k.startswith("ACMS_")}
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        )
+        assert result.stdout.strip() == "3"
+
+    def test_lazily_imported_fastmcp_logs_through_pipeline(self):
+        """Verify fastmcp imported after setup keeps no handlers of its own."""
+        import subprocess
+        import sys
+
+        code = (
+            "import logging, acms; acms.setup_environment(); import fastmcp; "
+            "log = logging.getLogger('fastmcp'); print(len(log.handlers), log.propagate)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+            env={k: v for k, v in os.environ.items() if k != "FASTMCP_LOG_ENABLED"},
+        )
+        assert result.stdout.strip() == "0 True"
+
+
+class TestStdioTransport:
+    """Test serving MCP over stdin/stdout."""
+
+    def test_stdio_rejects_http_only_options(self):
+        """Verify HTTP-only options cannot be combined with stdio."""
+        from acms import parse_arguments
+
+        with patch("sys.argv", ["acms.py", "--transport", "stdio"]):
+            assert parse_arguments().transport == "stdio"
+        for extra in (["--enable-auth"], ["--session-store", "memory://"]):
+            with patch("sys.argv", ["acms.py", "--transport", "stdio", *extra]):
+                with pytest.raises(SystemExit):
+                    parse_arguments()
+
+    def test_session_store_requires_auth(self):
+        """Verify --session-store is rejected rather than ignored without --enable-auth."""
+        from acms import parse_arguments
+
+        with patch("sys.argv", ["acms.py", "--session-store", "memory://"]):
+            with pytest.raises(SystemExit):
+                parse_arguments()
+        with patch("sys.argv", ["acms.py", "--enable-auth", "--session-store", "memory://"]):
+            assert parse_arguments().session_store == "memory://"
+
+    def test_stdio_round_trip_keeps_stdout_clean(self):
+        """Verify stdout carries only MCP messages and logs go to stderr."""
+        import subprocess
+        import sys
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        messages = [
+            {
+                "jsonrpc": "2.0",
+                "id": 0,
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": "2025-06-18",
+                    "capabilities": {},
+                    "clientInfo": {"name": "smoke-test", "version": "1.0"},
+                },
+            },
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}},
+        ]
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(root, "acms.py"), "--transport", "stdio"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        for message in messages:
+            server.stdin.write(json.dumps(message) + "\n")
+        server.stdin.flush()
+
+        responses = [json.loads(server.stdout.readline()) for _ in range(2)]
+        # Closing stdin ends the session
+        _, stderr = server.communicate(timeout=30)
+
+        assert [r["id"] for r in responses] == [0, 1]
+        assert any(t["name"] == "acms_container_list" for t in responses[1]["result"]["tools"])
+        assert "ACMS: stdio" in stderr
+
+
+class TestBuildCache:
+    """Test the content-hash build cache."""
+
+    def _context(self, tmp_path):
+        context = tmp_path / "context"
+        (context / "src").mkdir(parents=True)
+        (context / "node_modules" / "dep").mkdir(parents=True)
+        (context / "Dockerfile").write_text("FROM alpine\nCOPY . /app\n")
+        (context / "src" / "main.py").write_text("print('hello')\n")
+        (context / "node_modules" / "dep" / "index.js").write_text("x")
+        (context / "build.log").write_text("noise")
+        (context / ".dockerignore").write_text("node_modules\n*.log\n")
+        # Old enough that the manifest trusts them on the next scan
+        for path in context.rglob("*"):
+            os.utime(path, (1_600_000_000, 1_600_000_000))
+        return context
+
+    @pytest.mark.asyncio
+    async def test_concurrent_keys_for_one_context(self, tmp_path):
+        """Verify concurrent hashing of the same context never trips over another's temp file."""
+        import asyncio
+        from tools._common.build_cache import compute_build_key
+
+        context = self._context(tmp_path)
+        cache_dir = tmp_path / "cache"
+        keys = await asyncio.gather(
+            *(
+                compute_build_key(str(context), None, {"tag": f"v{i % 3}"}, cache_dir)
+                for i in range(60)
+            )
+        )
+
+        assert len(set(keys)) == 3
+        assert not [p.name for p in cache_dir.rglob("*.tmp")]
+
+    def test_ignore_rules(self):
+        """Verify .dockerignore semantics: globs, ** and ! exceptions."""
+        from tools._common.build_cache import IgnoreRules
+
+        rules = IgnoreRules(["# comment", "**/*.pyc", "docs", "!docs/keep.md", "tmp?"])
+        assert rules.excluded("a/b/c.pyc")
+        assert rules.excluded("c.pyc")
+        assert rules.excluded("docs/guide/index.md")
+        assert not rules.excluded("docs/keep.md")
+        assert rules.excluded("tmp1/file")
+        assert not rules.excluded("src/main.py")
+
+    def test_hash_respects_ignore_and_reuses_manifest(self, tmp_path):
+        """Verify ignored files never affect the hash and unchanged files are not re-read."""
+        from tools._common.build_cache import hash_context
+
+        context = self._context(tmp_path)
+        cache_dir = tmp_path / "cache"
+        dockerfile = context / "Dockerfile"
+
+        digest, total, read = hash_context(context, dockerfile, cache_dir)
+        assert total == 3  # .dockerignore, Dockerfile, src/main.py
+        assert read == 3
+
+        (context / "build.log").write_text("more noise")
+        (context / "node_modules" / "dep" / "index.js").write_text("y")
+        again, _, read = hash_context(context, dockerfile, cache_dir)
+        assert again == digest
+        assert read == 0
+
+        (context / "src" / "main.py").write_text("print('changed')\n")
+        changed, _, read = hash_context(context, dockerfile, cache_dir)
+        assert changed != digest
+        assert read == 1
+
+    @pytest.mark.asyncio
+    async def test_lookup_requires_existing_image(self, tmp_path):
+        """Verify a recorded build is reused only while its image exists, and retagged."""
+        from tools._common.build_cache import BuildCache
+
+        context = self._context(tmp_path)
+        cache = BuildCache(tmp_path / "cache")
+        options = {"build_args": ["A=1"], "target": None, "platform": None}
+        key = await cache.key(str(context), None, options)
+        assert key != await cache.key(str(context), None, {**options, "build_args": ["A=2"]})
+
+        images = {"app:1": "sha256:abc"}
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            if args[:2] == ("image", "inspect"):
+                if args[2] in images:
+                    return {"return_code": 0, "stdout": json.dumps([{"digest": images[args[2]]}])}
+                return {"return_code": 1, "stdout": ""}
+            if args[:2] == ("image", "tag"):
+                images[args[3]] = images[args[2]]
+                return {"return_code": 0, "stdout": ""}
+            raise AssertionError(args)
+
+        with patch("tools._common.build_cache.run_container_command", fake_command):
+            assert await cache.lookup(key, ["app:1"]) is None
+            await cache.record(key, ["app:1"], str(context))
+
+            entry = await cache.lookup(key, ["app:1", "app:latest"])
+            assert entry["digest"] == "sha256:abc"
+            assert ("image", "tag", "app:1", "app:latest") in commands
+
+            images["app:1"] = images["app:latest"] = "sha256:other"
+            assert await cache.lookup(key, ["app:1"]) is None
+
+            # A build recorded without a digest cannot tell its image from a retagged one
+            entry_path = tmp_path / "cache" / "builds" / f"{key}.json"
+            entry_path.write_text(json.dumps({**entry, "digest": ""}))
+            assert await cache.lookup(key, ["app:1"]) is None
+            images["app:2"] = ""
+            await cache.record(key, ["app:2"], str(context))
+            assert json.loads(entry_path.read_text())["digest"] == ""
+
+    @pytest.mark.asyncio
+    async def test_remote_context_is_not_cached(self, tmp_path):
+        """Verify contexts that are not local directories skip the cache."""
+        from tools._common.build_cache import BuildCache
+
+        cache = BuildCache(tmp_path / "cache")
+        assert await cache.key("https://example.com/repo.git", None, {}) is None
+
+
+class TestBuildMatrix:
+    """Test the parallel matrix build tool."""
+
+    @pytest.mark.asyncio
+    async def test_variants_run_within_budget(self, tmp_path):
+        """Verify variants run concurrently, capped by the cpu and memory budget."""
+        import asyncio
+        from tools._common.builder_manager import BuilderManager
+        from tools.container.build_matrix import acms_container_build_matrix
+
+        running = 0
+        peak = 0
+        commands = []
+
+        async def fake_command(*args):
+            nonlocal running, peak
+            commands.append(args)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            failed = "--target" in args and args[args.index("--target") + 1] == "debug"
+            return {
+                "stdout": "",
+                "stderr": "error: stage failed" if failed else "",
+                "return_code": 1 if failed else 0,
+                "command": " ".join(args),
+                "duration": 0.05,
+            }
+
+        async def builder_status(*args):
+            return {"stdout": "running", "stderr": "", "return_code": 0, "command": ""}
+
+        manager = BuilderManager(idle_timeout=0, shared_dir=None)
+        with patch("tools.container.build.run_container_command", fake_command), patch(
+            "tools.container.build.builder_manager", manager
+        ), patch("tools._common.builder_manager.run_container_command", builder_status):
+            output = await acms_container_build_matrix(
+                path=str(tmp_path),
+                platforms=["linux/arm64", "linux/amd64"],
+                targets=["prod", "debug"],
+                tag=["app:{target}-{arch}"],
+                cpus=4.0,
+                memory="8G",
+                variant_cpus=2.0,
+                variant_memory="1G",
+            )
+
+        assert len(commands) == 4
+        assert peak == 2
+        assert "2/4 variants succeeded, 2 in parallel" in output
+        assert "app:prod-amd64" in output
+        assert "linux/arm64/debug: error: stage failed" in output
+
+    @pytest.mark.asyncio
+    async def test_budget_defaults_to_builder_resources(self, tmp_path):
+        """Verify the parallelism budget comes from the builder the manager started."""
+        from tools._common.builder_manager import BuilderManager
+        from tools.container.build_matrix import acms_container_build_matrix
+
+        async def fake_command(*args):
+            stdout = "running" if args[:2] == ("builder", "status") else ""
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        manager = BuilderManager(idle_timeout=0, shared_dir=None)
+        with patch("tools.container.build.run_container_command", fake_command), patch(
+            "tools.container.build.builder_manager", manager
+        ), patch("tools.container.build_matrix.builder_manager", manager), patch(
+            "tools._common.builder_manager.run_container_command", fake_command
+        ):
+            manager.mark_running(True)
+            manager.started_by_manager = True
+            manager.resources = (6.0, "6G")
+            output = await acms_container_build_matrix(
+                path=str(tmp_path),
+                platforms=["linux/arm64", "linux/amd64", "linux/riscv64"],
+                variant_cpus=2.0,
+                variant_memory="2G",
+            )
+            assert "3/3 variants succeeded, 3 in parallel" in output
+
+            # Started outside ACMS: the container CLI defaults are assumed
+            manager.mark_running(False)
+            manager.mark_running(True)
+            output = await acms_container_build_matrix(
+                path=str(tmp_path),
+                platforms=["linux/arm64", "linux/amd64"],
+                variant_cpus=2.0,
+                variant_memory="1G",
+            )
+            assert "2/2 variants succeeded, 1 in parallel" in output
+
+    @pytest.mark.asyncio
+    async def test_colliding_tags_rejected(self):
+        """Verify tag templates must tell variants apart."""
+        from tools.container.build_matrix import acms_container_build_matrix
+
+        with pytest.raises(ValueError, match="collide"):
+            await acms_container_build_matrix(
+                platforms=["linux/arm64", "linux/amd64"], tag=["app:latest"]
+            )
+
+    @pytest.mark.asyncio
+    async def test_invalid_tag_templates_rejected(self):
+        """Verify unknown placeholders and stray braces are named in a ValueError."""
+        import re
+        from tools.container.build_matrix import acms_container_build_matrix
+
+        for template, bad in (("app:{tag}", "{tag}"), ("app:{0}", "{0}"), ("app:{}", "{}")):
+            with pytest.raises(ValueError, match=re.escape(bad)):
+                await acms_container_build_matrix(platforms=["linux/arm64"], tag=[template])
+        with pytest.raises(ValueError, match="Invalid tag template"):
+            await acms_container_build_matrix(platforms=["linux/arm64"], tag=["app:{arch"])
+
+    def test_parse_size(self):
+        """Verify container CLI sizes are parsed."""
+        from tools._common.utils import parse_size
+
+        assert parse_size("2048MB") == 2048 * 1024**2
+        assert parse_size("4G") == 4 * 1024**3
+        assert parse_size("512MiB") == 512 * 1024**2
+        with pytest.raises(ValueError):
+            parse_size("lots")
+
+
+
+
+class TestBuilderManager:
+    """Test on-demand builder start, idle stop and resource planning."""
+
+    @pytest.mark.asyncio
+    async def test_lazy_start_and_idle_stop(self, tmp_path):
+        """Verify the builder starts once for overlapping builds and stops when idle."""
+        import asyncio
+        from tools._common.builder_manager import BuilderManager
+
+        commands = []
+        builder = {"running": False}
+
+        async def fake_command(*args):
+            commands.append(args)
+            if args[:2] in (("builder", "start"), ("builder", "stop")):
+                builder["running"] = args[1] == "start"
+            stdout = "running" if builder["running"] else "not running"
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        manager = BuilderManager(idle_timeout=0.1, shared_dir=str(tmp_path))
+
+        async def build():
+            async with manager.session():
+                await asyncio.sleep(0.05)
+
+        with patch("tools._common.builder_manager.run_container_command", fake_command):
+            await asyncio.gather(build(), build())
+            assert [c[:2] for c in commands] == [("builder", "status"), ("builder", "start")]
+            assert manager.status()["running"] is True
+
+            # A new build within the idle period keeps the builder warm
+            await asyncio.sleep(0.05)
+            await build()
+            await asyncio.sleep(0.05)
+            assert ("builder", "stop") not in commands
+
+            await asyncio.sleep(0.15)
+            assert commands[-1] == ("builder", "stop")
+            assert manager.status()["running"] is False
+
+    @pytest.mark.asyncio
+    async def test_builder_stopped_elsewhere_is_restarted(self, tmp_path):
+        """Verify builds re-check the builder and only a builder the manager started is stopped."""
+        import asyncio
+        from tools._common.builder_manager import BuilderManager
+
+        commands = []
+        builder = {"running": True}
+
+        async def fake_command(*args):
+            commands.append(args)
+            if args[:2] in (("builder", "start"), ("builder", "stop")):
+                builder["running"] = args[1] == "start"
+            stdout = "running" if builder["running"] else "not running"
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        manager = BuilderManager(idle_timeout=0.05, shared_dir=str(tmp_path))
+        with patch("tools._common.builder_manager.run_container_command", fake_command):
+            # Already running: used, but left running when idle
+            async with manager.session():
+                pass
+            await asyncio.sleep(0.1)
+            assert ("builder", "stop") not in commands
+            assert manager.status()["started_by_manager"] is False
+
+            # Stopped by the user: the next build starts it again
+            builder["running"] = False
+            async with manager.session():
+                pass
+            assert commands[-1][:2] == ("builder", "start")
+            await asyncio.sleep(0.1)
+            assert commands[-1] == ("builder", "stop")
+
+    @pytest.mark.asyncio
+    async def test_busy_worker_blocks_idle_stop(self, tmp_path):
+        """Verify a builder in use by another worker is not stopped."""
+        import fcntl
+        from tools._common.builder_manager import BuilderManager
+
+        manager = BuilderManager(idle_timeout=0, shared_dir=str(tmp_path))
+        manager.mark_running(True)
+        await manager._acquire_busy()
+        manager._release_busy()
+        with manager._exclusive_when_idle() as idle:
+            assert idle is True
+
+        # Another worker holding the shared lock keeps the builder running
+        fd = os.open(tmp_path / "builder-busy.lock", os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            with manager._exclusive_when_idle() as idle:
+                assert idle is False
+        finally:
+            os.close(fd)
+
+    @pytest.mark.asyncio
+    async def test_session_waits_for_exclusive_lock_without_blocking(self, tmp_path):
+        """Verify a build waits for another worker's builder stop while the loop keeps running."""
+        import asyncio
+        import fcntl
+        from tools._common.builder_manager import BuilderManager
+
+        async def fake_command(*args):
+            return {"stdout": "running", "stderr": "", "return_code": 0, "command": ""}
+
+        manager = BuilderManager(idle_timeout=0, shared_dir=str(tmp_path))
+        fd = os.open(tmp_path / "builder-busy.lock", os.O_RDWR | os.O_CREAT)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        entered = asyncio.Event()
+
+        async def build():
+            async with manager.session():
+                entered.set()
+
+        with patch("tools._common.builder_manager.run_container_command", fake_command):
+            task = asyncio.create_task(build())
+            await asyncio.sleep(0.2)
+            assert not entered.is_set()
+            os.close(fd)
+            await asyncio.wait_for(task, timeout=2)
+        assert entered.is_set()
+
+    @pytest.mark.asyncio
+    async def test_builds_wait_for_builder_removal(self, tmp_path):
+        """Verify a build in another worker cannot start while the builder is being removed."""
+        import asyncio
+        from tools._common.builder_manager import BuilderManager
+
+        events = []
+        removing = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def fake_command(*args):
+            if args[:2] == ("builder", "rm"):
+                removing.set()
+                await finish.wait()
+            events.append(args[:2])
+            return {"stdout": "running", "stderr": "", "return_code": 0, "command": ""}
+
+        watcher_worker = BuilderManager(idle_timeout=0, shared_dir=str(tmp_path))
+        build_worker = BuilderManager(idle_timeout=0, shared_dir=str(tmp_path))
+
+        async def build():
+            async with build_worker.session():
+                events.append(("build",))
+
+        with patch("tools._common.builder_manager.run_container_command", fake_command):
+            removal = asyncio.create_task(watcher_worker.remove_when_idle())
+            await removing.wait()
+            building = asyncio.create_task(build())
+            await asyncio.sleep(0.3)
+            finish.set()
+            await asyncio.gather(removal, building)
+
+        assert events[0] == ("builder", "rm")
+        assert events[-1] == ("build",)
+
+    @pytest.mark.asyncio
+    async def test_status_json_has_no_manager_summary(self):
+        """Verify the manager summary is only appended to the table output."""
+        from tools.builder.status import acms_builder_status
+
+        async def fake_command(*args):
+            stdout = '{"status": "running"}' if "json" in args else "running"
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools.builder.status.run_container_command", fake_command):
+            table = await acms_builder_status()
+            as_json = await acms_builder_status(format="json")
+
+        assert "Builder manager:" in table
+        assert "Builder manager:" not in as_json
+        assert json.loads(as_json.split("Output:\n", 1)[1]) == {"status": "running"}
+
+    def test_plan_resources(self):
+        """Verify slow or overlapping builds grow the builder and quick serial ones shrink it."""
+        from collections import deque
+        from tools._common.builder_manager import plan_resources
+
+        assert plan_resources(deque([(300.0, 1), (200.0, 1)]), 2, 2, 8) == 4
+        assert plan_resources(deque([(30.0, 3)]), 4, 2, 8) == 8
+        assert plan_resources(deque([(300.0, 1)]), 8, 2, 8) == 8
+        assert plan_resources(deque([(5.0, 1), (8.0, 1)]), 8, 2, 8) == 4
+        assert plan_resources(deque([(5.0, 1)]), 2, 2, 8) == 2
+        assert plan_resources(deque(), 4, 2, 8) == 4
+
+
+
+
+class TestImageArchive:
+    """Test compressed, de-duplicated image archives."""
+
+    @staticmethod
+    def _layout(path, reference, layers):
+        """Write a minimal OCI layout tar for one reference."""
+        import hashlib
+        import io
+        import tarfile
+
+        def add(tar, name, data):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+        with tarfile.open(path, "w") as tar:
+            add(tar, "oci-layout", b'{"imageLayoutVersion": "1.0.0"}')
+            for data in layers:
+                add(tar, f"blobs/sha256/{hashlib.sha256(data).hexdigest()}", data)
+            manifest = json.dumps({"ref": reference}).encode()
+            digest = hashlib.sha256(manifest).hexdigest()
+            add(tar, f"blobs/sha256/{digest}", manifest)
+            index = {
+                "schemaVersion": 2,
+                "manifests": [
+                    {
+                        "digest": f"sha256:{digest}",
+                        "annotations": {"org.opencontainers.image.ref.name": reference},
+                    }
+                ],
+            }
+            add(tar, "index.json", json.dumps(index).encode())
+
+    @pytest.mark.asyncio
+    async def test_round_trip_deduplicates_layers(self, tmp_path):
+        """Verify shared layers are stored once and the archive loads back verified."""
+        import os as os_module
+        import tarfile
+        from tools.image.load import acms_image_load
+        from tools.image.save import acms_image_save
+
+        base = os_module.urandom(300_000)
+        layers = {"app:1": [base, b"one" * 1000], "app:2": [base, b"two" * 1000]}
+        loaded = {}
+
+        async def fake_command(*args):
+            if args[:2] == ("image", "save"):
+                self._layout(args[args.index("--output") + 1], args[-1], layers[args[-1]])
+            else:
+                with tarfile.open(args[-1]) as tar:
+                    loaded["names"] = tar.getnames()
+                    loaded["index"] = json.load(tar.extractfile("index.json"))
+            return {"stdout": "", "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        archive = tmp_path / "images.tar.zst"
+        with patch("tools._common.image_archive.run_container_command", fake_command), patch(
+            "tools._common.image_archive.CHUNK_SIZE", 64 * 1024
+        ):
+            output = await acms_image_save(
+                "app:1", output=str(archive), references=["app:2"], compress=True
+            )
+            assert "Saved 2 image(s)" in output
+            assert "Blobs: 5 (300000" in output
+            assert archive.stat().st_size < 2 * len(base)
+            assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+            output = await acms_image_load(str(archive))
+
+        assert "Verified 5 blobs" in output
+        assert loaded["names"].count("oci-layout") == 1
+        refs = [
+            m["annotations"]["org.opencontainers.image.ref.name"]
+            for m in loaded["index"]["manifests"]
+        ]
+        assert refs == ["app:1", "app:2"]
+
+    def test_corruption_detected(self, tmp_path):
+        """Verify a damaged chunk fails verification instead of loading."""
+        from pathlib import Path
+        from tools._common.image_archive import read_archive, write_archive
+
+        layout = tmp_path / "layout.tar"
+        self._layout(layout, "app:1", [b"layer" * 50_000])
+        archive = tmp_path / "app.tar.zst"
+        write_archive([layout], archive)
+
+        data = bytearray(archive.read_bytes())
+        data[len(data) // 2] ^= 0xFF
+        archive.write_bytes(bytes(data))
+        with pytest.raises(ValueError, match="corrupt|truncated"):
+            read_archive(archive, Path(tmp_path / "out.tar"))
+
+
+
+
+class TestImageGC:
+    """Test the LRU image garbage collector."""
+
+    def test_normalize_reference(self):
+        """Verify short references expand like the container CLI's."""
+        from tools._common.image_gc import normalize_reference
+
+        assert normalize_reference("alpine") == "docker.io/library/alpine:latest"
+        assert normalize_reference("user/app:1") == "docker.io/user/app:1"
+        assert normalize_reference("ghcr.io/org/app") == "ghcr.io/org/app:latest"
+        assert normalize_reference("localhost:5000/app:2") == "localhost:5000/app:2"
+
+    @pytest.mark.asyncio
+    async def test_plan_evicts_least_recently_used(self, tmp_path):
+        """Verify unused images are evicted oldest first, sparing in-use and kept images."""
+        from tools._common.image_gc import ImageUsage, execute_gc, plan_gc
+
+        usage = ImageUsage(tmp_path / "usage.json")
+        usage.touch(["alpine"])
+        usage.touch(["docker.io/library/nginx:latest", "docker.io/library/redis:7"])
+        data = json.loads((tmp_path / "usage.json").read_text())
+        data["docker.io/library/alpine:latest"] -= 100
+        (tmp_path / "usage.json").write_text(json.dumps(data))
+
+        gib = 1024**3
+        images = [
+            {"reference": "docker.io/library/alpine:latest", "fullSize": 1 * gib},
+            {"reference": "docker.io/library/nginx:latest", "fullSize": 2 * gib},
+            {"reference": "docker.io/library/redis:7", "fullSize": 3 * gib},
+            {"reference": "docker.io/library/python:3", "fullSize": 4 * gib},
+            {"reference": "docker.io/library/old:1", "fullSize": 1 * gib},
+        ]
+        containers = [{"configuration": {"image": {"reference": "python:3"}}, "status": "stopped"}]
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            outputs = {
+                ("image", "list"): images,
+                ("system", "df"): {"images": {"sizeInBytes": 11 * gib}},
+                ("list", "--all"): containers,
+            }
+            stdout = json.dumps(outputs.get(args[:2], ""))
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        with patch("tools._common.image_gc.run_container_command", fake_command):
+            plan = await plan_gc(7 * gib, keep=["nginx"], usage=usage)
+            evicted = [e["reference"] for e in plan["evict"]]
+            # Never-used first, then oldest; in-use python and kept nginx survive
+            assert evicted == [
+                "docker.io/library/old:1",
+                "docker.io/library/alpine:latest",
+                "docker.io/library/redis:7",
+            ]
+            assert plan["estimated_total"] == 6 * gib
+            assert plan["in_use"] == ["docker.io/library/python:3"]
+
+            outcome = await execute_gc(plan, usage=usage)
+
+        assert ("image", "rm", *evicted) in commands
+        assert outcome["removed"] == evicted
+        assert "docker.io/library/alpine:latest" not in usage.last_used()
+
+    @pytest.mark.asyncio
+    async def test_listed_images_sized_from_inspect(self, tmp_path):
+        """Verify index descriptor sizes are ignored and unknown sizes stop the plan."""
+        from tools._common.image_gc import ImageUsage, plan_gc
+
+        mib = 1024**2
+
+        def listed(reference):
+            return {
+                "reference": reference,
+                "descriptor": {
+                    "mediaType": "application/vnd.oci.image.index.v1+json",
+                    "digest": "sha256:" + "0" * 64,
+                    "size": 9218,
+                },
+            }
+
+        images = [listed("docker.io/library/alpine:latest"), listed("docker.io/library/big:1")]
+        inspected = [
+            {"name": "docker.io/library/alpine:latest", "variants": [{"size": 8 * mib}]},
+            {"name": "docker.io/library/big:1", "variants": [{"size": 300 * mib}, {"size": 200}]},
+        ]
+
+        async def fake_command(*args):
+            outputs = {
+                ("image", "list"): images,
+                ("image", "inspect"): inspected,
+                ("system", "df"): {"images": {"sizeInBytes": 308 * mib + 200}},
+                ("list", "--all"): [],
+            }
+            stdout = json.dumps(outputs.get(args[:2], ""))
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        usage = ImageUsage(tmp_path / "usage.json")
+        usage.touch(["alpine"])
+        with patch("tools._common.image_gc.run_container_command", fake_command):
+            plan = await plan_gc(100 * mib, usage=usage)
+            assert [e["reference"] for e in plan["evict"]] == ["docker.io/library/big:1"]
+            assert plan["estimated_total"] == 8 * mib
+            assert not plan["over_budget"]
+
+            inspected[1] = {"name": "docker.io/library/big:1"}
+            with pytest.raises(RuntimeError, match="big:1"):
+                await plan_gc(100 * mib, usage=usage)
+
+
+
+
+class TestDiskWatcher:
+    """Test the background disk watcher and its cleanup policies."""
+
+    @pytest.mark.asyncio
+    async def test_cleanup_runs_policies_until_under_low_water(self):
+        """Verify policies run in order above the high-water mark and stop below the low one."""
+        from tools._common.disk_watcher import DiskWatcher, Mark, render_metrics
+
+        gib = 1024**3
+        usage = {"images": 9 * gib, "containers": 2 * gib, "volumes": 1 * gib}
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            stdout = ""
+            if args[:2] == ("system", "df"):
+                stdout = json.dumps({k: {"sizeInBytes": v} for k, v in usage.items()})
+            elif args[0] == "list":
+                stdout = json.dumps(
+                    [
+                        {"configuration": {"id": "old"}, "status": "stopped"},
+                        {"configuration": {"id": "web"}, "status": "running"},
+                    ]
+                )
+            elif args[:2] == ("image", "prune"):
+                usage["images"] = 4 * gib
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        watcher = DiskWatcher(Mark("10G"), Mark("8G"), container_max_age=0, shared_dir=None)
+        with patch("tools._common.disk_watcher.run_container_command", fake_command):
+            await watcher.check()
+
+        actions = [c for c in commands if c[:2] != ("system", "df") and c[0] != "list"]
+        # Images freed enough, so the build cache survives
+        assert actions == [("rm", "old"), ("volume", "prune"), ("image", "prune")]
+        assert watcher.state["high_water_crossings"] == 1
+        assert watcher.state["actions"]["images"]["runs"] == 1
+        assert "build-cache" not in watcher.state["actions"]
+
+        with patch("tools._common.disk_watcher.disk_watcher", watcher):
+            metrics = render_metrics()
+        assert 'acms_disk_bytes{type="images"} 4294967296' in metrics
+        assert 'acms_disk_cleanup_actions_total{policy="volumes",outcome="ok"} 1' in metrics
+
+    @pytest.mark.asyncio
+    async def test_stopped_containers_age_from_first_sighting(self):
+        """Verify stopped containers are only removed once stopped for the configured age."""
+        from tools._common.disk_watcher import DiskWatcher, Mark
+
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            stdout = json.dumps([{"configuration": {"id": "job"}, "status": "stopped"}])
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        watcher = DiskWatcher(Mark("90%"), container_max_age=3600, shared_dir=None)
+        with patch("tools._common.disk_watcher.run_container_command", fake_command):
+            result = await watcher.run_policy("containers")
+            assert result.get("skipped")
+            watcher.stopped_since["job"] -= 3600
+            await watcher.run_policy("containers")
+
+        assert commands[-1] == ("rm", "job")
+        assert watcher.low.value == 80
+
+    @pytest.mark.asyncio
+    async def test_build_cache_kept_while_any_worker_uses_builder(self, tmp_path):
+        """Verify the builder is only removed once no worker has used it within the timeout."""
+        import fcntl
+        from tools._common.builder_manager import BuilderManager
+        from tools._common.disk_watcher import DiskWatcher, Mark
+
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            return {"stdout": "", "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        manager = BuilderManager(idle_timeout=0, shared_dir=str(tmp_path))
+        manager.mark_running(True)
+        await manager._acquire_busy()
+        manager._release_busy()
+        watcher = DiskWatcher(Mark("90%"), policies=["build-cache"], shared_dir=None)
+
+        with patch("tools._common.disk_watcher.builder_manager", manager), patch(
+            "tools._common.builder_manager.run_container_command", fake_command
+        ):
+            # Another worker is building
+            fd = os.open(tmp_path / "builder-busy.lock", os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                assert (await watcher.run_policy("build-cache")).get("skipped")
+            finally:
+                os.close(fd)
+            assert commands == []
+
+            await watcher.run_policy("build-cache")
+        assert commands == [("builder", "rm", "--force")]
+        assert manager.running is False
+
+    def test_growth_trend_and_marks(self):
+        """Verify the usage trend slope and mark validation."""
+        from tools._common.disk_watcher import DiskWatcher, Mark, growth_per_hour
+
+        assert growth_per_hour([(0, 0), (1800, 500), (3600, 1000)]) == pytest.approx(1000)
+        assert growth_per_hour([(0, 10)]) == 0.0
+        with pytest.raises(ValueError):
+            Mark("120%")
+        with pytest.raises(ValueError, match="same unit"):
+            DiskWatcher(Mark("90%"), Mark("10G"), shared_dir=None)
+        with pytest.raises(ValueError, match="Unknown"):
+            DiskWatcher(Mark("90%"), policies=["everything"], shared_dir=None)
+
+
+
+
+class TestLabelSelectors:
+    """Test label selector parsing and bulk operations."""
+
+    def test_selector_expressions(self):
+        """Verify equality, set-membership and existence requirements."""
+        from tools._common.selectors import LabelSelector
+
+        selector = LabelSelector.parse("job=1234, tier in (web, worker), !keep, owner")
+        assert selector.matches({"job": "1234", "tier": "web", "owner": "ci"})
+        assert not selector.matches({"job": "1234", "tier": "db", "owner": "ci"})
+        assert not selector.matches({"job": "1234", "tier": "web", "owner": "ci", "keep": ""})
+        assert not selector.matches({"job": "1234", "tier": "web"})
+
+        assert LabelSelector.parse("env!=prod").matches({})
+        assert LabelSelector.parse("env notin (prod,stage)").matches({"env": "dev"})
+        assert LabelSelector.parse("a==b").matches({"a": "b"})
+        for invalid in ("", "job=1,,", "tier in ()", "=value"):
+            with pytest.raises(ValueError):
+                LabelSelector.parse(invalid)
+
+    def test_labels_found_in_nested_entries(self):
+        """Verify labels are read from mappings or key=value lists at any depth."""
+        from tools._common.selectors import labels_of
+
+        assert labels_of({"configuration": {"labels": {"job": "1"}}}) == {"job": "1"}
+        assert labels_of({"config": {"Labels": ["a=b", "flag"]}}) == {"a": "b", "flag": ""}
+        assert labels_of({"reference": "alpine"}) is None
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete_resolves_from_one_listing_per_kind(self):
+        """Verify one listing per kind, containers removed before volumes and networks."""
+        from tools.system.select import acms_system_select
+
+        listings = {
+            ("list",): [
+                {"configuration": {"id": "web", "labels": {"job": "7"}}, "status": "running"},
+                {"configuration": {"id": "db", "labels": {"job": "8"}}, "status": "running"},
+            ],
+            ("image", "ls"): [{"reference": "app:7"}, {"reference": "base:1"}],
+            ("image", "inspect"): [
+                {"config": {"Labels": {"job": "7"}}},
+                {"config": {"Labels": {}}},
+            ],
+            ("volume", "ls"): [{"name": "data-7", "labels": {"job": "7"}}],
+            ("network", "ls"): [{"id": "net-7", "configuration": {"labels": {"job": "7"}}}],
+        }
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            key = args[:1] if args[0] == "list" else args[:2]
+            failed = args[:2] == ("volume", "rm")
+            return {
+                "stdout": json.dumps(listings.get(key, "")),
+                "stderr": "Error: volume in use" if failed else "",
+                "return_code": 1 if failed else 0,
+                "command": " ".join(args),
+            }
+
+        with patch("tools._common.resources.run_container_command", fake_command), patch(
+            "tools.system.select.run_container_command", fake_command
+        ):
+            output = await acms_system_select("job=7", action="delete", force=True)
+
+        mutations = [c for c in commands if c[-2:] != ("--format", "json") and c[1] != "inspect"]
+        assert mutations[0] == ("rm", "--force", "web")
+        assert set(mutations[1:]) == {
+            ("image", "rm", "app:7"),
+            ("volume", "rm", "data-7"),
+            ("network", "rm", "net-7"),
+        }
+        assert sum(1 for c in commands if c[-1] == "json") == 4
+        assert "matched 4 resources" in output
+        assert "Deleted 3 of 4" in output
+        assert "failed volume data-7: Error: volume in use" in output
+
+    @pytest.mark.asyncio
+    async def test_negative_selectors_cannot_act_on_everything(self):
+        """Verify stop/delete need a positive requirement and image labels must resolve."""
+        from tools._common.resources import list_resources
+        from tools.system.select import acms_system_select
+
+        commands = []
+
+        async def fake_command(*args):
+            commands.append(args)
+            stdout = [{"reference": "alpine"}, {"reference": "busybox"}]
+            if args[:2] == ("image", "inspect"):
+                stdout = [{"config": {"Labels": {}}}]
+            return {"stdout": json.dumps(stdout), "stderr": "", "return_code": 0, "command": ""}
+
+        for selector in ("!keep", "env!=prod", "env notin (prod)"):
+            for action in ("stop", "delete"):
+                with pytest.raises(ValueError, match="no =, in or exists"):
+                    await acms_system_select(selector, action=action)
+        assert commands == []
+
+        with patch("tools._common.resources.run_container_command", fake_command):
+            with pytest.raises(RuntimeError, match="cannot resolve image labels"):
+                await list_resources("image")
+
+
+
+
+class TestApply:
+    """Test declarative convergence with acms_apply."""
+
+    @staticmethod
+    def _fake_cli(state, commands):
+        """Return a fake container CLI that keeps containers, volumes and networks in state."""
+
+        def labels(args):
+            return dict(args[i + 1].split("=", 1) for i, a in enumerate(args) if a == "--label")
+
+        async def fake_command(*args):
+            commands.append(args)
+            stdout = ""
+            if args == ("list", "--all", "--format", "json"):
+                stdout = json.dumps(
+                    [
+                        {"configuration": {"id": n, "labels": c["labels"]}, "status": c["status"]}
+                        for n, c in state["container"].items()
+                    ]
+                )
+            elif args[1:] == ("ls", "--format", "json"):
+                stdout = json.dumps(
+                    [{"name": n, "id": n, "labels": l} for n, l in state[args[0]].items()]
+                )
+            elif args[0] in ("run", "create"):
+                name = args[args.index("--name") + 1]
+                status = "running" if args[0] == "run" else "stopped"
+                state["container"][name] = {"labels": labels(args), "status": status}
+            elif args[0] == "rm":
+                state["container"].pop(args[-1])
+            elif args[0] in ("start", "stop"):
+                status = "running" if args[0] == "start" else "stopped"
+                state["container"][args[1]]["status"] = status
+            elif args[1] == "create":
+                state[args[0]][args[-1]] = labels(args)
+            elif args[1] == "rm":
+                state[args[0]].pop(args[-1])
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": " ".join(args)}
+
+        return fake_command
+
+    @pytest.mark.asyncio
+    async def test_apply_converges_and_reapply_is_a_single_read(self):
+        """Verify dependency order, no-op re-apply, recreation on change and removal."""
+        from tools.system.apply import acms_apply
+
+        state = {"container": {}, "volume": {}, "network": {}}
+        commands = []
+        spec = {
+            "networks": {"backend": {}},
+            "volumes": {"data": {"size": "1G"}},
+            "containers": {
+                "db": {
+                    "image": "postgres:16",
+                    "volumes": ["data:/var/lib/db"],
+                    "network": "backend",
+                },
+                "web": {"image": "nginx", "network": "backend", "depends_on": ["db"]},
+            },
+        }
+
+        fake = self._fake_cli(state, commands)
+        with patch("tools._common.resources.run_container_command", fake), patch(
+            "tools._common.converge.run_container_command", fake
+        ):
+            output = await acms_apply(spec, project="demo")
+            assert "4 of 4 operations succeeded" in output
+            mutations = [c[:2] for c in commands if "--format" not in c]
+            assert mutations.index(("run", "--detach")) > mutations.index(("network", "create"))
+            assert mutations.index(("run", "--detach")) > mutations.index(("volume", "create"))
+            runs = [c[c.index("--name") + 1] for c in commands if c[0] == "run"]
+            assert runs == ["db", "web"]
+
+            commands.clear()
+            assert await acms_apply(json.dumps(spec), project="demo") == (
+                "Project 'demo' is up to date"
+            )
+            assert len(commands) == 3
+
+            commands.clear()
+            spec["containers"]["web"]["image"] = "nginx:1.27"
+            spec["containers"]["db"]["state"] = "stopped"
+            del spec["volumes"]
+            spec["containers"]["db"]["volumes"] = []
+            output = await acms_apply(spec, project="demo", dry_run=True)
+            assert "remove container web to recreate it" in output
+            # db's volumes changed too, so it is recreated stopped rather than stopped
+            assert "remove container db to recreate it" in output
+            assert "create container db" in output
+            assert "delete volume data" in output
+            assert not [c for c in commands if "--format" not in c]
+
+            await acms_apply(spec, project="demo")
+            mutations = [c for c in commands if "--format" not in c]
+            assert mutations.index(("volume", "rm", "data")) > mutations.index(
+                ("rm", "--force", "db")
+            )
+            assert state["container"]["db"]["status"] == "stopped"
+            assert state["container"]["web"]["labels"]["acms.apply.project"] == "demo"
+            assert "data" not in state["volume"]
+
+    @pytest.mark.asyncio
+    async def test_apply_rejects_invalid_specs(self):
+        """Verify cycles, undefined dependencies and foreign containers are rejected."""
+        from tools._common.converge import validate_spec
+        from tools.system.apply import acms_apply
+
+        with pytest.raises(ValueError, match="cycle"):
+            validate_spec(
+                {
+                    "containers": {
+                        "a": {"image": "x", "depends_on": ["b"]},
+                        "b": {"image": "x", "depends_on": "a"},
+                    }
+                }
+            )
+        with pytest.raises(ValueError, match="undefined"):
+            validate_spec({"containers": {"a": {"image": "x", "depends_on": ["z"]}}})
+        with pytest.raises(ValueError, match="image is required"):
+            validate_spec({"containers": {"a": {}}})
+
+        state = {
+            "container": {"web": {"labels": {}, "status": "running"}},
+            "volume": {},
+            "network": {},
+        }
+        fake = self._fake_cli(state, [])
+        with patch("tools._common.resources.run_container_command", fake):
+            with pytest.raises(ValueError, match="not managed by project"):
+                await acms_apply({"containers": {"web": {"image": "nginx"}}}, project="demo")
+
+
+
+
+class TestIdempotencyKeys:
+    """Test idempotency keys on mutating tool calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_retries_run_once(self):
+        """Verify retries with the same key attach to the running call."""
+        import asyncio
+        from tools._common.idempotency import IdempotencyStore
+
+        store = IdempotencyStore()
+        release = asyncio.Event()
+        runs = []
+
+        async def call():
+            runs.append(1)
+            await release.wait()
+            return "created"
+
+        first = asyncio.ensure_future(store.run("k", "fp", call))
+        second = asyncio.ensure_future(store.run("k", "fp", call))
+        await asyncio.sleep(0)
+        assert store.stats()["running"] == 1
+        release.set()
+        assert await first == "created"
+        assert await second == "created"
+        assert await store.run("k", "fp", call) == "created"
+        assert len(runs) == 1
+        assert store.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_key_reuse_and_failures(self):
+        """Verify a reused key with other arguments is rejected and failures are forgotten."""
+        from tools._common.idempotency import IdempotencyStore
+
+        store = IdempotencyStore()
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("transient")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", flaky)
+        assert await store.run("k", "fp", flaky) == "ok"
+        with pytest.raises(ValueError, match="different tool call"):
+            await store.run("k", "other", flaky)
+        assert len(attempts) == 2
+
+    @pytest.mark.asyncio
+    async def test_expired_and_capped_entries_are_dropped(self):
+        """Verify finished results expire after the TTL and beyond the key cap."""
+        from tools._common.idempotency import IdempotencyStore
+
+        store = IdempotencyStore(ttl=0)
+        runs = []
+
+        async def call():
+            runs.append(1)
+            return len(runs)
+
+        assert await store.run("k", "fp", call) == 1
+        assert await store.run("k", "fp", call) == 2
+
+        capped = IdempotencyStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            await capped.run(key, "fp", call)
+        capped._expire()
+        assert capped.stats()["keys"] == 2
+
+    @pytest.mark.asyncio
+    async def test_middleware_advertises_and_strips_key(self):
+        """Verify mutating tools accept idempotency_key and retries do not rerun the tool."""
+        import fastmcp
+        from tools._common.idempotency import IdempotencyStore
+        from tools._common.idempotency_middleware import IdempotencyMiddleware
+
+        mcp = fastmcp.FastMCP("ACMS")
+        mcp.add_middleware(IdempotencyMiddleware(IdempotencyStore()))
+        calls = []
+
+        @mcp.tool(annotations={"readOnlyHint": False})
+        async def create_thing(name: str) -> str:
+            calls.append(name)
+            return f"created {name} #{len(calls)}"
+
+        @mcp.tool(annotations={"readOnlyHint": True})
+        async def list_things() -> str:
+            return f"{len(calls)} things"
+
+        async with fastmcp.Client(mcp) as client:
+            tools = {t.name: t for t in await client.list_tools()}
+            assert "idempotency_key" in tools["create_thing"].inputSchema["properties"]
+            assert "idempotency_key" not in tools["list_things"].inputSchema["properties"]
+
+            args = {"name": "web", "idempotency_key": "req-1"}
+            first = await client.call_tool("create_thing", args)
+            retry = await client.call_tool("create_thing", args)
+            assert first.data == retry.data == "created web #1"
+            fresh = await client.call_tool("create_thing", {"name": "web"})
+            assert fresh.data == "created web #2"
+            with pytest.raises(Exception, match="different tool call"):
+                await client.call_tool("create_thing", {"name": "db", "idempotency_key": "req-1"})
+        assert calls == ["web", "web"]
+
+    @pytest.mark.asyncio
+    async def test_keys_are_scoped_per_user(self):
+        """Verify two users of the same OAuth client never share an idempotency key."""
+        import fastmcp
+        from fastmcp.server.auth.auth import AccessToken
+        from tools._common.idempotency import IdempotencyStore
+        from tools._common.idempotency_middleware import IdempotencyMiddleware
+
+        mcp = fastmcp.FastMCP("ACMS")
+        mcp.add_middleware(IdempotencyMiddleware(IdempotencyStore()))
+        calls = []
+
+        @mcp.tool(annotations={"readOnlyHint": False})
+        async def create_thing(name: str) -> str:
+            calls.append(name)
+            return f"created {name} #{len(calls)}"
+
+        def user(oid):
+            return AccessToken(
+                token=f"token-{oid}",
+                client_id="acms-app",
+                scopes=[],
+                claims={"azp": "acms-app", "oid": oid, "sub": f"pairwise-{oid}"},
+            )
+
+        args = {"name": "web", "idempotency_key": "retry-1"}
+        token = {"current": user("alice")}
+        with patch(
+            "fastmcp.server.dependencies.get_access_token", side_effect=lambda: token["current"]
+        ):
+            async with fastmcp.Client(mcp) as client:
+                alice = await client.call_tool("create_thing", args)
+                token["current"] = user("bob")
+                bob = await client.call_tool("create_thing", args)
+                bob_retry = await client.call_tool("create_thing", args)
+
+        assert alice.data == "created web #1"
+        assert bob.data == bob_retry.data == "created web #2"
+
+
+
+
+class TestListPagination:
+    """Test cursor pagination over list snapshots."""
+
+    @pytest.mark.asyncio
+    async def test_pages_come_from_one_snapshot(self):
+        """Verify pages follow the cursor without re-running the listing."""
+        from tools.container.list import acms_container_list
+
+        entries = [{"configuration": {"id": f"c{i}"}, "status": "running"} for i in range(5)]
+        calls = []
+
+        async def fake(*args, **kwargs):
+            calls.append(args)
+            return {"stdout": json.dumps(entries), "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            first = json.loads(await acms_container_list(all=True, limit=2))
+            entries.append({"configuration": {"id": "late"}})
+            second = json.loads(await acms_container_list(cursor=first["next_cursor"]))
+            last = json.loads(
+                await acms_container_list(quiet=True, cursor=second["next_cursor"], limit=10)
+            )
+
+        assert calls == [("list", "--all", "--format", "json")]
+        assert [e["configuration"]["id"] for e in first["items"] + second["items"]] == [
+            "c0",
+            "c1",
+            "c2",
+            "c3",
+        ]
+        assert first["total"] == 5
+        assert last == {"items": ["c4"], "total": 5, "next_cursor": None}
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursors_and_limits(self):
+        """Verify cursors are checked against their snapshot and tool."""
+        from tools._common.pagination import SnapshotStore, Snapshot, list_page
+        from tools.image.list import acms_image_list
+        from tools.volume.list import acms_volume_list
+
+        async def fake(*args, **kwargs):
+            stdout = json.dumps([{"name": "v1"}, {"name": "v2"}])
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            page = json.loads(await acms_volume_list(limit=1))
+            with pytest.raises(ValueError, match="not valid for this tool"):
+                await acms_image_list(cursor=page["next_cursor"])
+            with pytest.raises(ValueError, match="malformed"):
+                await acms_volume_list(cursor="nonsense")
+            with pytest.raises(ValueError, match="limit must be"):
+                await list_page("volume", [], limit=0)
+
+        store = SnapshotStore(ttl=0)
+        sid = store.add(Snapshot("volume", [], 1))
+        with pytest.raises(ValueError, match="expired"):
+            store.get("volume", sid)
+        capped = SnapshotStore(max_snapshots=1)
+        capped.add(Snapshot("volume", [], 1))
+        capped.add(Snapshot("volume", [], 1))
+        assert len(capped) == 1
+
+
+
+
+class TestFilterProjection:
+    """Test server-side filters and field projection on list and inspect output."""
+
+    CONTAINERS = [
+        {
+            "status": "running",
+            "configuration": {
+                "id": "web-1",
+                "image": {"reference": "docker.io/library/nginx:latest"},
+                "labels": {"tier": "web"},
+            },
+            "networks": [{"address": "192.168.64.2/24"}],
+        },
+        {
+            "status": "stopped",
+            "configuration": {
+                "id": "web-2",
+                "image": {"reference": "docker.io/library/nginx:latest"},
+                "labels": {"tier": "web", "keep": "1"},
+            },
+        },
+        {
+            "status": "running",
+            "configuration": {
+                "id": "db",
+                "image": {"reference": "docker.io/library/postgres:16"},
+                "labels": {"tier": "db"},
+            },
+        },
+    ]
+
+    def test_filter_expressions(self):
+        """Verify keys are ANDed, repeated keys ORed and label filters use selectors."""
+        from tools._common.projection import EntryFilter, select
+
+        def ids(expressions):
+            entries = select("container", self.CONTAINERS, EntryFilter.parse(expressions))
+            return [e["configuration"]["id"] for e in entries]
+
+        assert ids(["state=Running"]) == ["web-1", "db"]
+        assert ids(["name=web-*", "state=running"]) == ["web-1"]
+        assert ids(["image=*postgres*", "image=*nginx*"]) == ["web-1", "web-2", "db"]
+        assert ids(["label=tier=web", "label=!keep"]) == ["web-1"]
+        assert ids("label=tier in (db)") == ["db"]
+        assert EntryFilter.parse(None) is None
+        with pytest.raises(ValueError, match="Invalid filter"):
+            EntryFilter.parse(["status=running"])
+
+    def test_projection(self):
+        """Verify computed fields and dotted paths, in the order requested."""
+        from tools._common.projection import parse_fields, select
+
+        projected = select(
+            "container",
+            self.CONTAINERS[:1],
+            fields=parse_fields(["id", "state", "image", "networks.0.address", "missing"]),
+        )
+        assert projected == [
+            {
+                "id": "web-1",
+                "state": "running",
+                "image": "docker.io/library/nginx:latest",
+                "networks.0.address": "192.168.64.2/24",
+                "missing": None,
+            }
+        ]
+        assert list(projected[0]) == ["id", "state", "image", "networks.0.address", "missing"]
+
+    @pytest.mark.asyncio
+    async def test_list_and_inspect_tools(self):
+        """Verify the tools filter and project the parsed JSON, paged or not."""
+        from tools.container.inspect import acms_container_inspect
+        from tools.container.list import acms_container_list
+
+        async def fake(*args, **kwargs):
+            stdout = json.dumps(self.CONTAINERS if args[0] == "list" else self.CONTAINERS[2:])
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            listed = json.loads(
+                await acms_container_list(all=True, filter="image=*nginx*", fields=["id", "state"])
+            )
+            paged = json.loads(
+                await acms_container_list(all=True, filter="label=tier=web", fields="id", limit=1)
+            )
+            inspected = json.loads(await acms_container_inspect("db", fields="labels"))
+
+        assert listed == [{"id": "web-1", "state": "running"}, {"id": "web-2", "state": "stopped"}]
+        assert paged["total"] == 2 and paged["items"] == [{"id": "web-1"}]
+        assert inspected == [{"labels": {"tier": "db"}}]
+
+
+
+
+class TestColumnarEncoding:
+    """Test the columnar encoding of list and stats results."""
+
+    def test_round_trip_with_dictionaries(self):
+        """Verify nested records flatten to columns and repeated strings are dictionary-encoded."""
+        from tools._common.columnar import decode_columnar, encode_columnar, flatten
+
+        records = [
+            {"status": "running", "configuration": {"id": f"c{i}", "image": {"reference": "nginx"}}}
+            for i in range(3)
+        ] + [{"status": "stopped", "configuration": {"id": "db"}, "networks": []}]
+        table = encode_columnar(records)
+
+        assert table["columns"] == [
+            "status",
+            "configuration.id",
+            "configuration.image.reference",
+            "networks",
+        ]
+        assert table["dictionaries"] == {
+            "status": ["running", "stopped"],
+            "configuration.image.reference": ["nginx"],
+        }
+        assert table["rows"][0] == [0, "c0", 0, None]
+        assert table["rows"][3] == [1, "db", None, []]
+        decoded = decode_columnar(table)
+        assert decoded[0] == {**flatten(records[0]), "networks": None}
+        assert decoded[3] == {**flatten(records[3]), "configuration.image.reference": None}
+
+    @pytest.mark.asyncio
+    async def test_list_returns_structured_table(self):
+        """Verify only columnar listings reach clients as structured content too."""
+        import fastmcp
+        from tools.container import list as container_list
+
+        entries = [
+            {"status": "running", "configuration": {"id": f"c{i}", "image": {"reference": "nginx"}}}
+            for i in range(4)
+        ]
+
+        async def fake(*args, **kwargs):
+            return {"stdout": json.dumps(entries), "stderr": "", "return_code": 0, "command": ""}
+
+        mcp = fastmcp.FastMCP("ACMS")
+        container_list.register(mcp)
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            async with fastmcp.Client(mcp) as client:
+                result = await client.call_tool(
+                    "acms_container_list", {"encoding": "columnar", "limit": 3}
+                )
+                records = await client.call_tool("acms_container_list", {"fields": ["id"]})
+
+        table = result.data
+        assert table["columns"] == ["status", "configuration.id", "configuration.image.reference"]
+        assert len(table["rows"]) == 3 and table["total"] == 4 and table["next_cursor"]
+        assert json.loads(result.content[0].text) == table
+        assert json.loads(records.content[0].text) == [{"id": f"c{i}"} for i in range(4)]
+        # Text results are not repeated as structured content
+        assert records.structured_content is None
+
+    @pytest.mark.asyncio
+    async def test_stats_columnar_snapshot(self):
+        """Verify columnar stats take one JSON snapshot."""
+        from tools.container.stats import acms_container_stats
+
+        calls = []
+
+        async def fake(*args, **kwargs):
+            calls.append(args)
+            stdout = json.dumps([{"id": "a", "cpuUsageUsec": 10}, {"id": "b", "cpuUsageUsec": 20}])
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            table = await acms_container_stats(containers=["a", "b"], encoding="columnar")
+            with pytest.raises(ValueError, match="encoding must be"):
+                await acms_container_stats(encoding="csv")
+
+        assert calls == [("stats", "--format", "json", "--no-stream", "a", "b")]
+        assert table == {
+            "columns": ["id", "cpuUsageUsec"],
+            "rows": [["a", 10], ["b", 20]],
+            "dictionaries": {},
+        }
+
+
+
+
+class TestOutputBudget:
+    """Test output budgets with repeated-line collapsing and head/tail truncation."""
+
+    def test_compact_output(self):
+        """Verify near-identical runs collapse and the head and tail are kept."""
+        from tools._common.output_budget import compact_output
+
+        data = (
+            b"start\n"
+            + b"".join(b"warning: deprecated call at line %d\n" % i for i in range(5000))
+            + b"".join(b"step %d of 300: %s\n" % (i, b"x" * (i % 7)) for i in range(300))
+            + b"done"
+        )
+        compacted, changed = compact_output(data, 1024)
+        lines = compacted.decode().splitlines()
+
+        assert changed and len(compacted) < 1200
+        assert lines[:3] == [
+            "start",
+            "warning: deprecated call at line 0",
+            "[... 4999 similar lines collapsed ...]",
+        ]
+        assert any(line.endswith("omitted ...]") for line in lines)
+        assert lines[-1] == "done" and not compacted.endswith(b"\n")
+        assert compact_output(b"short\n", 1024) == (b"short\n", False)
+
+        long_line, _ = compact_output(b"x" * 5000 + b"\nend\n", 400)
+        assert long_line.startswith(b"x" * 200 + b"...\n") and long_line.endswith(b"end\n")
+
+    def test_format_command_result_budget(self):
+        """Verify the budget applies explicitly or for the current call."""
+        from tools._common.output_budget import output_budget
+        from tools._common.utils import format_command_result
+
+        stdout = b"".join(b"pulling layer %d\n" % i for i in range(2000))
+        result = {
+            "stdout": stdout.decode(),
+            "stderr": "",
+            "return_code": 0,
+            "command": "container image pull big",
+        }
+        assert format_command_result(result) == format_command_result(result, 0)
+        assert len(format_command_result(result)) > len(stdout)
+
+        explicit = format_command_result(result, max_output_bytes=512)
+        assert "pulling layer 0\n[... 1999 similar lines collapsed ...]" in explicit
+
+        # The call's budget is never applied implicitly, so JSON output stays whole
+        listing = {**result, "stdout": json.dumps([{"id": f"c{i}"} for i in range(500)])}
+        with output_budget(512):
+            assert json.loads(format_command_result(listing).split("Output:\n", 1)[1])
+        with pytest.raises(ValueError, match="at least"):
+            format_command_result(result, max_output_bytes=10)
+
+    @pytest.mark.asyncio
+    async def test_command_output_compacted_before_decoding(self):
+        """Verify logs are compacted as bytes and only the kept output is decoded."""
+        from tools._common.output_budget import output_budget
+        from tools.container.logs import acms_container_logs
+
+        stdout = b"".join(b"tick %d\n" % i for i in range(5000))
+
+        class FakeProcess:
+            pid = 4242
+            returncode = 0
+
+            async def communicate(self):
+                return stdout, b""
+
+        async def fake_exec(*args, **kwargs):
+            return FakeProcess()
+
+        with patch("asyncio.create_subprocess_exec", fake_exec), patch(
+            "tools._common.utils.apply_budget"
+        ) as second_pass:
+            with output_budget(300):
+                output = await acms_container_logs("web")
+            full = await acms_container_logs("web")
+
+        assert "tick 0\n[... 4999 similar lines collapsed ...]" in output
+        assert len(output) < 600
+        assert "tick 4999" in full
+        # Already within the call's budget, so the result is not compacted again
+        second_pass.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_middleware_applies_budget_per_call(self):
+        """Verify budgeted tools advertise max_output_bytes and the argument is stripped."""
+        import fastmcp
+        from tools._common.output_budget import current_budget
+        from tools._common.output_budget_middleware import OutputBudgetMiddleware
+        from tools._common.utils import format_command_result
+
+        mcp = fastmcp.FastMCP("ACMS")
+        mcp.add_middleware(OutputBudgetMiddleware(tools={"logs"}))
+
+        @mcp.tool
+        async def logs() -> str:
+            stdout = "".join(f"tick {i}\n" for i in range(1000))
+            return format_command_result(
+                {"stdout": stdout, "stderr": "", "return_code": 0, "command": "container logs"},
+                current_budget(),
+            )
+
+        @mcp.tool
+        async def listing() -> str:
+            return "[]"
+
+        async with fastmcp.Client(mcp) as client:
+            tools = {tool.name: tool for tool in await client.list_tools()}
+            assert "max_output_bytes" in tools["logs"].inputSchema["properties"]
+            assert "max_output_bytes" not in tools["listing"].inputSchema["properties"]
+            full = await client.call_tool("logs", {})
+            budgeted = await client.call_tool("logs", {"max_output_bytes": 300})
+
+        assert "tick 999" in full.data and "collapsed" not in full.data
+        assert "[... 999 similar lines collapsed ...]" in budgeted.data
+
+
+
+
+class TestDeltaResponses:
+    """Test version tokens and deltas for polled listings."""
+
+    @pytest.mark.asyncio
+    async def test_container_list_polling(self):
+        """Verify polling returns the full state, then not_modified, then only changes."""
+        from tools.container.list import acms_container_list
+
+        state = {
+            "web": {"status": "running", "configuration": {"id": "web"}},
+            "db": {"status": "running", "configuration": {"id": "db"}},
+        }
+
+        async def fake(*args, **kwargs):
+            stdout = json.dumps(list(state.values()))
+            return {"stdout": stdout, "stderr": "", "return_code": 0, "command": ""}
+
+        async def poll(since):
+            return json.loads(await acms_container_list(all=True, fields=["state"], since=since))
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            full = await poll("")
+            same = await poll(full["version"])
+            state["db"]["status"] = "stopped"
+            state["cache"] = {"status": "running", "configuration": {"id": "cache"}}
+            del state["web"]
+            delta = await poll(full["version"])
+            unknown = await poll("stale-token")
+            with pytest.raises(ValueError, match="cannot be combined"):
+                await acms_container_list(since="", limit=5)
+
+        assert full["full"] and full["items"] == {
+            "web": {"state": "running"},
+            "db": {"state": "running"},
+        }
+        assert same == {"version": full["version"], "not_modified": True}
+        assert delta["version"] != full["version"]
+        assert delta["added"] == {"cache": {"state": "running"}}
+        assert delta["changed"] == {"db": {"state": "stopped"}}
+        assert delta["removed"] == ["web"]
+        assert unknown["full"] and unknown["version"] == delta["version"]
+
+    @pytest.mark.asyncio
+    async def test_stats_polling_and_version_scope(self):
+        """Verify stats deltas and that versions do not cross queries."""
+        from tools._common.deltas import VersionStore, delta_json
+        from tools.container.stats import acms_container_stats
+
+        stats = [{"id": "a", "cpuUsageUsec": 1}, {"id": "b", "cpuUsageUsec": 5}]
+
+        async def fake(*args, **kwargs):
+            return {"stdout": json.dumps(stats), "stderr": "", "return_code": 0, "command": ""}
+
+        with patch("tools._common.resources.run_container_command", side_effect=fake):
+            first = json.loads(await acms_container_stats(since=""))
+            stats[0] = {"id": "a", "cpuUsageUsec": 2}
+            second = json.loads(await acms_container_stats(since=first["version"]))
+
+        assert second["changed"] == {"a": {"id": "a", "cpuUsageUsec": 2}}
+        assert second["added"] == {} and second["removed"] == []
+
+        other = json.loads(delta_json("other query", {"a": 1}, first["version"]))
+        assert other["full"]
+        store = VersionStore(ttl=0)
+        store.remember("v", "scope", {})
+        assert store.get("v", "scope") is None and len(store) == 0
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
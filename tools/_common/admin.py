@@ -0,0 +1,159 @@
+"""
+Authenticated admin HTTP routes for diagnosing a running ACMS server.
+"""
+from typing import Optional
+import logging
+import hmac
+import time
+import os
+
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.requests import Request
+
+from tools._common.disk_watcher import render_metrics as render_disk_metrics
+from tools._common.profiler import DEFAULT_INTERVAL, dump_asyncio_tasks, profile
+from tools._common.utils import get_command_stats
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+ADMIN_TOKEN = os.getenv("ACMS_ADMIN_TOKEN")  # Static bearer token for admin routes
+ADMIN_SCOPE = os.getenv("ACMS_ADMIN_SCOPE")  # OAuth scope that also grants admin routes
+PROFILE_MAX_SECONDS = int(os.getenv("ACMS_PROFILE_MAX_SECONDS", "60"))
+
+# Only one profile runs at a time per process
+_profile_running = False
+
+
+async def _authorized(request: Request, auth) -> bool:
+    """
+    Check the request's bearer token against ACMS_ADMIN_TOKEN or the OAuth provider.
+
+    OAuth tokens are only accepted when ACMS_ADMIN_SCOPE is configured and
+    granted; being allowed to call tools does not grant admin access.
+
+    Args:
+        request: Incoming request
+        auth: FastMCP auth provider, or None when authentication is disabled
+
+    Returns:
+        True if the caller may use admin routes
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+
+    if ADMIN_TOKEN and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return True
+
+    if auth is not None and ADMIN_SCOPE:
+        access_token = await auth.verify_token(token)
+        return access_token is not None and ADMIN_SCOPE in access_token.scopes
+    return False
+
+
+def register_admin_routes(mcp) -> bool:
+    """
+    Register the admin routes on a FastMCP server.
+
+    Routes are only registered when callers can authenticate, either with
+    ACMS_ADMIN_TOKEN or with an OAuth token granted ACMS_ADMIN_SCOPE.
+
+    Args:
+        mcp: FastMCP server instance
+
+    Returns:
+        True if the routes were registered
+    """
+    auth = mcp.auth
+    if not ADMIN_TOKEN and (auth is None or not ADMIN_SCOPE):
+        logger.debug("Admin routes disabled: set ACMS_ADMIN_TOKEN or ACMS_ADMIN_SCOPE with auth")
+        return False
+
+    @mcp.custom_route("/admin/profile", methods=["GET"], include_in_schema=False)
+    async def admin_profile(request: Request) -> Response:
+        """
+        Sample this process and return collapsed stacks.
+
+        Query parameters:
+            seconds: Sampling duration (default 10, at most ACMS_PROFILE_MAX_SECONDS)
+            interval_ms: Milliseconds between samples (default 5)
+            tasks: When true, return JSON with the collapsed stacks and an asyncio task dump
+        """
+        global _profile_running
+
+        if not await _authorized(request, auth):
+            return PlainTextResponse(
+                "Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"}
+            )
+
+        try:
+            seconds = float(request.query_params.get("seconds", "10"))
+            interval = float(request.query_params.get("interval_ms", DEFAULT_INTERVAL * 1000))
+        except ValueError:
+            return PlainTextResponse("seconds and interval_ms must be numbers", status_code=400)
+        if not 0 <= seconds <= PROFILE_MAX_SECONDS:
+            return PlainTextResponse(
+                f"seconds must be between 0 and {PROFILE_MAX_SECONDS}", status_code=400
+            )
+        if not 1 <= interval <= 1000:
+            return PlainTextResponse("interval_ms must be between 1 and 1000", status_code=400)
+        include_tasks = request.query_params.get("tasks", "").lower() in ("1", "true", "yes")
+
+        if _profile_running:
+            return PlainTextResponse("A profile is already running", status_code=409)
+
+        _profile_running = True
+        try:
+            # Capture tasks first so the dump shows the state that prompted the profile
+            tasks = dump_asyncio_tasks() if include_tasks else None
+            logger.warning(f"Admin profile started: {seconds:g}s at {interval:g}ms intervals")
+            profiler = await profile(seconds, interval / 1000)
+        finally:
+            _profile_running = False
+        logger.warning(f"Admin profile finished: {profiler.samples} samples")
+
+        if tasks is not None:
+            return JSONResponse(
+                {
+                    "pid": os.getpid(),
+                    "seconds": seconds,
+                    "samples": profiler.samples,
+                    "collapsed": profiler.collapsed(),
+                    "tasks": tasks,
+                }
+            )
+
+        filename = f"acms-{os.getpid()}-{int(time.time())}.collapsed"
+        return PlainTextResponse(
+            profiler.collapsed(),
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "X-ACMS-Samples": str(profiler.samples),
+            },
+        )
+
+    @mcp.custom_route("/admin/metrics", methods=["GET"], include_in_schema=False)
+    async def admin_metrics(request: Request) -> Response:
+        """Report command slot usage and disk watcher state in Prometheus text format."""
+        if not await _authorized(request, auth):
+            return PlainTextResponse(
+                "Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"}
+            )
+
+        stats = get_command_stats()
+        lines = [
+            "# HELP acms_commands_active Container commands running in this process",
+            "# TYPE acms_commands_active gauge",
+            f"acms_commands_active {stats['active_processes']}",
+            "# HELP acms_command_slots_available Free container command slots",
+            "# TYPE acms_command_slots_available gauge",
+            f"acms_command_slots_available {stats['available_slots']}",
+        ]
+        return PlainTextResponse(
+            "\n".join(lines) + "\n" + render_disk_metrics(),
+            media_type="text/plain; version=0.0.4",
+        )
+
+    logger.info("Admin routes enabled: /admin/profile, /admin/metrics")
+    return True
@@ -0,0 +1,223 @@
+"""
+Verified-token and JWKS caching for ACMS OAuth authentication.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+import os
+
+from authlib.jose import JsonWebKey
+import httpx
+
+from fastmcp.server.auth.providers.azure import AzureProvider
+from fastmcp.server.auth.providers.jwt import JWTVerifier
+from fastmcp.server.auth.auth import AccessToken
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+TOKEN_CACHE_TTL = int(os.getenv("ACMS_TOKEN_CACHE_TTL", "300"))  # 5 minutes default
+TOKEN_CACHE_SIZE = int(os.getenv("ACMS_TOKEN_CACHE_SIZE", "1024"))
+JWKS_REFRESH_INTERVAL = int(os.getenv("ACMS_JWKS_REFRESH_INTERVAL", "3600"))  # 1 hour default
+JWKS_MIN_REFETCH_INTERVAL = 30  # Rate limit for fetches triggered by unknown key IDs
+
+
+def hash_token(token: str) -> str:
+    """Return the SHA-256 hex digest used as the cache key for a bearer token."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """
+    LRU cache of verified access tokens keyed by token hash.
+
+    Entries expire at the earlier of the cache TTL and the token's own expiry,
+    so a cached token is never accepted after it has expired.
+
+    The bearer token a client presents is not always the token in the cached
+    AccessToken: behind the OAuth proxy the client holds a FastMCP JWT while
+    AccessToken.token is the upstream token it was swapped for. Entries are
+    also indexed by the hash of AccessToken.token, so revoking either token
+    drops every bearer token that resolved to it.
+    """
+
+    def __init__(self, ttl: int = TOKEN_CACHE_TTL, max_entries: int = TOKEN_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[AccessToken, float]]" = OrderedDict()
+        # hash of AccessToken.token -> cache keys of the bearer tokens it was loaded for
+        self._by_access_token: Dict[str, Set[str]] = {}
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        access_key = hash_token(entry[0].token)
+        keys = self._by_access_token.get(access_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_access_token[access_key]
+
+    def get(self, token: str) -> Optional[AccessToken]:
+        """Return the cached AccessToken for a bearer token, or None on miss or expiry."""
+        key = hash_token(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        access_token, expires_at = entry
+        if time.time() >= expires_at:
+            self._drop(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return access_token
+
+    def put(self, token: str, access_token: AccessToken) -> None:
+        """Cache a verified AccessToken until the earlier of the TTL and its expiry."""
+        expires_at = time.time() + self.ttl
+        if access_token.expires_at is not None:
+            expires_at = min(expires_at, access_token.expires_at)
+        if expires_at <= time.time() or self.max_entries <= 0:
+            return
+
+        key = hash_token(token)
+        self._drop(key)
+        self._entries[key] = (access_token, expires_at)
+        self._by_access_token.setdefault(hash_token(access_token.token), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, token: str) -> None:
+        """Drop a bearer token, and every bearer token that resolved to it, from the cache."""
+        self._drop(hash_token(token))
+        for key in list(self._by_access_token.get(hash_token(token), ())):
+            self._drop(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RefreshingJWTVerifier(JWTVerifier):
+    """
+    JWTVerifier that keeps its JWKS fresh in the background.
+
+    Known keys are always served from memory. Once the key set is older than
+    the refresh interval, a background task re-fetches it while requests keep
+    using the current keys, and a failed refresh keeps the last good key set.
+    Only a key ID that is not cached (key rotation) fetches on the request
+    path, and that is rate limited.
+    """
+
+    def __init__(self, *args, refresh_interval: int = JWKS_REFRESH_INTERVAL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refresh_interval = refresh_interval
+        self.fetch_count = 0
+        self._last_fetch = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _lookup_key(self, kid: Optional[str]) -> Optional[str]:
+        if kid:
+            return self._jwks_cache.get(kid)
+        if len(self._jwks_cache) == 1:
+            return next(iter(self._jwks_cache.values()))
+        return None
+
+    async def _refresh_jwks(self) -> None:
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        fetch_started = time.time()
+        async with self._refresh_lock:
+            # Another task refreshed while we waited for the lock
+            if self._last_fetch >= fetch_started:
+                return
+            self._last_fetch = time.time()
+            self.fetch_count += 1
+
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(self.jwks_uri)
+                    response.raise_for_status()
+                    jwks_data = response.json()
+
+                keys: Dict[str, str] = {}
+                for key_data in jwks_data.get("keys", []):
+                    jwk = JsonWebKey.import_key(key_data)
+                    keys[key_data.get("kid") or "_default"] = jwk.get_public_key()
+
+                self._jwks_cache = keys
+                self._jwks_cache_time = time.time()
+                logger.debug(f"JWKS refreshed: {len(keys)} keys")
+            except Exception as e:
+                logger.warning(
+                    f"JWKS refresh failed, keeping {len(self._jwks_cache)} cached keys: {e}"
+                )
+
+    async def _get_jwks_key(self, kid: Optional[str]) -> str:
+        if not self.jwks_uri:
+            raise ValueError("JWKS URI not configured")
+
+        key = self._lookup_key(kid)
+        if key is not None:
+            stale = time.time() - self._jwks_cache_time >= self.refresh_interval
+            if stale and (self._refresh_task is None or self._refresh_task.done()):
+                self._refresh_task = asyncio.create_task(self._refresh_jwks())
+            return key
+
+        if not self._last_fetch or time.time() - self._last_fetch >= JWKS_MIN_REFETCH_INTERVAL:
+            await self._refresh_jwks()
+            key = self._lookup_key(kid)
+
+        if key is None:
+            raise ValueError(f"Key ID '{kid}' not found in JWKS")
+        return key
+
+
+class CachedAzureProvider(AzureProvider):
+    """
+    AzureProvider that caches verified tokens and refreshes Entra ID keys in the background.
+
+    A repeat caller's token is accepted with a single hash lookup until it
+    expires or the cache TTL passes, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        *args,
+        token_cache_ttl: int = TOKEN_CACHE_TTL,
+        token_cache_size: int = TOKEN_CACHE_SIZE,
+        jwks_refresh_interval: int = JWKS_REFRESH_INTERVAL,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+
+        verifier = self._token_validator
+        self._token_validator = RefreshingJWTVerifier(
+            jwks_uri=verifier.jwks_uri,
+            issuer=verifier.issuer,
+            audience=verifier.audience,
+            algorithm=verifier.algorithm,
+            required_scopes=verifier.required_scopes,
+            refresh_interval=jwks_refresh_interval,
+        )
+        self.token_cache = TokenCache(ttl=token_cache_ttl, max_entries=token_cache_size)
+
+    async def load_access_token(self, token: str) -> Optional[AccessToken]:
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            return cached
+
+        validated = await super().load_access_token(token)
+        if validated is not None:
+            self.token_cache.put(token, validated)
+        return validated
+
+    async def revoke_token(self, token) -> None:
+        self.token_cache.invalidate(token.token)
+        await super().revoke_token(token)
@@ -0,0 +1,394 @@
+"""
+Content-hash cache for image builds.
+
+A build's key is a hash of everything that determines its image: the build
+context (minus files excluded by .dockerignore), the Dockerfile, build args,
+labels, target and platform. When a key matches an earlier successful build
+and the image it produced is still tagged, the build can be skipped.
+
+Hashing a large context is kept cheap by a per-context manifest of each
+file's size, mtime and digest: only files whose size or mtime changed since
+the previous scan are read again.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
+from pathlib import Path
+import hashlib
+import tempfile
+import logging
+import asyncio
+import json
+import time
+import stat
+import re
+import os
+
+from tools._common.utils import run_container_command
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+BUILD_CACHE_ENABLED = os.getenv("ACMS_BUILD_CACHE", "1").lower() not in ("0", "false", "no")
+BUILD_CACHE_DIR = Path(
+    os.getenv("ACMS_BUILD_CACHE_DIR", os.path.join("~", ".acms", "build-cache"))
+).expanduser()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Files modified this close to a scan may change again within the same mtime tick,
+# so their manifest entries are not trusted by the next scan
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def _pattern_to_regex(pattern: str) -> Pattern[str]:
+    """Translate a .dockerignore pattern into a regex over slash-separated relative paths."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            if pattern[i : i + 2] == "**":
+                i += 2
+                if pattern[i : i + 1] == "/":
+                    # "**/" matches zero or more whole directories
+                    i += 1
+                    parts.append("(?:.*/)?")
+                else:
+                    parts.append(".*")
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return re.compile("".join(parts) + r"\Z")
+
+
+class IgnoreRules:
+    """
+    .dockerignore matching.
+
+    Patterns are relative to the context root, the last matching pattern wins,
+    "!" re-includes, and a pattern that matches a directory excludes everything
+    below it.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.rules: List[Tuple[Pattern[str], bool]] = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:].strip()
+            line = os.path.normpath(line).replace(os.sep, "/").lstrip("/")
+            if line in ("", "."):
+                continue
+            self.rules.append((_pattern_to_regex(line), negate))
+        self.has_exceptions = any(negate for _, negate in self.rules)
+
+    @classmethod
+    def load(cls, context: Path, dockerfile: Optional[Path]) -> "IgnoreRules":
+        """Load <Dockerfile>.dockerignore if present, else .dockerignore in the context."""
+        candidates = [context / ".dockerignore"]
+        if dockerfile is not None:
+            candidates.insert(0, dockerfile.with_name(dockerfile.name + ".dockerignore"))
+        for candidate in candidates:
+            if candidate.is_file():
+                return cls(candidate.read_text(encoding="utf-8", errors="replace").splitlines())
+        return cls([])
+
+    def excluded(self, relpath: str) -> bool:
+        """Return True if a slash-separated path relative to the context is excluded."""
+        parents = relpath.split("/")
+        candidates = ["/".join(parents[: i + 1]) for i in range(len(parents))]
+        result = False
+        for regex, negate in self.rules:
+            if any(regex.match(candidate) for candidate in candidates):
+                result = not negate
+        return result
+
+
+def _walk_context(context: Path, rules: IgnoreRules) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (relative path, lstat) for every included file and symlink, in sorted order."""
+    stack = [""]
+    while stack:
+        reldir = stack.pop()
+        try:
+            entries = sorted(os.scandir(context / reldir), key=lambda e: e.name)
+        except OSError as e:
+            logger.debug(f"Build cache: cannot read {context / reldir}: {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            relpath = f"{reldir}/{entry.name}" if reldir else entry.name
+            st = entry.stat(follow_symlinks=False)
+            if stat.S_ISDIR(st.st_mode):
+                # An excluded directory can only be skipped when no "!" rule could re-include
+                # something inside it
+                if rules.has_exceptions or not rules.excluded(relpath):
+                    subdirs.append(relpath)
+            elif not rules.excluded(relpath):
+                yield relpath, st
+        stack.extend(reversed(subdirs))
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A unique temp file per write: threads of one process may write the same path at once
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def hash_context(
+    context: Path, dockerfile: Optional[Path], cache_dir: Path = BUILD_CACHE_DIR
+) -> Tuple[str, int, int]:
+    """
+    Hash a build context, reusing digests of files unchanged since the last scan.
+
+    Args:
+        context: Build context directory
+        dockerfile: Dockerfile path, used to find a Dockerfile-specific ignore file
+        cache_dir: Directory holding the per-context manifests
+
+    Returns:
+        Tuple of (context digest, files included, files read)
+    """
+    context = context.resolve()
+    rules = IgnoreRules.load(context, dockerfile)
+    manifest_path = (
+        cache_dir / "contexts" / f"{hashlib.sha256(str(context).encode()).hexdigest()}.json"
+    )
+    previous = _read_json(manifest_path) or {}
+    trusted_before = previous.get("scanned_at", 0) - RACY_WINDOW_NS
+    previous_files: Dict[str, List[Any]] = previous.get("files", {})
+
+    scanned_at = time.time_ns()
+    files: Dict[str, List[Any]] = {}
+    digest = hashlib.sha256()
+    read = 0
+    for relpath, st in _walk_context(context, rules):
+        if stat.S_ISLNK(st.st_mode):
+            content = "link:" + os.readlink(context / relpath)
+        elif stat.S_ISREG(st.st_mode):
+            cached = previous_files.get(relpath)
+            if (
+                cached is not None
+                and cached[0] == st.st_size
+                and cached[1] == st.st_mtime_ns
+                and st.st_mtime_ns < trusted_before
+            ):
+                content = cached[2]
+            else:
+                content = _hash_file(context / relpath)
+                read += 1
+            files[relpath] = [st.st_size, st.st_mtime_ns, content]
+        else:
+            continue
+        executable = "x" if st.st_mode & stat.S_IXUSR else "-"
+        digest.update(f"{relpath}\0{executable}\0{content}\n".encode("utf-8", "surrogateescape"))
+
+    _write_json(manifest_path, {"context": str(context), "scanned_at": scanned_at, "files": files})
+    return digest.hexdigest(), len(files), read
+
+
+def build_key(context_digest: str, dockerfile: Path, options: Dict[str, Any]) -> str:
+    """
+    Combine the context digest, Dockerfile content and build options into a cache key.
+
+    Args:
+        context_digest: Result of hash_context
+        dockerfile: Dockerfile path
+        options: Build options that affect the image (build args, labels, target, platform)
+
+    Returns:
+        Hex digest identifying the build
+    """
+    digest = hashlib.sha256()
+    digest.update(context_digest.encode())
+    digest.update(_hash_file(dockerfile).encode())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _find_digest(data: Any) -> Optional[str]:
+    """Return the first image digest found in `container image inspect` JSON."""
+    if isinstance(data, dict):
+        value = data.get("digest")
+        if isinstance(value, str) and value.startswith("sha256:"):
+            return value
+        children = list(data.values())
+    elif isinstance(data, list):
+        children = data
+    else:
+        return None
+    for child in children:
+        found = _find_digest(child)
+        if found:
+            return found
+    return None
+
+
+async def image_digest(reference: str) -> Optional[str]:
+    """
+    Return the digest a tag currently points to, or None if the image does not exist.
+
+    Args:
+        reference: Image reference
+
+    Returns:
+        The image digest, "" if the image exists but no digest was reported, or None
+    """
+    result = await run_container_command("image", "inspect", reference)
+    if result["return_code"] != 0:
+        return None
+    try:
+        return _find_digest(json.loads(result["stdout"])) or ""
+    except ValueError:
+        return ""
+
+
+async def compute_build_key(
+    path: str, file: Optional[str], options: Dict[str, Any], cache_dir: Path = BUILD_CACHE_DIR
+) -> Optional[str]:
+    """
+    Compute the cache key for a build, or None if the build cannot be cached.
+
+    Args:
+        path: Build context directory, as passed to `container build`
+        file: Dockerfile path, or None for Dockerfile in the context
+        options: Build options that affect the image
+        cache_dir: Directory holding the per-context manifests
+
+    Returns:
+        Build key, or None for contexts that are not local directories
+    """
+    context = Path(path).expanduser()
+    dockerfile = Path(file).expanduser() if file else context / "Dockerfile"
+    if not context.is_dir() or not dockerfile.is_file():
+        return None
+
+    start = time.monotonic()
+    context_digest, total, read = await asyncio.to_thread(
+        hash_context, context, dockerfile, cache_dir
+    )
+    key = await asyncio.to_thread(build_key, context_digest, dockerfile, options)
+    logger.info(
+        f"Build cache: hashed {total} files ({read} read) in {time.monotonic() - start:.2f}s"
+    )
+    return key
+
+
+class BuildCache:
+    """Record successful builds by key and find builds whose image is still present."""
+
+    def __init__(self, cache_dir: Path = BUILD_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    async def key(self, path: str, file: Optional[str], options: Dict[str, Any]) -> Optional[str]:
+        """Compute a build key using this cache's manifests; see compute_build_key."""
+        return await compute_build_key(path, file, options, self.cache_dir)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / "builds" / f"{key}.json"
+
+    async def lookup(self, key: str, tags: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Find a previous build with this key whose image still exists.
+
+        Requested tags that are missing but whose image is still present under a
+        tag from the recorded build are re-created with `container image tag`.
+        An entry without a recorded digest is a miss, since any image later
+        built or pulled under its tags would otherwise be served as its output.
+
+        Args:
+            key: Build key
+            tags: Tags requested for this build
+
+        Returns:
+            The recorded build entry, or None if the image must be built
+        """
+        entry = _read_json(self._entry_path(key))
+        if entry is None:
+            return None
+
+        recorded_digest = entry.get("digest", "")
+        if not recorded_digest:
+            logger.info(f"Build cache: no image digest recorded for {key[:12]}")
+            return None
+        source = None
+        for tag in entry.get("tags", []):
+            if await image_digest(tag) == recorded_digest:
+                source = tag
+                break
+        if source is None:
+            logger.info(f"Build cache: image for {key[:12]} no longer exists")
+            return None
+
+        for tag in tags:
+            if tag == source:
+                continue
+            if await image_digest(tag) == recorded_digest:
+                continue
+            result = await run_container_command("image", "tag", source, tag)
+            if result["return_code"] != 0:
+                return None
+
+        entry["tags"] = sorted(set(entry.get("tags", [])) | set(tags))
+        _write_json(self._entry_path(key), entry)
+        return entry
+
+    async def record(self, key: str, tags: List[str], context: str) -> None:
+        """
+        Record a successful build.
+
+        Args:
+            key: Build key
+            tags: Tags the build produced
+            context: Build context path, for reference
+        """
+        digest = await image_digest(tags[0])
+        if not digest:
+            logger.warning(f"Build cache: no digest for built image {tags[0]}, not caching")
+            return
+        _write_json(
+            self._entry_path(key),
+            {"tags": sorted(tags), "digest": digest, "context": context, "built_at": time.time()},
+        )
+
+
+build_cache = BuildCache()
@@ -0,0 +1,272 @@
+"""
+On-demand lifecycle management for the BuildKit builder.
+
+The builder is started when a build needs it, kept running while builds are
+pending, and, if the manager started it, stopped once it has been idle for
+ACMS_BUILDER_IDLE_TIMEOUT seconds. Its status is re-checked whenever a build
+starts with no other build in flight, so a builder stopped elsewhere is
+started again. The cpus and memory used for the next start are planned from recent
+build durations and how many builds overlapped.
+
+In multi-worker mode, workers hold a shared flock on a file in the shared
+limiter directory while they have builds pending, so no worker stops the
+builder while another is using it.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+import statistics
+import asyncio
+import logging
+import fcntl
+import time
+import os
+
+from tools._common.utils import SHARED_LIMIT_DIR, run_container_command
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+BUILDER_MANAGED = os.getenv("ACMS_BUILDER_MANAGED", "1").lower() not in ("0", "false", "no")
+BUILDER_IDLE_TIMEOUT = float(os.getenv("ACMS_BUILDER_IDLE_TIMEOUT", "900"))  # 0 disables auto-stop
+BUILDER_MIN_CPUS = int(os.getenv("ACMS_BUILDER_MIN_CPUS", "2"))
+BUILDER_MAX_CPUS = int(os.getenv("ACMS_BUILDER_MAX_CPUS", "8"))
+BUILDER_MEMORY_PER_CPU_MB = int(os.getenv("ACMS_BUILDER_MEMORY_PER_CPU_MB", "1024"))
+BUILDER_SLOW_BUILD = float(os.getenv("ACMS_BUILDER_SLOW_BUILD", "120"))  # seconds
+BUILDER_FAST_BUILD = float(os.getenv("ACMS_BUILDER_FAST_BUILD", "20"))  # seconds
+
+HISTORY_SIZE = 20
+BUSY_RETRY_INTERVAL = 0.1  # seconds between attempts to take the shared busy lock
+
+
+def plan_resources(
+    history: "Deque[Tuple[float, int]]",
+    current_cpus: int,
+    min_cpus: int = BUILDER_MIN_CPUS,
+    max_cpus: int = BUILDER_MAX_CPUS,
+) -> int:
+    """
+    Choose the builder cpus for its next start from recent builds.
+
+    Doubles the cpus when recent builds were slow or overlapped more than the
+    builder could run side by side, and halves them when builds were quick and
+    ran one at a time.
+
+    Args:
+        history: Recent (duration seconds, builds running at start) pairs
+        current_cpus: Cpus planned so far
+        min_cpus: Lower bound
+        max_cpus: Upper bound
+
+    Returns:
+        Cpus for the next builder start
+    """
+    cpus = current_cpus
+    if history:
+        median_duration = statistics.median(duration for duration, _ in history)
+        peak_overlap = max(overlap for _, overlap in history)
+        if median_duration > BUILDER_SLOW_BUILD or peak_overlap * 2 > cpus:
+            cpus = cpus * 2
+        elif median_duration < BUILDER_FAST_BUILD and peak_overlap <= 1:
+            cpus = cpus // 2
+    return max(min_cpus, min(max_cpus, cpus))
+
+
+class BuilderManager:
+    """Start the builder lazily, keep it warm while builds are pending, stop it when idle."""
+
+    def __init__(
+        self,
+        idle_timeout: float = BUILDER_IDLE_TIMEOUT,
+        shared_dir: Optional[str] = SHARED_LIMIT_DIR,
+    ):
+        self.idle_timeout = idle_timeout
+        self.running: Optional[bool] = None  # None until the builder has been checked
+        self.started_by_manager = False
+        # Cpus and memory the manager started the running builder with
+        self.resources: Optional[Tuple[float, str]] = None
+        self.pending = 0
+        self.last_used = time.monotonic()
+        self.cpus = BUILDER_MIN_CPUS
+        self.history: Deque[Tuple[float, int]] = deque(maxlen=HISTORY_SIZE)
+        self._lock = asyncio.Lock()
+        self._idle_task: Optional[asyncio.Task] = None
+        self._busy_fd: Optional[int] = None
+        self._busy_path = (
+            os.path.join(shared_dir, "builder-busy.lock") if shared_dir else None
+        )
+
+    @property
+    def memory(self) -> str:
+        return f"{self.cpus * BUILDER_MEMORY_PER_CPU_MB}MB"
+
+    def mark_running(self, running: bool) -> None:
+        """Record a builder start or stop made outside the manager."""
+        self.running = running
+        if not running:
+            self.started_by_manager = False
+            self.resources = None
+
+    async def _check_running(self) -> bool:
+        result = await run_container_command("builder", "status")
+        output = result["stdout"].lower()
+        return result["return_code"] == 0 and "running" in output and "not running" not in output
+
+    async def _ensure_running(
+        self, cpus: Optional[float], memory: Optional[str], recheck: bool = False
+    ) -> None:
+        async with self._lock:
+            if self.running is None or recheck:
+                # Another worker or the user may have stopped it since
+                self.mark_running(await self._check_running())
+            if self.running:
+                return
+
+            start_cpus = cpus if cpus is not None else self.cpus
+            start_memory = memory if memory is not None else self.memory
+            logger.info(f"Starting builder on demand ({start_cpus:g} CPUs, {start_memory})")
+            result = await run_container_command(
+                "builder", "start", "--cpus", str(start_cpus), "--memory", start_memory
+            )
+            # Another worker may have started it first
+            self.running = result["return_code"] == 0 or await self._check_running()
+            self.started_by_manager = result["return_code"] == 0
+            if self.started_by_manager:
+                self.resources = (start_cpus, start_memory)
+            if not self.running:
+                logger.warning(f"Builder start failed: {result['stderr'].strip()}")
+
+    async def _acquire_busy(self) -> None:
+        """Take the shared busy lock, polling so the loop is not blocked while it is held."""
+        if self._busy_path is None or self._busy_fd is not None:
+            return
+        fd = os.open(self._busy_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(BUSY_RETRY_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        if self._busy_fd is None:
+            self._busy_fd = fd
+        else:
+            # Another build of this worker took it while we waited
+            os.close(fd)
+
+    def _release_busy(self) -> None:
+        if self._busy_fd is not None:
+            os.utime(self._busy_path)
+            os.close(self._busy_fd)
+            self._busy_fd = None
+
+    @asynccontextmanager
+    async def session(
+        self, cpus: Optional[float] = None, memory: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold the builder for one build, starting it first if needed.
+
+        Args:
+            cpus: Explicit cpus for a builder start, overriding the plan
+            memory: Explicit memory for a builder start, overriding the plan
+        """
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            self._idle_task = None
+        self.pending += 1
+        overlap = self.pending
+        start = time.monotonic()
+        try:
+            await self._acquire_busy()
+            # With builds in flight the builder is known to be up
+            await self._ensure_running(cpus, memory, recheck=overlap == 1)
+            yield
+        finally:
+            self.history.append((time.monotonic() - start, overlap))
+            self.pending -= 1
+            self.last_used = time.monotonic()
+            if self.pending == 0:
+                self._release_busy()
+                self.cpus = plan_resources(self.history, self.cpus)
+                if self.idle_timeout > 0:
+                    self._idle_task = asyncio.create_task(self._stop_when_idle())
+
+    @contextmanager
+    def _exclusive_when_idle(self) -> Iterator[bool]:
+        """
+        Hold the busy lock exclusively if no worker holds the builder or used it within the timeout.
+
+        Yields whether the builder is idle everywhere; while it is, builds in
+        every worker wait to start until the block exits.
+        """
+        if self._busy_path is None:
+            yield True
+            return
+        existed = os.path.exists(self._busy_path)
+        fd = os.open(self._busy_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            idle_for = time.time() - os.stat(self._busy_path).st_mtime
+            yield not existed or idle_for >= self.idle_timeout
+        finally:
+            os.close(fd)
+
+    async def _stop_when_idle(self) -> None:
+        try:
+            await asyncio.sleep(self.idle_timeout)
+        except asyncio.CancelledError:
+            return
+        async with self._lock:
+            if self.pending or not self.running or not self.started_by_manager:
+                return
+            with self._exclusive_when_idle() as idle:
+                if not idle:
+                    return
+                logger.info(f"Stopping builder after {self.idle_timeout:g}s idle")
+                result = await run_container_command("builder", "stop")
+            if result["return_code"] == 0:
+                self.mark_running(False)
+            else:
+                logger.warning(f"Idle builder stop failed: {result['stderr'].strip()}")
+
+    async def remove_when_idle(self) -> Optional[Dict[str, Any]]:
+        """
+        Remove the builder, and with it the build cache, unless a build may need it.
+
+        Returns:
+            The `builder rm` result, or None when a build is pending in any
+            worker or the builder was used within the idle timeout
+        """
+        async with self._lock:
+            if self.pending:
+                return None
+            with self._exclusive_when_idle() as idle:
+                if not idle:
+                    return None
+                result = await run_container_command("builder", "rm", "--force")
+            if result["return_code"] == 0:
+                self.mark_running(False)
+            return result
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the manager's view of the builder."""
+        return {
+            "running": self.running,
+            "started_by_manager": self.started_by_manager,
+            "pending_builds": self.pending,
+            "idle_seconds": 0 if self.pending else round(time.monotonic() - self.last_used),
+            "idle_timeout": self.idle_timeout,
+            "next_start": {"cpus": self.cpus, "memory": self.memory},
+            "recent_builds": len(self.history),
+        }
+
+
+builder_manager = BuilderManager()
@@ -0,0 +1,108 @@
+"""
+Columnar encoding for tabular JSON results.
+
+Records are flattened (nested objects become dotted columns) and sent as
+one header row of column names followed by one array of values per
+record, so keys are not repeated on every row:
+
+    {
+        "columns": ["status", "configuration.id", "configuration.image.reference"],
+        "rows": [[0, "web-1", 0], [1, "web-2", 0], [0, "db", 1]],
+        "dictionaries": {
+            "status": ["running", "stopped"],
+            "configuration.image.reference": ["docker.io/library/nginx:latest",
+                                              "docker.io/library/postgres:16"]
+        }
+    }
+
+A column whose values are strings that repeat is dictionary-encoded: its
+cells are indexes into the column's entry in "dictionaries". Missing
+values are null and are never encoded.
+"""
+from typing import Any, Dict, List, Union
+import json
+
+ENCODINGS = ("records", "columnar")
+
+
+def validate_encoding(encoding: str) -> str:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+    return encoding
+
+
+def flatten(record: Any, prefix: str = "") -> Dict[str, Any]:
+    """Flatten nested objects into dotted keys; lists and scalars are kept as values."""
+    if not isinstance(record, dict):
+        return {prefix or "value": record}
+    flat: Dict[str, Any] = {}
+    for key, value in record.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def encode_columnar(records: List[Any]) -> Dict[str, Any]:
+    """
+    Encode records as columns, rows and per-column dictionaries.
+
+    Args:
+        records: Parsed JSON records; objects are flattened, other values
+            become a "value" column
+
+    Returns:
+        Object with "columns", "rows" and "dictionaries"
+    """
+    flat = [flatten(record) for record in records]
+    columns: Dict[str, None] = {}
+    for record in flat:
+        columns.update(dict.fromkeys(record))
+    names = list(columns)
+    rows = [[record.get(name) for name in names] for record in flat]
+
+    dictionaries: Dict[str, List[str]] = {}
+    for index, name in enumerate(names):
+        values = [row[index] for row in rows if row[index] is not None]
+        if not values or not all(isinstance(v, str) for v in values):
+            continue
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) * 2 > len(values):
+            continue
+        positions = {value: i for i, value in enumerate(distinct)}
+        for row in rows:
+            if row[index] is not None:
+                row[index] = positions[row[index]]
+        dictionaries[name] = distinct
+    return {"columns": names, "rows": rows, "dictionaries": dictionaries}
+
+
+def decode_columnar(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expand a columnar table back to flat records."""
+    dictionaries = table.get("dictionaries", {})
+    decoders = [dictionaries.get(name) for name in table["columns"]]
+    return [
+        {
+            name: decoder[cell] if decoder is not None and cell is not None else cell
+            for name, decoder, cell in zip(table["columns"], decoders, row)
+        }
+        for row in table["rows"]
+    ]
+
+
+def encode_output(
+    items: List[Any], encoding: str, **extra: Any
+) -> Union[str, Dict[str, Any]]:
+    """
+    Render records in the requested encoding.
+
+    Records are returned as compact JSON text, as an object with extra keys
+    when any are given; columnar tables are returned as an object, which
+    FastMCP sends as both JSON text and structured content.
+    """
+    if encoding == "columnar":
+        return {**encode_columnar(items), **extra}
+    payload: Any = {"items": items, **extra} if extra else items
+    return json.dumps(payload, separators=(",", ":"))
@@ -0,0 +1,330 @@
+"""
+Converge containers, networks and volumes to a declarative spec.
+
+A spec names the networks, volumes and containers of a project:
+
+    {
+        "networks": {"backend": {}},
+        "volumes": {"data": {"size": "10G", "labels": {"tier": "db"}}},
+        "containers": {
+            "db": {"image": "postgres:16", "volumes": ["data:/var/lib/postgresql/data"],
+                   "network": "backend", "env": {"POSTGRES_PASSWORD": "dev"}},
+            "web": {"image": "nginx", "ports": ["8080:80"], "network": "backend",
+                    "depends_on": ["db"], "state": "running"}
+        }
+    }
+
+Everything created is labelled with the project, and each container with a
+hash of its configuration. Planning compares the spec with one concurrent
+listing of containers, volumes and networks: containers whose hash changed
+are recreated, missing resources are created, project resources no longer
+in the spec are removed and containers are started or stopped to match
+their state. The operations form a dependency graph (a container after its
+volumes, networks and depends_on containers; removing a volume or network
+after removing the containers that used it) and independent operations run
+in parallel.
+"""
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import asyncio
+import logging
+import json
+
+from tools._common.resources import list_all
+from tools._common.utils import run_container_command
+
+logger = logging.getLogger("ACMS")
+
+PROJECT_LABEL = "acms.apply.project"
+HASH_LABEL = "acms.apply.hash"
+
+CONTAINER_FIELDS = {
+    "image",
+    "command",
+    "env",
+    "ports",
+    "volumes",
+    "mounts",
+    "network",
+    "networks",
+    "cpus",
+    "memory",
+    "labels",
+    "user",
+    "cwd",
+    "entrypoint",
+    "depends_on",
+    "state",
+}
+OPTION_FLAGS = (
+    ("--cpus", "cpus"),
+    ("--memory", "memory"),
+    ("--user", "user"),
+    ("--cwd", "cwd"),
+    ("--entrypoint", "entrypoint"),
+)
+STATES = ("running", "stopped")
+
+
+class Operation:
+    """One container CLI invocation in an apply plan."""
+
+    def __init__(
+        self, key: str, description: str, args: List[str], deps: Optional[Set[str]] = None
+    ):
+        self.key = key
+        self.description = description
+        self.args = args
+        self.deps: Set[str] = deps or set()
+        self.status = "pending"
+        self.detail = ""
+
+
+def _as_list(value: Any, field: str, name: str) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+        return [str(v) for v in value]
+    raise ValueError(f"Container '{name}': {field} must be a string or a list of strings")
+
+
+def _env_list(value: Any, name: str) -> List[str]:
+    if isinstance(value, dict):
+        return [f"{k}={v}" for k, v in value.items()]
+    return _as_list(value, "env", name)
+
+
+def _labels(value: Any, owner: str) -> Dict[str, str]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{owner}: labels must be a mapping")
+    return {str(k): str(v) for k, v in value.items()}
+
+
+def validate_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Check a spec's structure and fill in defaults.
+
+    Raises:
+        ValueError: If the spec is malformed, references undefined resources
+            or has a depends_on cycle
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Spec must be an object with networks, volumes and containers")
+    unknown = set(spec) - {"networks", "volumes", "containers"}
+    if unknown:
+        raise ValueError(f"Unknown spec sections: {', '.join(sorted(unknown))}")
+
+    sections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for section in ("networks", "volumes", "containers"):
+        value = spec.get(section) or {}
+        if not isinstance(value, dict):
+            raise ValueError(f"'{section}' must map names to definitions")
+        sections[section] = {name: dict(body or {}) for name, body in value.items()}
+
+    for name, container in sections["containers"].items():
+        bad = set(container) - CONTAINER_FIELDS
+        if bad:
+            raise ValueError(f"Container '{name}': unknown fields {', '.join(sorted(bad))}")
+        if not isinstance(container.get("image"), str):
+            raise ValueError(f"Container '{name}': image is required")
+        container.setdefault("state", "running")
+        if container["state"] not in STATES:
+            raise ValueError(f"Container '{name}': state must be running or stopped")
+        for dep in _as_list(container.get("depends_on"), "depends_on", name):
+            if dep not in sections["containers"]:
+                raise ValueError(f"Container '{name}' depends on undefined container '{dep}'")
+
+    # Reject depends_on cycles
+    visiting: Set[str] = set()
+    done: Set[str] = set()
+
+    def visit(name: str) -> None:
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"depends_on cycle through container '{name}'")
+        visiting.add(name)
+        for dep in _as_list(sections["containers"][name].get("depends_on"), "depends_on", name):
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in sections["containers"]:
+        visit(name)
+    return sections
+
+
+def container_hash(container: Dict[str, Any]) -> str:
+    """Hash the configuration that requires recreating a container when it changes."""
+    config = {k: v for k, v in container.items() if k not in ("state", "depends_on")}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _run_args(project: str, name: str, container: Dict[str, Any]) -> List[str]:
+    running = container["state"] == "running"
+    args = ["run", "--detach"] if running else ["create"]
+    args += ["--name", name]
+    labels = {
+        **_labels(container.get("labels"), f"Container '{name}'"),
+        PROJECT_LABEL: project,
+        HASH_LABEL: container_hash(container),
+    }
+    for key, value in labels.items():
+        args += ["--label", f"{key}={value}"]
+    for env in _env_list(container.get("env"), name):
+        args += ["--env", env]
+    for port in _as_list(container.get("ports"), "ports", name):
+        args += ["--publish", port]
+    for volume in _as_list(container.get("volumes"), "volumes", name):
+        args += ["--volume", volume]
+    for mount in _as_list(container.get("mounts"), "mounts", name):
+        args += ["--mount", mount]
+    for network in _networks_of(container, name):
+        args += ["--network", network]
+    for flag, field in OPTION_FLAGS:
+        if container.get(field) is not None:
+            args += [flag, str(container[field])]
+    args.append(container["image"])
+    args += _as_list(container.get("command"), "command", name)
+    return args
+
+
+def _networks_of(container: Dict[str, Any], name: str) -> List[str]:
+    return _as_list(container.get("network"), "network", name) + _as_list(
+        container.get("networks"), "networks", name
+    )
+
+
+def _volume_names(container: Dict[str, Any], name: str) -> List[str]:
+    return [v.split(":", 1)[0] for v in _as_list(container.get("volumes"), "volumes", name)]
+
+
+async def plan_apply(project: str, spec: Dict[str, Any]) -> List[Operation]:
+    """
+    Diff a spec against current state and return the operations that converge it.
+
+    Args:
+        project: Project name, recorded as a label on everything created
+        spec: Networks, volumes and containers; see the module docstring
+
+    Returns:
+        Operations with their dependencies; empty when nothing needs to change
+    """
+    sections = validate_spec(spec)
+    state = await list_all(["container", "volume", "network"])
+    current = {kind: {r["id"]: r for r in records} for kind, records in state.items()}
+
+    ops: Dict[str, Operation] = {}
+
+    def add(op: Operation) -> None:
+        ops[op.key] = op
+
+    # Networks and volumes: create what is missing, remove what the project no longer has
+    for kind, section in (("network", "networks"), ("volume", "volumes")):
+        for name, body in sections[section].items():
+            if name in current[kind]:
+                continue
+            args = [kind, "create"]
+            if kind == "volume" and body.get("size"):
+                args += ["-s", str(body["size"])]
+            for option in _as_list(body.get("opts"), "opts", name) if kind == "volume" else []:
+                args += ["--opt", option]
+            labels = {**_labels(body.get("labels"), f"{kind} '{name}'"), PROJECT_LABEL: project}
+            for key, value in labels.items():
+                args += ["--label", f"{key}={value}"]
+            add(Operation(f"create:{kind}:{name}", f"create {kind} {name}", args + [name]))
+        for name, record in current[kind].items():
+            if record["labels"].get(PROJECT_LABEL) == project and name not in sections[section]:
+                add(
+                    Operation(f"delete:{kind}:{name}", f"delete {kind} {name}", [kind, "rm", name])
+                )
+
+    # Containers: remove those dropped from the spec or whose configuration changed
+    desired = sections["containers"]
+    for name, record in current["container"].items():
+        owned = record["labels"].get(PROJECT_LABEL) == project
+        if name in desired and not owned:
+            raise ValueError(
+                f"Container '{name}' already exists and is not managed by project '{project}'"
+            )
+        if name not in desired and owned:
+            description = f"delete container {name}"
+        elif name in desired and record["labels"].get(HASH_LABEL) != container_hash(desired[name]):
+            description = f"remove container {name} to recreate it"
+        else:
+            continue
+        add(Operation(f"delete:container:{name}", description, ["rm", "--force", name]))
+
+    for name, container in desired.items():
+        record = current["container"].get(name)
+        recreate = f"delete:container:{name}" in ops
+        running = record is not None and record["status"] == "running"
+        if record is None or recreate:
+            verb = "run" if container["state"] == "running" else "create"
+            args = _run_args(project, name, container)
+            add(Operation(f"up:container:{name}", f"{verb} container {name}", args))
+        elif container["state"] == "running" and not running:
+            add(Operation(f"up:container:{name}", f"start container {name}", ["start", name]))
+        elif container["state"] == "stopped" and running:
+            add(Operation(f"down:container:{name}", f"stop container {name}", ["stop", name]))
+
+    # Dependencies
+    container_deletes = {k for k in ops if k.startswith("delete:container:")}
+    for key, op in ops.items():
+        if key.startswith(("delete:network:", "delete:volume:")):
+            op.deps |= container_deletes
+        if key.startswith("up:container:"):
+            name = key.split(":", 2)[2]
+            container = desired[name]
+            op.deps.add(f"delete:container:{name}")
+            op.deps |= {f"create:network:{n}" for n in _networks_of(container, name)}
+            op.deps |= {f"create:volume:{v}" for v in _volume_names(container, name)}
+            op.deps |= {
+                f"up:container:{dep}"
+                for dep in _as_list(container.get("depends_on"), "depends_on", name)
+            }
+    for op in ops.values():
+        op.deps &= set(ops)
+    return list(ops.values())
+
+
+async def execute_plan(operations: List[Operation]) -> List[Operation]:
+    """
+    Run a plan's operations, each as soon as everything it depends on has succeeded.
+
+    Operations whose dependencies failed are skipped.
+    """
+    by_key = {op.key: op for op in operations}
+    done: Dict[str, asyncio.Event] = {op.key: asyncio.Event() for op in operations}
+
+    async def run(op: Operation) -> None:
+        try:
+            for dep in op.deps:
+                await done[dep].wait()
+            failed = [d for d in op.deps if by_key[d].status != "ok"]
+            if failed:
+                op.status = "skipped"
+                op.detail = f"{by_key[failed[0]].description} did not succeed"
+                return
+            try:
+                result = await run_container_command(*op.args)
+            except Exception as e:
+                op.status, op.detail = "failed", str(e)
+                return
+            if result["return_code"] == 0:
+                op.status = "ok"
+            else:
+                stderr = result["stderr"].strip().splitlines()
+                op.status, op.detail = "failed", stderr[-1] if stderr else ""
+        finally:
+            done[op.key].set()
+
+    await asyncio.gather(*(run(op) for op in operations))
+    for op in operations:
+        log = logger.info if op.status == "ok" else logger.warning
+        log(f"Apply: {op.description}: {op.status}{' (' + op.detail + ')' if op.detail else ''}")
+    return operations
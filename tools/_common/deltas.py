@@ -0,0 +1,127 @@
+"""
+Version tokens and delta responses for polled listings.
+
+A versioned response carries a token derived from its content: a hash of
+the query and of every record's id and digest. A client polling with
+since=<token> gets "not_modified" when the token still matches, or the
+records added, changed and removed since that version when this worker
+still remembers it. An unknown or expired token gets the full state, so
+clients can always apply the response they receive.
+
+Because tokens are content hashes, "not modified" is answered by any
+worker; the per-version digests needed for deltas are kept in memory for
+ACMS_DELTA_TTL seconds, at most ACMS_DELTA_MAX_VERSIONS of them.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import time
+import os
+
+from tools._common.projection import EntryFilter, project, select
+from tools._common.resources import resource_id, run_json_command
+
+# Configuration from environment variables
+DELTA_TTL = float(os.getenv("ACMS_DELTA_TTL", "600"))
+DELTA_MAX_VERSIONS = int(os.getenv("ACMS_DELTA_MAX_VERSIONS", "256"))
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class VersionStore:
+    """Record digests of recently returned versions, least recently used first."""
+
+    def __init__(self, ttl: float = DELTA_TTL, max_versions: int = DELTA_MAX_VERSIONS):
+        self.ttl = ttl
+        self.max_versions = max_versions
+        # version -> (scope, id -> digest, expiry)
+        self._versions: "OrderedDict[str, Tuple[str, Dict[str, str], float]]" = OrderedDict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for version in [v for v, (_, _, expires) in self._versions.items() if expires <= now]:
+            del self._versions[version]
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+
+    def remember(self, version: str, scope: str, digests: Dict[str, str]) -> None:
+        self._versions[version] = (scope, digests, time.monotonic() + self.ttl)
+        self._versions.move_to_end(version)
+        self._expire()
+
+    def get(self, version: str, scope: str) -> Optional[Dict[str, str]]:
+        """Return the digests of a remembered version of the same query, or None."""
+        self._expire()
+        entry = self._versions.get(version)
+        if entry is None or entry[0] != scope:
+            return None
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+
+versions = VersionStore()
+
+
+def delta_json(scope: str, records: Dict[str, Any], since: Optional[str]) -> str:
+    """
+    Return records as a versioned full state or as a delta against a previous version.
+
+    Args:
+        scope: The tool and query options; versions only compare within a scope
+        records: Current records by id
+        since: Version token from a previous response, or "" for the full state
+
+    Returns:
+        JSON with "version" and either "not_modified", "full" with "items", or
+        "added", "changed" and "removed"; records are given as objects keyed by
+        id, so a client can keep the state as one map and apply deltas to it
+    """
+    digests = {rid: _digest(record) for rid, record in records.items()}
+    version = _digest([scope, sorted(digests.items())])
+    previous = versions.get(since, scope) if since else None
+    versions.remember(version, scope, digests)
+
+    response: Dict[str, Any] = {"version": version}
+    if since == version:
+        response["not_modified"] = True
+    elif previous is None:
+        response["full"] = True
+        response["items"] = records
+    else:
+        response["added"] = {rid: r for rid, r in records.items() if rid not in previous}
+        response["changed"] = {
+            rid: r
+            for rid, r in records.items()
+            if rid in previous and previous[rid] != digests[rid]
+        }
+        response["removed"] = [rid for rid in previous if rid not in records]
+    return json.dumps(response, separators=(",", ":"))
+
+
+async def list_delta(
+    kind: str,
+    command: Sequence[str],
+    since: Optional[str],
+    scope: str,
+    entry_filter: Optional[EntryFilter] = None,
+    fields: Optional[List[str]] = None,
+    quiet: bool = False,
+) -> str:
+    """
+    Run a JSON listing and return it as a versioned state or delta.
+
+    Records are keyed by resource id; filters apply before versioning and
+    fields are projected first, so only changes to the selected fields count.
+    """
+    records: Dict[str, Any] = {}
+    for entry in select(kind, await run_json_command(*command), entry_filter):
+        rid = resource_id(kind, entry) if isinstance(entry, dict) else None
+        if rid is not None:
+            records[rid] = rid if quiet else project(kind, entry, fields)
+    return delta_json(scope, records, since)
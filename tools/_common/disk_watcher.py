@@ -0,0 +1,405 @@
+"""
+Background disk-usage watcher with ordered cleanup policies.
+
+Samples `system df --format json` every ACMS_DISK_WATCH_INTERVAL seconds
+and keeps a usage trend. When usage crosses ACMS_DISK_HIGH_WATER, the
+cleanup policies in ACMS_DISK_POLICIES run in order until usage is back
+under ACMS_DISK_LOW_WATER:
+
+    containers   Remove containers seen stopped for ACMS_DISK_CONTAINER_MAX_AGE seconds
+    volumes      `volume prune`: volumes no container references
+    images       `image prune`: dangling images
+    build-cache  Remove the BuildKit builder, and with it the build cache, when
+                 no worker has used it for ACMS_BUILDER_IDLE_TIMEOUT seconds
+
+build-cache is not run unless listed in ACMS_DISK_POLICIES, since it also
+removes a builder that ACMS did not start.
+
+Marks are either a percentage of the filesystem holding ACMS_DISK_PATH
+("85%") or a size compared with the total `system df` reports ("200G").
+The watcher is off unless ACMS_DISK_HIGH_WATER is set.
+
+Every action is logged and counted; render_metrics() exposes the counters
+and trend in Prometheus text format. In multi-worker mode only the worker
+holding a lock in the shared limiter directory watches, and it publishes
+its state there so every worker reports the same metrics.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from pathlib import Path
+import logging
+import asyncio
+import tempfile
+import fcntl
+import json
+import time
+import os
+
+from tools._common.builder_manager import builder_manager
+from tools._common.image_gc import df_sizes
+from tools._common.utils import SHARED_LIMIT_DIR, parse_size, run_container_command
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+DISK_HIGH_WATER = os.getenv("ACMS_DISK_HIGH_WATER")  # e.g. 85% or 200G; unset disables
+DISK_LOW_WATER = os.getenv("ACMS_DISK_LOW_WATER")  # Defaults to 10 points / 10% below high
+DISK_WATCH_INTERVAL = float(os.getenv("ACMS_DISK_WATCH_INTERVAL", "300"))
+DISK_PATH = os.path.expanduser(
+    os.getenv(
+        "ACMS_DISK_PATH",
+        os.path.join("~", "Library", "Application Support", "com.apple.container"),
+    )
+)
+DISK_POLICIES = os.getenv("ACMS_DISK_POLICIES", "containers,volumes,images")
+DISK_CONTAINER_MAX_AGE = float(os.getenv("ACMS_DISK_CONTAINER_MAX_AGE", "86400"))
+
+TREND_SAMPLES = 288  # A day at the default interval
+POLICIES = ("containers", "volumes", "images", "build-cache")
+DEFAULT_POLICIES = ("containers", "volumes", "images")
+
+
+class Mark:
+    """A high- or low-water mark, as a filesystem percentage or a `system df` total."""
+
+    def __init__(self, spec: str):
+        spec = spec.strip()
+        self.percent = spec.endswith("%")
+        self.value = float(spec[:-1]) if self.percent else float(parse_size(spec))
+        if self.percent and not 0 < self.value <= 100:
+            raise ValueError(f"Disk mark '{spec}' must be between 0% and 100%")
+
+    def lowered(self) -> "Mark":
+        """Return the default low-water mark for this high-water mark."""
+        mark = Mark.__new__(Mark)
+        mark.percent = self.percent
+        mark.value = max(self.value - 10, 0) if self.percent else self.value * 0.9
+        return mark
+
+    def __str__(self) -> str:
+        return f"{self.value:g}%" if self.percent else f"{int(self.value)} bytes"
+
+
+def _filesystem_percent(path: str) -> float:
+    """Return the percentage used of the filesystem holding path (or its nearest parent)."""
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    st = os.statvfs(path)
+    total = st.f_blocks * st.f_frsize
+    return 100.0 * (total - st.f_bavail * st.f_frsize) / total if total else 0.0
+
+
+def growth_per_hour(samples: List[Tuple[float, int]]) -> float:
+    """Least-squares slope of total bytes over time, in bytes per hour."""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_b = sum(b for _, b in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return 0.0
+    cov = sum((t - mean_t) * (b - mean_b) for t, b in samples)
+    return cov / var * 3600
+
+
+class DiskWatcher:
+    """Sample disk usage on an interval and clean up when a high-water mark is crossed."""
+
+    def __init__(
+        self,
+        high: Mark,
+        low: Optional[Mark] = None,
+        interval: float = DISK_WATCH_INTERVAL,
+        policies: Optional[List[str]] = None,
+        container_max_age: float = DISK_CONTAINER_MAX_AGE,
+        path: str = DISK_PATH,
+        shared_dir: Optional[str] = SHARED_LIMIT_DIR,
+    ):
+        self.high = high
+        self.low = low or high.lowered()
+        if self.low.percent != self.high.percent:
+            raise ValueError(
+                "ACMS_DISK_LOW_WATER and ACMS_DISK_HIGH_WATER must use the same unit"
+            )
+        self.interval = interval
+        self.policies = policies or list(DEFAULT_POLICIES)
+        unknown = set(self.policies) - set(POLICIES)
+        if unknown:
+            raise ValueError(f"Unknown disk cleanup policies: {', '.join(sorted(unknown))}")
+        self.container_max_age = container_max_age
+        self.path = path
+        self.shared_dir = shared_dir
+        self.samples: "deque[Tuple[float, int]]" = deque(maxlen=TREND_SAMPLES)
+        self.stopped_since: Dict[str, float] = {}
+        self.state: Dict[str, Any] = {
+            "sizes": {},
+            "total": 0,
+            "filesystem_percent": None,
+            "growth_bytes_per_hour": 0.0,
+            "samples": 0,
+            "sample_failures": 0,
+            "high_water_crossings": 0,
+            "actions": {policy: {"runs": 0, "failures": 0} for policy in self.policies},
+            "last_action": None,
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._leader_fd: Optional[int] = None
+
+    # Sampling
+
+    async def sample(self) -> Dict[str, int]:
+        """Read `system df`, update the trend and return sizes per resource type."""
+        result = await run_container_command("system", "df", "--format", "json")
+        if result["return_code"] != 0:
+            raise RuntimeError(f"system df failed: {result['stderr'].strip()}")
+        sizes = df_sizes(json.loads(result["stdout"] or "null"))
+        total = sum(sizes.values())
+        now = time.time()
+        self.samples.append((now, total))
+        self.state.update(
+            sizes=sizes,
+            total=total,
+            growth_bytes_per_hour=growth_per_hour(list(self.samples)),
+            samples=self.state["samples"] + 1,
+            last_sample=now,
+        )
+        if self.high.percent:
+            self.state["filesystem_percent"] = await asyncio.to_thread(
+                _filesystem_percent, self.path
+            )
+        return sizes
+
+    def usage(self) -> float:
+        """Current usage in the unit of the marks."""
+        if self.high.percent:
+            return self.state["filesystem_percent"] or 0.0
+        return float(self.state["total"])
+
+    # Cleanup policies
+
+    async def _track_stopped_containers(self) -> None:
+        """Note when each container was first seen stopped."""
+        result = await run_container_command("list", "--all", "--format", "json")
+        if result["return_code"] != 0:
+            return
+        now = time.time()
+        stopped = set()
+        for container in json.loads(result["stdout"] or "[]"):
+            config = container.get("configuration", container)
+            if container.get("status") == "stopped" and config.get("id"):
+                stopped.add(config["id"])
+        self.stopped_since = {cid: self.stopped_since.get(cid, now) for cid in stopped}
+
+    async def _remove_old_stopped_containers(self) -> Dict[str, Any]:
+        await self._track_stopped_containers()
+        now = time.time()
+        expired = sorted(
+            cid
+            for cid, since in self.stopped_since.items()
+            if now - since >= self.container_max_age
+        )
+        if not expired:
+            return {"return_code": 0, "stdout": "", "stderr": "", "command": "", "skipped": True}
+        result = await run_container_command("rm", *expired)
+        if result["return_code"] == 0:
+            for cid in expired:
+                self.stopped_since.pop(cid, None)
+        return result
+
+    async def _remove_build_cache(self) -> Dict[str, Any]:
+        result = await builder_manager.remove_when_idle()
+        if result is None:
+            return {"return_code": 0, "stdout": "", "stderr": "", "command": "", "skipped": True}
+        return result
+
+    async def run_policy(self, policy: str) -> Dict[str, Any]:
+        """Run one cleanup policy, logging and counting the outcome."""
+        if policy == "containers":
+            result = await self._remove_old_stopped_containers()
+        elif policy == "volumes":
+            result = await run_container_command("volume", "prune")
+        elif policy == "images":
+            result = await run_container_command("image", "prune")
+        else:
+            result = await self._remove_build_cache()
+
+        counts = self.state["actions"][policy]
+        if result.get("skipped"):
+            logger.info(f"Disk cleanup: {policy} policy had nothing to do")
+        elif result["return_code"] == 0:
+            counts["runs"] += 1
+            logger.warning(f"Disk cleanup: ran {policy} policy: {result['command']}")
+        else:
+            counts["failures"] += 1
+            logger.error(f"Disk cleanup: {policy} policy failed: {result['stderr'].strip()}")
+        self.state["last_action"] = {
+            "policy": policy,
+            "at": time.time(),
+            "ok": result["return_code"] == 0,
+            "skipped": bool(result.get("skipped")),
+        }
+        return result
+
+    async def check(self) -> None:
+        """Take a sample and, above the high-water mark, clean up until under the low one."""
+        await self.sample()
+        # Container age is measured from when the watcher first saw it stopped
+        if "containers" in self.policies:
+            await self._track_stopped_containers()
+        if self.usage() < self.high.value:
+            return
+
+        self.state["high_water_crossings"] += 1
+        logger.warning(
+            f"Disk usage {self.usage():.1f} above high-water mark {self.high}, "
+            f"growing {self.state['growth_bytes_per_hour'] / 1024**2:.1f} MB/hour; cleaning up"
+        )
+        for policy in self.policies:
+            await self.run_policy(policy)
+            await self.sample()
+            if self.usage() < self.low.value:
+                logger.info(f"Disk usage back under low-water mark {self.low}")
+                return
+        logger.error(
+            f"Disk usage still {self.usage():.1f} after all cleanup policies "
+            f"(low-water mark {self.low})"
+        )
+
+    # Lifecycle
+
+    def _state_path(self) -> Optional[Path]:
+        return Path(self.shared_dir) / "disk-watcher.json" if self.shared_dir else None
+
+    def _is_leader(self) -> bool:
+        """Take the shared watcher lock if no other worker holds it."""
+        if self.shared_dir is None or self._leader_fd is not None:
+            return True
+        fd = os.open(os.path.join(self.shared_dir, "disk-watcher.lock"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        logger.info(f"Disk watcher active in worker {os.getpid()}")
+        return True
+
+    def _publish(self) -> None:
+        path = self._state_path()
+        if path is None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the watcher state, read from the watching worker in multi-worker mode."""
+        path = self._state_path()
+        if path is not None and self._leader_fd is None:
+            try:
+                return json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return {}
+        return self.state
+
+    async def _run(self) -> None:
+        while True:
+            if self._is_leader():
+                try:
+                    await self.check()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.state["sample_failures"] += 1
+                    logger.error(f"Disk watcher check failed: {e}")
+                self._publish()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            logger.info(
+                f"Disk watcher: every {self.interval:g}s, high-water {self.high}, "
+                f"low-water {self.low}, policies {', '.join(self.policies)}"
+            )
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+
+def create_disk_watcher() -> Optional[DiskWatcher]:
+    """Create the watcher from the environment, or None when ACMS_DISK_HIGH_WATER is unset."""
+    if not DISK_HIGH_WATER:
+        return None
+    return DiskWatcher(
+        Mark(DISK_HIGH_WATER),
+        Mark(DISK_LOW_WATER) if DISK_LOW_WATER else None,
+        policies=[p.strip() for p in DISK_POLICIES.split(",") if p.strip()],
+    )
+
+
+disk_watcher = create_disk_watcher()
+
+
+def render_metrics() -> str:
+    """Render disk watcher state in Prometheus text exposition format."""
+    if disk_watcher is None:
+        return ""
+    state = disk_watcher.snapshot()
+    if not state:
+        return ""
+
+    lines = [
+        "# HELP acms_disk_bytes Bytes used per resource type reported by system df",
+        "# TYPE acms_disk_bytes gauge",
+    ]
+    for kind, size in sorted(state.get("sizes", {}).items()):
+        lines.append(f'acms_disk_bytes{{type="{kind}"}} {size}')
+    lines += [
+        "# HELP acms_disk_growth_bytes_per_hour Trend of total disk usage",
+        "# TYPE acms_disk_growth_bytes_per_hour gauge",
+        f"acms_disk_growth_bytes_per_hour {state.get('growth_bytes_per_hour', 0.0):.1f}",
+    ]
+    if state.get("filesystem_percent") is not None:
+        lines += [
+            "# HELP acms_disk_filesystem_used_percent Percentage used of the container filesystem",
+            "# TYPE acms_disk_filesystem_used_percent gauge",
+            f"acms_disk_filesystem_used_percent {state['filesystem_percent']:.2f}",
+        ]
+    lines += [
+        "# HELP acms_disk_samples_total Disk usage samples taken",
+        "# TYPE acms_disk_samples_total counter",
+        f"acms_disk_samples_total {state.get('samples', 0)}",
+        "# HELP acms_disk_sample_failures_total Disk watcher checks that failed",
+        "# TYPE acms_disk_sample_failures_total counter",
+        f"acms_disk_sample_failures_total {state.get('sample_failures', 0)}",
+        "# HELP acms_disk_high_water_crossings_total Times usage crossed the high-water mark",
+        "# TYPE acms_disk_high_water_crossings_total counter",
+        f"acms_disk_high_water_crossings_total {state.get('high_water_crossings', 0)}",
+        "# HELP acms_disk_cleanup_actions_total Cleanup policy runs by outcome",
+        "# TYPE acms_disk_cleanup_actions_total counter",
+    ]
+    for policy, counts in state.get("actions", {}).items():
+        lines.append(
+            f'acms_disk_cleanup_actions_total{{policy="{policy}",outcome="ok"}} {counts["runs"]}'
+        )
+        lines.append(
+            f'acms_disk_cleanup_actions_total{{policy="{policy}",outcome="failed"}} '
+            f'{counts["failures"]}'
+        )
+    return "\n".join(lines) + "\n"
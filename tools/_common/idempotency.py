@@ -0,0 +1,108 @@
+"""
+Idempotency keys for mutating tool calls.
+
+A call made with an idempotency key runs as its own task, and the store
+keeps the task under the key until ACMS_IDEMPOTENCY_TTL seconds after it
+finishes. A retry with the same key and arguments attaches to the running
+task or returns its result instead of running the tool again, even when
+the original caller has gone away. Calls that raise are forgotten, so a
+retry runs them afresh.
+
+Keys are held in memory, so with --workers a retry only finds the original
+call when it reaches the same worker.
+
+This module has no FastMCP dependency; the middleware that applies keys to
+tool calls is in idempotency_middleware.py.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import asyncio
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+IDEMPOTENCY_TTL = float(os.getenv("ACMS_IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("ACMS_IDEMPOTENCY_MAX_KEYS", "10000"))
+
+
+def fingerprint(tool: str, arguments: Dict[str, Any]) -> str:
+    """Hash a tool name and its arguments, so a key reused for a different call is caught."""
+    payload = json.dumps([tool, arguments], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """In-flight and finished calls by idempotency key."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        # key -> (fingerprint, task, expiry once finished or None while running)
+        self._entries: Dict[str, Tuple[str, "asyncio.Task[Any]", Optional[float]]] = {}
+        self.hits = 0
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for key, (_, _, expires) in list(self._entries.items()):
+            if expires is not None and expires <= now:
+                del self._entries[key]
+        # Drop the oldest finished entries beyond the cap; running calls are always kept
+        excess = len(self._entries) - self.max_keys
+        if excess > 0:
+            finished = sorted(
+                (expires, key) for key, (_, _, expires) in self._entries.items() if expires
+            )
+            for _, key in finished[:excess]:
+                del self._entries[key]
+
+    def _finished(self, key: str, task: "asyncio.Task[Any]") -> None:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] is not task:
+            return
+        if task.cancelled() or task.exception() is not None:
+            del self._entries[key]
+        else:
+            self._entries[key] = (entry[0], task, time.monotonic() + self.ttl)
+
+    async def run(
+        self, key: str, call_fingerprint: str, call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Run a call once per key, or attach to the run already made with this key.
+
+        Args:
+            key: Idempotency key, scoped by the caller
+            call_fingerprint: Fingerprint of the tool and arguments
+            call: Starts the call when no run exists for the key
+
+        Returns:
+            The call's result
+
+        Raises:
+            ValueError: If the key was used for a different call
+        """
+        self._expire()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] != call_fingerprint:
+                raise ValueError(
+                    "Idempotency key was already used for a different tool call or arguments"
+                )
+            self.hits += 1
+            state = "finished" if entry[1].done() else "in flight"
+            logger.info(f"Idempotency key hit ({state}): returning the original call's result")
+            task = entry[1]
+        else:
+            task = asyncio.ensure_future(call())
+            self._entries[key] = (call_fingerprint, task, None)
+            task.add_done_callback(lambda t, key=key: self._finished(key, t))
+        # A caller that gives up must not cancel the call a retry will attach to
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        running = sum(1 for _, task, _ in self._entries.values() if not task.done())
+        return {"keys": len(self._entries), "running": running, "hits": self.hits}
@@ -0,0 +1,97 @@
+"""
+FastMCP middleware that applies idempotency keys to mutating tool calls.
+"""
+from typing import Any, Dict, Optional, Sequence
+import logging
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext, CallNext
+
+from tools._common.idempotency import IdempotencyStore, fingerprint
+
+logger = logging.getLogger("ACMS")
+
+KEY_ARGUMENT = "idempotency_key"
+MAX_KEY_LENGTH = 255
+# Token claims identifying the user, most specific first
+USER_CLAIMS = ("oid", "sub")
+
+KEY_SCHEMA = {
+    "type": "string",
+    "maxLength": MAX_KEY_LENGTH,
+    "description": (
+        "Optional client-chosen key; retries with the same key return the first call's "
+        "result instead of running the tool again"
+    ),
+}
+
+
+def _mutating(tool: Any) -> bool:
+    annotations = getattr(tool, "annotations", None)
+    return not (annotations is not None and annotations.readOnlyHint)
+
+
+class IdempotencyMiddleware(Middleware):
+    """Accept an idempotency_key argument on mutating tools and deduplicate retried calls."""
+
+    def __init__(self, store: IdempotencyStore):
+        self.store = store
+
+    async def on_list_tools(self, context: MiddlewareContext, call_next: CallNext) -> Sequence[Any]:
+        tools = await call_next(context)
+        advertised = []
+        for tool in tools:
+            properties = tool.parameters.get("properties", {})
+            if _mutating(tool) and KEY_ARGUMENT not in properties:
+                parameters = {
+                    **tool.parameters,
+                    "properties": {**properties, KEY_ARGUMENT: KEY_SCHEMA},
+                }
+                tool = tool.model_copy(update={"parameters": parameters})
+            advertised.append(tool)
+        return advertised
+
+    def _scope(self) -> str:
+        """
+        Scope keys to the signed-in user, so users cannot see each other's results.
+
+        Behind the OAuth proxy every user's token carries the ACMS app as its
+        client, so the user is identified by the token's oid or sub claim; the
+        client ID is only used for tokens that carry neither.
+        """
+        from fastmcp.server.dependencies import get_access_token
+
+        token = get_access_token()
+        if token is None:
+            return ""
+        claims = token.claims or {}
+        for claim in USER_CLAIMS:
+            value = claims.get(claim)
+            if isinstance(value, str) and value:
+                return f"{token.client_id}\0{claim}:{value}"
+        return f"{token.client_id}\0client"
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        arguments: Dict[str, Any] = dict(context.message.arguments or {})
+        if KEY_ARGUMENT not in arguments:
+            return await call_next(context)
+
+        key: Optional[str] = arguments.pop(KEY_ARGUMENT)
+        stripped = context.copy(message=context.message.model_copy(update={"arguments": arguments}))
+        if not key:
+            return await call_next(stripped)
+        if not isinstance(key, str) or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(
+                f"{KEY_ARGUMENT} must be a string of at most {MAX_KEY_LENGTH} characters"
+            )
+
+        tool_name = context.message.name
+        if context.fastmcp_context is not None:
+            tool = await context.fastmcp_context.fastmcp.get_tool(tool_name)
+            if not _mutating(tool):
+                return await call_next(stripped)
+
+        return await self.store.run(
+            f"{self._scope()}\0{key}",
+            fingerprint(tool_name, arguments),
+            lambda: call_next(stripped),
+        )
@@ -0,0 +1,326 @@
+"""
+Compressed, checksummed image archives.
+
+An archive is the OCI image layout that `container image save` produces,
+holding one or more references with every blob stored once, compressed as a
+sequence of independent zstd frames. Each frame covers a fixed-size chunk of
+the tar stream and carries its own content checksum, so chunks are
+compressed on all cores in parallel and corruption is detected at the chunk
+it occurs in. The result is a standard .tar.zst: `zstd -d` followed by
+`container image load` reads it too.
+
+Loading verifies every frame checksum and every blob's sha256 against its
+content address before the layout is handed to `container image load`.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from typing import Any, BinaryIO, Deque, Dict, List, Optional
+from pathlib import Path
+import tempfile
+import hashlib
+import tarfile
+import uuid
+import logging
+import asyncio
+import json
+import io
+import os
+
+from tools._common.utils import run_container_command
+
+logger = logging.getLogger("ACMS")
+
+try:
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Configuration from environment variables
+ARCHIVE_THREADS = int(os.getenv("ACMS_ARCHIVE_THREADS", "0"))  # 0 uses every core
+ARCHIVE_TMPDIR = os.getenv("ACMS_ARCHIVE_TMPDIR")  # Scratch space for uncompressed layouts
+
+CHUNK_SIZE = 8 * 1024 * 1024
+COPY_SIZE = 1024 * 1024
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def is_compressed_archive(path: str) -> bool:
+    """Return True if the file starts with a zstd frame."""
+    with open(path, "rb") as f:
+        return f.read(4) == ZSTD_MAGIC
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise RuntimeError(
+            "Compressed image archives need the zstandard package; "
+            "install acms[compression]"
+        )
+
+
+class _ChunkedZstdWriter:
+    """File-like writer compressing fixed-size chunks into checksummed zstd frames in parallel."""
+
+    def __init__(self, raw: BinaryIO, level: int, threads: int):
+        self.raw = raw
+        self.level = level
+        self.chunk_size = CHUNK_SIZE
+        self.threads = threads or os.cpu_count() or 1
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames = 0
+        self._buffer = bytearray()
+        self._pending: Deque["Future[bytes]"] = deque()
+        self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix="acms-zstd")
+
+    def _compress(self, chunk: bytes) -> bytes:
+        # zstd releases the GIL while compressing, so frames compress concurrently
+        compressor = zstandard.ZstdCompressor(
+            level=self.level, write_checksum=True, write_content_size=True
+        )
+        return compressor.compress(chunk)
+
+    def _drain(self, keep: int) -> None:
+        while len(self._pending) > keep:
+            frame = self._pending.popleft().result()
+            self.raw.write(frame)
+            self.bytes_out += len(frame)
+            self.frames += 1
+
+    def _submit(self, chunk: bytes) -> None:
+        self._pending.append(self._executor.submit(self._compress, chunk))
+        # Bound memory to a couple of chunks per thread
+        self._drain(keep=self.threads * 2)
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        self.bytes_in += len(data)
+        while len(self._buffer) >= self.chunk_size:
+            self._submit(bytes(self._buffer[: self.chunk_size]))
+            del self._buffer[: self.chunk_size]
+        return len(data)
+
+    def close(self) -> None:
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            self._drain(keep=0)
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+
+
+class _HashingReader:
+    """Wrap a member's file object, hashing what is read through it."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+
+def _blob_digest(name: str) -> Optional[str]:
+    """Return the hex digest a blobs/sha256/<hex> member name promises, if it is one."""
+    parts = name.lstrip("./").split("/")
+    if len(parts) == 3 and parts[0] == "blobs" and parts[1] == "sha256":
+        return parts[2]
+    return None
+
+
+def write_archive(
+    layouts: List[Path], output: Path, level: int = 3, threads: int = 0
+) -> Dict[str, Any]:
+    """
+    Merge OCI layout tars into one compressed archive, storing each blob once.
+
+    The archive is written to a temporary file beside the output and renamed
+    into place only once complete, so readers never see a partial archive.
+
+    Args:
+        layouts: Tars produced by `container image save`
+        output: Archive path
+        level: zstd compression level
+        threads: Compression threads, 0 for one per core
+
+    Returns:
+        Summary with blob counts, bytes before and after compression and blob bytes
+        de-duplicated
+    """
+    _require_zstandard()
+    # Unique per call so concurrent saves to one path cannot clobber each other's temp file;
+    # not mkstemp, whose 0600 mode the finished archive would keep
+    tmp = output.with_name(f".{output.name}.{uuid.uuid4().hex}.tmp")
+    manifests: List[Dict[str, Any]] = []
+    seen: set = set()
+    blobs = 0
+    duplicate_bytes = 0
+
+    try:
+        with open(tmp, "wb") as raw:
+            writer = _ChunkedZstdWriter(raw, level, threads or ARCHIVE_THREADS)
+            try:
+                with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as out:
+                    for layout in layouts:
+                        with tarfile.open(layout, mode="r:") as src:
+                            for member in src:
+                                name = member.name.lstrip("./")
+                                if name == "index.json":
+                                    index = json.load(src.extractfile(member))
+                                    manifests.extend(index.get("manifests", []))
+                                    continue
+                                if name in seen:
+                                    if _blob_digest(name):
+                                        duplicate_bytes += member.size
+                                    continue
+                                seen.add(name)
+                                if member.isfile():
+                                    if _blob_digest(name):
+                                        blobs += 1
+                                    out.addfile(member, src.extractfile(member))
+                                else:
+                                    out.addfile(member)
+
+                    # The merged index lists every reference's manifest once
+                    unique: Dict[Any, Dict[str, Any]] = {}
+                    for manifest in manifests:
+                        key = (
+                            manifest.get("digest"),
+                            (manifest.get("annotations") or {}).get(
+                                "org.opencontainers.image.ref.name"
+                            ),
+                        )
+                        unique.setdefault(key, manifest)
+                    data = json.dumps(
+                        {"schemaVersion": 2, "manifests": list(unique.values())}, indent=2
+                    ).encode()
+                    info = tarfile.TarInfo("index.json")
+                    info.size = len(data)
+                    info.mode = 0o644
+                    out.addfile(info, io.BytesIO(data))
+            finally:
+                writer.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, output)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    return {
+        "references": len(unique),
+        "blobs": blobs,
+        "bytes_in": writer.bytes_in,
+        "bytes_out": writer.bytes_out,
+        "frames": writer.frames,
+        "duplicate_bytes": duplicate_bytes,
+    }
+
+
+def read_archive(archive: Path, layout: Path) -> Dict[str, Any]:
+    """
+    Decompress an archive into an uncompressed OCI layout tar, verifying it on the way.
+
+    Args:
+        archive: Compressed archive path
+        layout: Path for the uncompressed layout tar
+
+    Returns:
+        Summary with the number of blobs verified and bytes decompressed
+
+    Raises:
+        ValueError: If a frame checksum or blob digest does not match
+    """
+    _require_zstandard()
+    verified = 0
+    with open(archive, "rb") as raw, open(layout, "wb") as dest:
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            raw, read_size=COPY_SIZE, read_across_frames=True
+        )
+        try:
+            with tarfile.open(fileobj=reader, mode="r|") as src, tarfile.open(
+                fileobj=dest, mode="w|", format=tarfile.PAX_FORMAT
+            ) as out:
+                for member in src:
+                    if not member.isfile():
+                        out.addfile(member)
+                        continue
+                    hashing = _HashingReader(src.extractfile(member))
+                    out.addfile(member, hashing)
+                    expected = _blob_digest(member.name)
+                    if expected is not None:
+                        if hashing.digest.hexdigest() != expected:
+                            raise ValueError(
+                                f"Archive {archive} is corrupt: blob sha256:{expected[:12]} "
+                                "does not match its content"
+                            )
+                        verified += 1
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Archive {archive} is corrupt: {e}") from e
+        except tarfile.ReadError as e:
+            raise ValueError(f"Archive {archive} is truncated or not an image archive: {e}") from e
+        return {"blobs_verified": verified, "bytes": dest.tell()}
+
+
+async def save_images(
+    references: List[str], output: str, platform: Optional[str] = None, level: int = 3
+) -> Dict[str, Any]:
+    """
+    Save images into one compressed archive.
+
+    Each reference is saved to its own layout in parallel, then the layouts
+    are merged and compressed in a worker thread.
+
+    Args:
+        references: Image references
+        output: Archive path
+        platform: Platform to save, e.g. linux/arm64
+        level: zstd compression level
+
+    Returns:
+        Archive summary, or {"error": CommandResult} if a save failed
+    """
+    _require_zstandard()
+    with tempfile.TemporaryDirectory(prefix="acms-save-", dir=ARCHIVE_TMPDIR) as scratch:
+        layouts = [Path(scratch) / f"{i}.tar" for i in range(len(references))]
+
+        async def save(reference: str, layout: Path):
+            cmd_args = ["image", "save"]
+            if platform:
+                cmd_args.extend(["--platform", platform])
+            cmd_args.extend(["--output", str(layout), reference])
+            return await run_container_command(*cmd_args)
+
+        results = await asyncio.gather(*(save(r, l) for r, l in zip(references, layouts)))
+        for result in results:
+            if result["return_code"] != 0:
+                return {"error": result}
+
+        summary = await asyncio.to_thread(
+            write_archive, layouts, Path(output).expanduser(), level
+        )
+    logger.info(
+        f"Saved {len(references)} images to {output}: {summary['bytes_in']} bytes "
+        f"-> {summary['bytes_out']} compressed, {summary['duplicate_bytes']} de-duplicated"
+    )
+    return summary
+
+
+async def load_images(archive: str) -> Dict[str, Any]:
+    """
+    Verify and load a compressed archive.
+
+    Args:
+        archive: Archive path
+
+    Returns:
+        Verification summary with the `container image load` result under "result"
+    """
+    with tempfile.TemporaryDirectory(prefix="acms-load-", dir=ARCHIVE_TMPDIR) as scratch:
+        layout = Path(scratch) / "layout.tar"
+        summary = await asyncio.to_thread(read_archive, Path(archive).expanduser(), layout)
+        summary["result"] = await run_container_command("image", "load", "--input", str(layout))
+    return summary
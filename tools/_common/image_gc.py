@@ -0,0 +1,312 @@
+"""
+Least-recently-used image garbage collection under a disk budget.
+
+Image use is recorded whenever acms_container_run, acms_container_create or
+acms_container_build succeeds, in a small JSON file shared by all workers.
+The planner combines `image list`, `system df` and the references held by
+existing containers, then evicts unreferenced images, least recently used
+first, until the images fit the budget. Images never seen in use sort
+before every image that has been.
+
+`image list` entries only describe the image index, whose descriptor size
+is that of the index blob, so images without a size in the listing are
+inspected and sized from their platform variants. Eviction is not planned
+while any candidate's size is unknown.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pathlib import Path
+import tempfile
+import logging
+import asyncio
+import fcntl
+import json
+import time
+import os
+
+from tools._common.utils import parse_size, run_container_command
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+IMAGE_USAGE_FILE = Path(
+    os.getenv("ACMS_IMAGE_USAGE_FILE", os.path.join("~", ".acms", "image-usage.json"))
+).expanduser()
+
+SIZE_KEYS = ("fullSize", "sizeInBytes", "size")
+
+
+def normalize_reference(reference: str) -> str:
+    """
+    Expand a short image reference the way the container CLI does.
+
+    "alpine" becomes "docker.io/library/alpine:latest" and "user/app:1"
+    becomes "docker.io/user/app:1", so references recorded from tool
+    arguments match those in `image list`.
+    """
+    name, separator, digest = reference.partition("@")
+    first, slash, _ = name.partition("/")
+    if not slash:
+        name = f"docker.io/library/{name}"
+    elif "." not in first and ":" not in first and first != "localhost":
+        name = f"docker.io/{name}"
+    if not digest and ":" not in name.rsplit("/", 1)[-1]:
+        name += ":latest"
+    return name + separator + digest
+
+
+class ImageUsage:
+    """Last-use times of images, persisted with a file lock so workers can share them."""
+
+    def __init__(self, path: Path = IMAGE_USAGE_FILE):
+        self.path = path
+
+    def _update(self, change: Callable[[Dict[str, float]], None]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            data = self._read()
+            change(data)
+            fd, tmp = tempfile.mkstemp(
+                dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(data, separators=(",", ":")))
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+
+    def _read(self) -> Dict[str, float]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def touch(self, references: Iterable[str]) -> None:
+        """Record that images were just used."""
+        now = time.time()
+        normalized = [normalize_reference(r) for r in references]
+
+        def change(data: Dict[str, float]) -> None:
+            for reference in normalized:
+                data[reference] = now
+
+        try:
+            self._update(change)
+        except OSError as e:
+            logger.warning(f"Failed to record image use: {e}")
+
+    def forget(self, references: Iterable[str]) -> None:
+        """Drop removed images from the record."""
+        normalized = {normalize_reference(r) for r in references}
+
+        def change(data: Dict[str, float]) -> None:
+            for reference in normalized:
+                data.pop(reference, None)
+
+        self._update(change)
+
+    def last_used(self) -> Dict[str, float]:
+        return self._read()
+
+
+image_usage = ImageUsage()
+
+
+def _size_of(entry: Dict[str, Any]) -> Optional[int]:
+    """Return the size an entry reports in bytes or as a CLI size string, or None."""
+    for key in SIZE_KEYS:
+        value = entry.get(key)
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            return int(value)
+        if isinstance(value, str):
+            try:
+                return parse_size(value)
+            except ValueError:
+                continue
+    return None
+
+
+def _inspected_size(details: Any) -> Optional[int]:
+    """Return an image's size from `image inspect`: its own size or the sum of its variants."""
+    if not isinstance(details, dict):
+        return None
+    size = _size_of(details)
+    if size is not None:
+        return size
+    variants = details.get("variants")
+    if not isinstance(variants, list) or not variants:
+        return None
+    sizes = [_size_of(v) if isinstance(v, dict) else None for v in variants]
+    return None if None in sizes else sum(sizes)
+
+
+def _reference_of(entry: Dict[str, Any]) -> Optional[str]:
+    for key in ("reference", "name"):
+        if isinstance(entry.get(key), str):
+            return entry[key]
+    return None
+
+
+def df_sizes(df: Any) -> Dict[str, int]:
+    """
+    Return bytes used per resource type from `system df --format json` output.
+
+    Args:
+        df: Parsed JSON, either an object keyed by type or a list of typed entries
+
+    Returns:
+        Sizes keyed by lower-case type, such as "images", "containers" and "volumes"
+    """
+    sizes: Dict[str, int] = {}
+    if isinstance(df, dict):
+        for key, value in df.items():
+            if isinstance(value, dict):
+                sizes[key.lower()] = _size_of(value) or 0
+    elif isinstance(df, list):
+        for item in df:
+            if isinstance(item, dict) and item.get("type"):
+                sizes[str(item["type"]).lower()] = _size_of(item) or 0
+    return sizes
+
+
+def _image_total(df: Any) -> Optional[int]:
+    return df_sizes(df).get("images") or None
+
+
+def _container_images(containers: Any) -> List[str]:
+    references = []
+    for container in containers if isinstance(containers, list) else []:
+        config = container.get("configuration", container)
+        image = config.get("image")
+        if isinstance(image, dict):
+            image = image.get("reference")
+        if isinstance(image, str):
+            references.append(normalize_reference(image))
+    return references
+
+
+async def _json_command(*args: str) -> Any:
+    result = await run_container_command(*args)
+    if result["return_code"] != 0:
+        raise RuntimeError(f"`container {' '.join(args)}` failed: {result['stderr'].strip()}")
+    return json.loads(result["stdout"] or "null")
+
+
+async def plan_gc(
+    budget: int, keep: Optional[List[str]] = None, usage: Optional[ImageUsage] = None
+) -> Dict[str, Any]:
+    """
+    Compute which images to remove to bring image storage under a budget.
+
+    Args:
+        budget: Bytes of image storage to stay under
+        keep: References never to remove
+        usage: Usage record, defaults to the shared one
+
+    Returns:
+        Plan with the current total, the images to evict in order with their
+        sizes and last use, and the estimated total afterwards. An image's size
+        includes layers it shares with others, so removing it can free less
+        and the real total afterwards may be higher.
+
+    Raises:
+        RuntimeError: If a command fails or the size of an image that could be
+            evicted cannot be determined
+    """
+    usage = usage or image_usage
+    images, df, containers = await asyncio.gather(
+        _json_command("image", "list", "--format", "json"),
+        _json_command("system", "df", "--format", "json"),
+        _json_command("list", "--all", "--format", "json"),
+    )
+    last_used = await asyncio.to_thread(usage.last_used)
+    in_use = set(_container_images(containers))
+    protected = {normalize_reference(r) for r in keep or []}
+
+    entries = []
+    for image in images if isinstance(images, list) else []:
+        reference = _reference_of(image)
+        if reference is None:
+            continue
+        normalized = normalize_reference(reference)
+        entries.append(
+            {
+                "reference": reference,
+                "size": _size_of(image),
+                "last_used": last_used.get(normalized),
+                "in_use": normalized in in_use,
+                "kept": normalized in protected,
+            }
+        )
+
+    unsized = [e for e in entries if e["size"] is None]
+    if unsized:
+        inspected = await _json_command("image", "inspect", *(e["reference"] for e in unsized))
+        if isinstance(inspected, list) and len(inspected) == len(unsized):
+            for entry, details in zip(unsized, inspected):
+                entry["size"] = _inspected_size(details)
+
+    candidates = sorted(
+        (e for e in entries if not e["in_use"] and not e["kept"]),
+        key=lambda e: e["last_used"] or 0,
+    )
+    total = _image_total(df)
+    # Without a total from `system df`, every image's size is needed
+    sized = entries if total is None else candidates
+    unknown = [e["reference"] for e in sized if e["size"] is None]
+    if unknown:
+        raise RuntimeError(
+            f"Cannot determine the size of {', '.join(unknown)}; not planning eviction"
+        )
+    if total is None:
+        total = sum(e["size"] for e in entries)
+    evict = []
+    remaining = total
+    for entry in candidates:
+        if remaining <= budget:
+            break
+        evict.append(entry)
+        remaining -= entry["size"]
+
+    return {
+        "budget": budget,
+        "total": total,
+        "estimated_total": max(remaining, 0),
+        "evict": evict,
+        "in_use": sorted(e["reference"] for e in entries if e["in_use"]),
+        "over_budget": remaining > budget,
+    }
+
+
+async def execute_gc(plan: Dict[str, Any], usage: Optional[ImageUsage] = None) -> Dict[str, Any]:
+    """
+    Remove the images a plan selected, then measure image storage again.
+
+    Args:
+        plan: Result of plan_gc
+        usage: Usage record, defaults to the shared one
+
+    Returns:
+        The `image rm` result, the references removed and the measured total afterwards
+    """
+    usage = usage or image_usage
+    references = [e["reference"] for e in plan["evict"]]
+    if not references:
+        return {"result": None, "removed": [], "total": plan["total"]}
+
+    result = await run_container_command("image", "rm", *references)
+    if result["return_code"] == 0:
+        await asyncio.to_thread(usage.forget, references)
+    try:
+        total = _image_total(await _json_command("system", "df", "--format", "json"))
+    except (RuntimeError, ValueError):
+        total = None
+    return {
+        "result": result,
+        "removed": references if result["return_code"] == 0 else [],
+        "total": total,
+    }
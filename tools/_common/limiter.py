@@ -0,0 +1,167 @@
+"""
+Cross-process concurrency limiter for ACMS worker processes.
+"""
+from typing import List, Optional, Set, Tuple
+import asyncio
+import fcntl
+import logging
+import os
+import random
+import subprocess
+import time
+
+logger = logging.getLogger("ACMS")
+
+POLL_INTERVAL = 0.05  # Initial delay between slot probes, doubled up to MAX_POLL_INTERVAL
+MAX_POLL_INTERVAL = 0.5
+
+
+class SharedSemaphore:
+    """
+    Counting semaphore shared by every process that opens the same directory.
+
+    Each permit is a lock file held with ``flock``. Locks are released by the
+    kernel when a process exits, so a crashed worker never leaks a permit.
+    The holder records the PID of the container command it runs in its slot
+    file with the time it was recorded, which lets a supervisor account for
+    commands across all workers and tell them from processes that reused a PID.
+    """
+
+    def __init__(self, directory: str, value: int):
+        if value < 1:
+            raise ValueError(f"Semaphore value must be at least 1, got {value}")
+
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.directory = directory
+        self.value = value
+        self._local = asyncio.Semaphore(value)
+        self._held: Set[int] = set()
+        self._fds = [
+            os.open(os.path.join(directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            for i in range(value)
+        ]
+
+    def _try_lock(self, slot: int) -> bool:
+        try:
+            fcntl.flock(self._fds[slot], fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    async def acquire(self) -> int:
+        """
+        Wait for a free permit.
+
+        Returns:
+            Index of the slot that was acquired
+        """
+        await self._local.acquire()
+        delay = POLL_INTERVAL
+        try:
+            while True:
+                start = random.randrange(self.value)
+                for offset in range(self.value):
+                    slot = (start + offset) % self.value
+                    if slot not in self._held and self._try_lock(slot):
+                        self._held.add(slot)
+                        return slot
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_POLL_INTERVAL)
+        except BaseException:
+            self._local.release()
+            raise
+
+    def release(self, slot: int) -> None:
+        """Release a permit previously returned by acquire()."""
+        os.ftruncate(self._fds[slot], 0)
+        fcntl.flock(self._fds[slot], fcntl.LOCK_UN)
+        self._held.discard(slot)
+        self._local.release()
+
+    def record_pid(self, slot: int, pid: int) -> None:
+        """Record the PID of the command running under a held permit."""
+        os.ftruncate(self._fds[slot], 0)
+        os.pwrite(self._fds[slot], f"{pid} {time.time()}\n".encode(), 0)
+
+    def available(self) -> int:
+        """
+        Count free permits across all processes.
+
+        Returns:
+            Number of slots not currently locked by any process
+        """
+        free = 0
+        for slot in range(self.value):
+            if slot in self._held:
+                continue
+            if self._try_lock(slot):
+                fcntl.flock(self._fds[slot], fcntl.LOCK_UN)
+                free += 1
+        return free
+
+    def recorded_pids(self) -> List[Tuple[int, float]]:
+        """
+        List command PIDs recorded in slot files, including those left by exited workers.
+
+        Returns:
+            List of (PID, time the PID was recorded) pairs
+        """
+        pids = []
+        for fd in self._fds:
+            try:
+                pid, recorded_at = os.pread(fd, 64, 0).split()
+                pids.append((int(pid), float(recorded_at)))
+            except ValueError:
+                continue
+        return pids
+
+
+def pid_alive(pid: int) -> bool:
+    """Check whether a process with the given PID is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _parse_elapsed(etime: str) -> int:
+    """Convert ps elapsed time ([[dd-]hh:]mm:ss) to seconds."""
+    days, _, clock = etime.rpartition("-")
+    seconds = 0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds + int(days or 0) * 86400
+
+
+def is_recorded_process(pid: int, recorded_at: float, name: str = "container") -> bool:
+    """
+    Check that a live PID is still the command recorded in a slot file.
+
+    A PID left by a crashed worker can be reused by an unrelated process. The
+    recorded command was started before its PID was recorded, so a process
+    named otherwise or started later is not it.
+
+    Args:
+        pid: Recorded PID
+        recorded_at: Time the PID was recorded
+        name: Executable name of the recorded command
+
+    Returns:
+        True if the process is alive, has the expected name and predates the record
+    """
+    try:
+        result = subprocess.run(
+            ["ps", "-o", "etime=,comm=", "-p", str(pid)],
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        etime, _, comm = result.stdout.strip().partition(" ")
+        started = time.time() - _parse_elapsed(etime)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return False
+    # ps reports whole seconds of elapsed time
+    return os.path.basename(comm.strip()) == name and started < recorded_at + 1
@@ -0,0 +1,204 @@
+"""
+Non-blocking structured logging for ACMS.
+
+Records are filtered, then handed to a queue. A single background thread
+formats them and writes them to stderr, so the event loop never blocks on
+stderr writes.
+"""
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import threading
+import logging
+import atexit
+import queue
+import json
+import time
+import copy
+import sys
+import os
+
+# Configuration from environment variables
+LOG_FORMAT = os.getenv("ACMS_LOG_FORMAT", "json")  # json or text
+# Per-logger rate limits in records per second, e.g. "ACMS=50,mcp=20"
+LOG_RATE_LIMITS = os.getenv("ACMS_LOG_RATE_LIMITS", "")
+# Keep-ratio for messages starting with a prefix, e.g. "Executing:=0.1,Completed successfully=0.1"
+LOG_SAMPLING = os.getenv("ACMS_LOG_SAMPLING", "")
+
+TEXT_FORMAT = (
+    "%(asctime)s - %(name)s - %(levelname)s - [PID:%(process)d] "
+    "[%(funcName)s:%(lineno)d] - %(message)s"
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as compact single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "func": record.funcName,
+            "line": record.lineno,
+            "msg": record.getMessage(),
+        }
+        dropped = getattr(record, "dropped", 0)
+        if dropped:
+            entry["dropped"] = dropped
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drop records that exceed a per-logger rate or a per-prefix sampling ratio.
+
+    WARNING and above always pass. The next record that passes for the same
+    logger carries a ``dropped`` count of what was suppressed before it.
+    """
+
+    def __init__(
+        self,
+        rate_limits: Optional[Dict[str, float]] = None,
+        sampling: Optional[Dict[str, float]] = None,
+    ):
+        super().__init__()
+        self.rate_limits = rate_limits or {}
+        self.sampling = sampling or {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._sample_counters: Dict[str, int] = {}
+        self._dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _sampled_out(self, message: str) -> bool:
+        for prefix, ratio in self.sampling.items():
+            if message.startswith(prefix):
+                if ratio <= 0:
+                    return True
+                count = self._sample_counters.get(prefix, 0)
+                self._sample_counters[prefix] = count + 1
+                # Keep every Nth match so output is deterministic
+                return count % max(1, round(1 / ratio)) != 0
+        return False
+
+    def _rate_limited(self, name: str) -> bool:
+        rate = self.rate_limits.get(name)
+        if rate is None:
+            return False
+
+        now = time.monotonic()
+        tokens, last = self._buckets.get(name, (rate, now))
+        tokens = min(rate, tokens + (now - last) * rate)
+        if tokens < 1:
+            self._buckets[name] = (tokens, now)
+            return True
+        self._buckets[name] = (tokens - 1, now)
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            if self._sampled_out(str(record.msg)) or self._rate_limited(record.name):
+                self._dropped[record.name] = self._dropped.get(record.name, 0) + 1
+                return False
+
+            dropped = self._dropped.pop(record.name, 0)
+            if dropped:
+                record.dropped = dropped
+        return True
+
+
+class _StructuredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the caller's thread, as the
+        # arguments may not be safe to format later, but leave the final
+        # formatting to the writer thread.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def parse_ratio_spec(spec: str) -> Dict[str, float]:
+    """
+    Parse a "name=value,name=value" specification.
+
+    Args:
+        spec: Comma separated name=value pairs
+
+    Returns:
+        Mapping of name to float value
+
+    Raises:
+        ValueError: If a pair is malformed
+    """
+    result: Dict[str, float] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.rpartition("=")
+        if not sep or not name:
+            raise ValueError(f"Invalid logging spec '{item}', expected name=value")
+        result[name.strip()] = float(value)
+    return result
+
+
+def configure_logging(
+    logger_levels: Dict[str, int],
+    log_format: str = LOG_FORMAT,
+    rate_limits: Optional[Dict[str, float]] = None,
+    sampling: Optional[Dict[str, float]] = None,
+) -> QueueListener:
+    """
+    Route all logging through a queue drained by a background writer thread.
+
+    Args:
+        logger_levels: Levels for named loggers; their own handlers are removed
+            so every record goes through the root queue handler once
+        log_format: "json" for compact JSON lines, "text" for the classic format
+        rate_limits: Records per second allowed per logger name
+        sampling: Fraction of records kept for messages starting with each prefix
+
+    Returns:
+        The started QueueListener (stopped automatically at exit)
+    """
+    if rate_limits is None:
+        rate_limits = parse_ratio_spec(LOG_RATE_LIMITS)
+    if sampling is None:
+        sampling = parse_ratio_spec(LOG_SAMPLING)
+
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _StructuredQueueHandler(log_queue)
+    if rate_limits or sampling:
+        queue_handler.addFilter(RateLimitFilter(rate_limits, sampling))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.INFO)
+
+    for name, level in logger_levels.items():
+        named_logger = logging.getLogger(name)
+        named_logger.handlers.clear()
+        named_logger.setLevel(level)
+        named_logger.propagate = True
+
+    listener = QueueListener(log_queue, stderr_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
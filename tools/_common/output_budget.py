@@ -0,0 +1,201 @@
+"""
+Output budgets for command results.
+
+Tools whose output is line-oriented and can be large - container and
+system logs, exec, image pull and image push - accept max_output_bytes
+(ACMS_MAX_OUTPUT_BYTES by default). When a command's stdout and stderr
+exceed it, run_container_command compacts each stream in one pass over
+its raw bytes before decoding, so the full output is never held as text:
+
+- runs of consecutive lines that are identical once digits are ignored
+  (timestamps, counters, progress) are kept as their first line and a
+  count of the lines collapsed after it;
+- if the result is still over budget, the first and last lines within the
+  budget are kept and the middle is replaced by a count of what was left out.
+
+Other tools never apply a budget: a head/tail cut would break JSON and
+table output, and limit, cursor, filter and fields bound listings.
+format_command_result compacts a decoded result only when given
+max_output_bytes explicitly.
+
+This module has no FastMCP dependency; the middleware that accepts
+max_output_bytes on the budgeted tools is in output_budget_middleware.py.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import logging
+import os
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+MAX_OUTPUT_BYTES = int(os.getenv("ACMS_MAX_OUTPUT_BYTES", "0"))  # 0 keeps output verbatim
+MIN_OUTPUT_BYTES = 256
+
+# Lines are compared with their digits removed
+_DIGITS = b"0123456789"
+
+# Tools that pass current_budget() to run_container_command
+BUDGETED_TOOLS = frozenset(
+    {
+        "acms_container_logs",
+        "acms_system_logs",
+        "acms_container_exec",
+        "acms_image_pull",
+        "acms_image_push",
+    }
+)
+
+_current_budget: ContextVar[Optional[int]] = ContextVar("acms_output_budget", default=None)
+
+
+def validate_budget(max_output_bytes: int) -> int:
+    if max_output_bytes < MIN_OUTPUT_BYTES:
+        raise ValueError(f"max_output_bytes must be at least {MIN_OUTPUT_BYTES}")
+    return max_output_bytes
+
+
+def current_budget() -> int:
+    """Return the budget of the tool call running in this context (0 for none)."""
+    budget = _current_budget.get()
+    return MAX_OUTPUT_BYTES if budget is None else budget
+
+
+@contextmanager
+def output_budget(max_output_bytes: int) -> Iterator[None]:
+    """Apply a budget to command results formatted in this context."""
+    token = _current_budget.set(validate_budget(max_output_bytes))
+    try:
+        yield
+    finally:
+        _current_budget.reset(token)
+
+
+def _collapsed(count: int) -> bytes:
+    noun = "line" if count == 1 else "lines"
+    return f"[... {count} similar {noun} collapsed ...]\n".encode()
+
+
+def compact_output(data: bytes, max_bytes: int) -> Tuple[bytes, bool]:
+    """
+    Compact output to roughly max_bytes in a single pass over its lines.
+
+    Args:
+        data: Raw output
+        max_bytes: Budget; output within it is returned unchanged
+
+    Returns:
+        The compacted output and whether anything was collapsed or omitted
+    """
+    if len(data) <= max_bytes:
+        return data, False
+
+    head: List[bytes] = []
+    head_size = 0
+    head_budget = max_bytes // 2
+    tail: Deque[bytes] = deque()
+    tail_size = 0
+    tail_budget = max_bytes - head_budget
+    omitted_lines = 0
+    omitted_bytes = 0
+
+    def emit(line: bytes) -> None:
+        nonlocal head_size, tail_size, omitted_lines, omitted_bytes
+        if not tail and head_size + len(line) <= head_budget:
+            head.append(line)
+            head_size += len(line)
+            return
+        if not head:
+            # The first line alone is over half the budget: keep its start
+            head.append(line[:head_budget] + b"...\n")
+            head_size = head_budget
+            omitted_bytes += len(line) - head_budget
+            return
+        if len(line) > tail_budget:
+            omitted_bytes += len(line) - tail_budget
+            line = b"..." + line[-tail_budget:]
+        tail.append(line)
+        tail_size += len(line)
+        while tail_size > tail_budget and len(tail) > 1:
+            dropped = tail.popleft()
+            tail_size -= len(dropped)
+            omitted_lines += 1
+            omitted_bytes += len(dropped)
+
+    previous_key: Optional[bytes] = None
+    repeats = 0
+    start = 0
+    end = len(data)
+    while start < end:
+        newline = data.find(b"\n", start)
+        stop = end if newline < 0 else newline + 1
+        line = data[start:stop]
+        start = stop
+        key = line.rstrip().translate(None, _DIGITS)
+        if key == previous_key:
+            repeats += 1
+            continue
+        if repeats:
+            emit(_collapsed(repeats))
+            repeats = 0
+        emit(line if line.endswith(b"\n") else line + b"\n")
+        previous_key = key
+    if repeats:
+        emit(_collapsed(repeats))
+
+    parts = head
+    if omitted_lines:
+        parts.append(f"[... {omitted_lines} lines ({omitted_bytes} bytes) omitted ...]\n".encode())
+    parts.extend(tail)
+    compacted = b"".join(parts)
+    if not data.endswith(b"\n"):
+        compacted = compacted[:-1]
+    return compacted, True
+
+
+def compact_streams(
+    stdout: bytes, stderr: bytes, max_bytes: int, command: str = "command"
+) -> Tuple[bytes, bytes]:
+    """
+    Compact stdout and stderr to a combined budget.
+
+    stderr gets up to half the budget and stdout the rest.
+
+    Returns:
+        The streams, unchanged when within budget
+    """
+    size = len(stdout) + len(stderr)
+    if size <= max_bytes:
+        return stdout, stderr
+
+    stderr_budget = min(len(stderr), max_bytes // 2)
+    stdout, _ = compact_output(stdout, max_bytes - stderr_budget)
+    stderr, _ = compact_output(stderr, stderr_budget or 1)
+    logger.info(
+        f"Output of {command} compacted from {size} bytes "
+        f"to {len(stdout) + len(stderr)} (budget {max_bytes})"
+    )
+    return stdout, stderr
+
+
+def apply_budget(result: Dict[str, Any], max_bytes: int) -> Dict[str, Any]:
+    """
+    Compact a decoded command result's stdout and stderr to a combined budget.
+
+    Returns:
+        The result unchanged when within budget, otherwise a copy with
+        compacted "stdout" and "stderr"
+    """
+    stdout = (result.get("stdout") or "").encode()
+    stderr = (result.get("stderr") or "").encode()
+    if len(stdout) + len(stderr) <= max_bytes:
+        return result
+
+    kept = compact_streams(stdout, stderr, max_bytes, result.get("command", "command"))
+    return {
+        **result,
+        "stdout": kept[0].decode("utf-8", errors="replace"),
+        "stderr": kept[1].decode("utf-8", errors="replace"),
+    }
@@ -0,0 +1,54 @@
+"""
+FastMCP middleware that accepts a per-call output budget on the tools that honour it.
+"""
+from typing import Any, Dict, Iterable, Sequence
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext, CallNext
+
+from tools._common.output_budget import BUDGETED_TOOLS, MIN_OUTPUT_BYTES, output_budget
+
+BUDGET_ARGUMENT = "max_output_bytes"
+
+BUDGET_SCHEMA = {
+    "type": "integer",
+    "minimum": MIN_OUTPUT_BYTES,
+    "description": (
+        "Optional limit on command output returned; repeated lines are collapsed "
+        "and the head and tail kept"
+    ),
+}
+
+
+class OutputBudgetMiddleware(Middleware):
+    """Accept a max_output_bytes argument on budgeted tools and apply it while they run."""
+
+    def __init__(self, tools: Iterable[str] = BUDGETED_TOOLS):
+        self.tools = frozenset(tools)
+
+    async def on_list_tools(self, context: MiddlewareContext, call_next: CallNext) -> Sequence[Any]:
+        tools = await call_next(context)
+        advertised = []
+        for tool in tools:
+            properties = tool.parameters.get("properties", {})
+            if tool.name in self.tools and BUDGET_ARGUMENT not in properties:
+                parameters = {
+                    **tool.parameters,
+                    "properties": {**properties, BUDGET_ARGUMENT: BUDGET_SCHEMA},
+                }
+                tool = tool.model_copy(update={"parameters": parameters})
+            advertised.append(tool)
+        return advertised
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        arguments: Dict[str, Any] = dict(context.message.arguments or {})
+        if context.message.name not in self.tools or BUDGET_ARGUMENT not in arguments:
+            return await call_next(context)
+
+        budget = arguments.pop(BUDGET_ARGUMENT)
+        stripped = context.copy(message=context.message.model_copy(update={"arguments": arguments}))
+        if budget is None:
+            return await call_next(stripped)
+        if isinstance(budget, bool) or not isinstance(budget, int):
+            raise ValueError(f"{BUDGET_ARGUMENT} must be an integer")
+        with output_budget(budget):
+            return await call_next(stripped)
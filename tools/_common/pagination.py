@@ -0,0 +1,188 @@
+"""
+Cursor pagination over parsed list output.
+
+The first paged call runs the `--format json` listing once and keeps the
+parsed entries as a snapshot for ACMS_PAGE_SNAPSHOT_TTL seconds after its
+last use. The cursor returned with each page names the snapshot and the
+offset of the next page, so following pages are slices of the snapshot:
+they never re-run the CLI and see the same, stable set of records.
+
+Snapshots are held in memory, so with --workers a cursor is only found by
+the worker that created it; a missing or expired cursor asks the client to
+list again.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import secrets
+import logging
+import time
+import os
+
+from tools._common.columnar import encode_output
+from tools._common.projection import EntryFilter, project, select
+from tools._common.resources import resource_id, run_json_command
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+PAGE_SNAPSHOT_TTL = float(os.getenv("ACMS_PAGE_SNAPSHOT_TTL", "120"))
+PAGE_MAX_SNAPSHOTS = int(os.getenv("ACMS_PAGE_MAX_SNAPSHOTS", "256"))
+PAGE_MAX_LIMIT = int(os.getenv("ACMS_PAGE_MAX_LIMIT", "1000"))
+
+
+class Snapshot:
+    """Parsed entries of one listing, paged by offset."""
+
+    def __init__(self, kind: str, entries: List[Any], limit: int):
+        self.kind = kind
+        self.entries = entries
+        self.limit = limit
+        self.expires = 0.0
+
+
+class SnapshotStore:
+    """Recently listed snapshots by id, least recently used first."""
+
+    def __init__(self, ttl: float = PAGE_SNAPSHOT_TTL, max_snapshots: int = PAGE_MAX_SNAPSHOTS):
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[str, Snapshot]" = OrderedDict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for sid in [sid for sid, snap in self._snapshots.items() if snap.expires <= now]:
+            del self._snapshots[sid]
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+
+    def add(self, snapshot: Snapshot) -> str:
+        sid = secrets.token_urlsafe(9)
+        snapshot.expires = time.monotonic() + self.ttl
+        self._snapshots[sid] = snapshot
+        self._expire()
+        return sid
+
+    def get(self, kind: str, sid: str) -> Snapshot:
+        """
+        Return a live snapshot and extend its lifetime.
+
+        Raises:
+            ValueError: If the snapshot expired, was evicted or lists another kind
+        """
+        self._expire()
+        snapshot = self._snapshots.get(sid)
+        if snapshot is None or snapshot.kind != kind:
+            raise ValueError("cursor has expired or is not valid for this tool; list again")
+        snapshot.expires = time.monotonic() + self.ttl
+        self._snapshots.move_to_end(sid)
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+
+snapshots = SnapshotStore()
+
+
+def encode_cursor(sid: str, offset: int) -> str:
+    return f"{sid}.{offset}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Split a cursor into its snapshot id and offset.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    sid, _, offset = cursor.rpartition(".")
+    if not sid or not offset.isdigit():
+        raise ValueError("cursor is malformed; pass next_cursor from a previous page")
+    return sid, int(offset)
+
+
+async def list_page(
+    kind: str,
+    command: Sequence[str],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    quiet: bool = False,
+    entry_filter: Optional[EntryFilter] = None,
+    fields: Optional[List[str]] = None,
+    encoding: str = "records",
+) -> Union[str, Dict[str, Any]]:
+    """
+    Return one page of a listing as JSON.
+
+    Without a cursor the listing is run, filtered and snapshotted; with one,
+    the page is sliced from the snapshot and the listing options and filter
+    are those of the call that started it.
+
+    Args:
+        kind: container, image, volume or network
+        command: Listing command with `--format json`
+        limit: Page size (default: the first page's size, or PAGE_MAX_LIMIT)
+        cursor: next_cursor from the previous page
+        quiet: Return identifiers instead of full entries
+        entry_filter: Keep only matching entries
+        fields: Project each entry on the page to these fields
+        encoding: records, or columnar for a table object (see columnar.py)
+
+    Returns:
+        JSON object with "items", "total" and "next_cursor" (null on the last page),
+        or a columnar table with "total" and "next_cursor"
+
+    Raises:
+        ValueError: If limit is out of range or the cursor is malformed or expired
+    """
+    if limit is not None and not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {PAGE_MAX_LIMIT}")
+
+    if cursor:
+        sid, offset = decode_cursor(cursor)
+        snapshot = snapshots.get(kind, sid)
+    else:
+        entries = select(kind, await run_json_command(*command), entry_filter)
+        snapshot = Snapshot(kind, entries, limit or 0)
+        sid, offset = snapshots.add(snapshot), 0
+        logger.debug(f"Snapshotted {len(snapshot.entries)} {kind} entries for paging")
+
+    size = limit or snapshot.limit or PAGE_MAX_LIMIT
+    page = snapshot.entries[offset : offset + size]
+    end = offset + len(page)
+    if quiet:
+        items = [resource_id(kind, e) for e in page if isinstance(e, dict)]
+    else:
+        items = [project(kind, e, fields) for e in page]
+    return encode_output(
+        items,
+        encoding,
+        total=len(snapshot.entries),
+        next_cursor=encode_cursor(sid, end) if end < len(snapshot.entries) else None,
+    )
+
+
+async def list_json(
+    kind: str,
+    command: Sequence[str],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    quiet: bool = False,
+    entry_filter: Optional[EntryFilter] = None,
+    fields: Optional[List[str]] = None,
+    encoding: str = "records",
+) -> Union[str, Dict[str, Any]]:
+    """
+    Return a filtered, projected listing as JSON, paged when limit or cursor is given.
+
+    Unpaged listings are a JSON array or a columnar table; see list_page for
+    paged ones.
+    """
+    if limit is not None or cursor:
+        return await list_page(kind, command, limit, cursor, quiet, entry_filter, fields, encoding)
+    entries = select(kind, await run_json_command(*command), entry_filter)
+    if quiet:
+        items = [resource_id(kind, e) for e in entries]
+    else:
+        items = [project(kind, e, fields) for e in entries]
+    return encode_output(items, encoding)
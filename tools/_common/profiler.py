@@ -0,0 +1,126 @@
+"""
+In-process sampling profiler and asyncio task dump for a running ACMS server.
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import threading
+import asyncio
+import sys
+import os
+
+DEFAULT_INTERVAL = 0.005  # 5ms between samples
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Semicolons separate frames in the collapsed format
+    name = getattr(code, "co_qualname", code.co_name).replace(";", ":")
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of every thread from a background thread.
+
+    Sampling reads sys._current_frames() and never installs a trace or profile
+    hook, so the profiled code runs unmodified between samples.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.counts: "Counter[str]" = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        own_ident = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(thread_names.get(ident, f"thread-{ident}").replace(";", ":"))
+            self.counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="acms-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """
+        Return the samples in collapsed-stack format.
+
+        One "frame;frame;frame count" line per distinct stack, rooted at the
+        thread name, as consumed by flamegraph.pl, speedscope and inferno.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+async def profile(seconds: float, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """
+    Sample every thread of this process for a number of seconds.
+
+    Args:
+        seconds: How long to sample
+        interval: Seconds between samples
+
+    Returns:
+        The stopped profiler holding the samples
+    """
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def dump_asyncio_tasks(limit: int = 32) -> List[Dict[str, Any]]:
+    """
+    Describe every task of the running event loop and where it is suspended.
+
+    Args:
+        limit: Maximum stack frames reported per task
+
+    Returns:
+        One entry per task with its name, coroutine, state and stack
+    """
+    current = asyncio.current_task()
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        if task.cancelled():
+            state = "cancelled"
+        elif task.done():
+            state = "done"
+        else:
+            state = "pending"
+        tasks.append(
+            {
+                "name": task.get_name(),
+                "coro": getattr(coro, "__qualname__", repr(coro)),
+                "state": state,
+                "current": task is current,
+                "stack": [
+                    f"{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+                    for frame in task.get_stack(limit=limit)
+                ],
+            }
+        )
+    return sorted(tasks, key=lambda t: t["name"])
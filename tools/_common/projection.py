@@ -0,0 +1,163 @@
+"""
+Filters and field projection over parsed `--format json` output.
+
+Filters are key=value expressions:
+
+    state=running       status matches (glob, case-insensitive)
+    name=web-*          identifier matches (glob)
+    image=*/nginx:*     image reference matches (glob); for images, the reference itself
+    label=tier=web      labels satisfy a label selector (see selectors.py)
+
+Expressions with the same key are alternatives; different keys, and each
+label expression, must all hold.
+
+Fields are dotted paths into an entry, looked up in the entry and then in
+its "configuration" (so "networks" and "image.reference" both work), plus
+the computed fields id, state, image and labels.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import fnmatch
+import json
+
+from tools._common.resources import resource_id, resource_status, run_json_command
+from tools._common.selectors import LabelSelector, labels_of
+from tools._common.utils import validate_array_parameter
+
+FILTER_KEYS = ("state", "name", "image", "label")
+
+
+def resource_image(kind: str, entry: Dict[str, Any]) -> Optional[str]:
+    """Return the image reference of a container, or an image's own reference."""
+    if kind == "image":
+        return resource_id(kind, entry)
+    for source in (entry, entry.get("configuration")):
+        if isinstance(source, dict):
+            image = source.get("image")
+            if isinstance(image, dict):
+                image = image.get("reference")
+            if isinstance(image, str):
+                return image
+    return None
+
+
+def _lookup(entry: Any, path: str) -> Any:
+    value = entry
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+    return value
+
+
+def field_value(kind: str, entry: Dict[str, Any], field: str) -> Any:
+    """Return one field of an entry, computed or by dotted path."""
+    if field == "id":
+        return resource_id(kind, entry)
+    if field == "state":
+        return resource_status(entry)
+    if field == "image":
+        return resource_image(kind, entry)
+    if field == "labels":
+        return labels_of(entry) or {}
+    value = _lookup(entry, field)
+    if value is None and isinstance(entry.get("configuration"), dict):
+        value = _lookup(entry["configuration"], field)
+    return value
+
+
+class EntryFilter:
+    """Parsed filter expressions."""
+
+    def __init__(self, clauses: Dict[str, List[str]], selectors: List[LabelSelector]):
+        self.clauses = clauses
+        self.selectors = selectors
+
+    @classmethod
+    def parse(cls, expressions: Any) -> Optional["EntryFilter"]:
+        """
+        Parse filter expressions.
+
+        Args:
+            expressions: A key=value string, a list of them, or None
+
+        Returns:
+            The parsed filter, or None when there is nothing to filter on
+
+        Raises:
+            ValueError: If an expression is malformed or has an unknown key
+        """
+        validated = validate_array_parameter(expressions, "filter")
+        if not validated:
+            return None
+        clauses: Dict[str, List[str]] = {}
+        selectors: List[LabelSelector] = []
+        for expression in validated:
+            key, sep, value = expression.partition("=")
+            key = key.strip()
+            if not sep or key not in FILTER_KEYS or not value.strip():
+                raise ValueError(
+                    f"Invalid filter '{expression}'; expected one of "
+                    f"{', '.join(k + '=...' for k in FILTER_KEYS)}"
+                )
+            if key == "label":
+                selectors.append(LabelSelector.parse(value))
+            else:
+                clauses.setdefault(key, []).append(value.strip())
+        return cls(clauses, selectors)
+
+    def matches(self, kind: str, entry: Any) -> bool:
+        """Return True if an entry satisfies every filter."""
+        if not isinstance(entry, dict):
+            return False
+        for key, patterns in self.clauses.items():
+            value = field_value(kind, entry, "id" if key == "name" else key)
+            if not isinstance(value, str):
+                return False
+            if key == "state":
+                value, patterns = value.lower(), [p.lower() for p in patterns]
+            if not any(fnmatch.fnmatchcase(value, p) for p in patterns):
+                return False
+        labels = labels_of(entry) or {}
+        return all(selector.matches(labels) for selector in self.selectors)
+
+
+def parse_fields(fields: Any) -> Optional[List[str]]:
+    """Validate a fields parameter: a field name, a list of them, or None."""
+    validated = validate_array_parameter(fields, "fields")
+    if validated and any(not f.strip() for f in validated):
+        raise ValueError("fields cannot contain empty names")
+    return [f.strip() for f in validated] if validated else None
+
+
+def project(kind: str, entry: Any, fields: Optional[List[str]]) -> Any:
+    """Keep only the requested fields of an entry, in the order requested."""
+    if not fields or not isinstance(entry, dict):
+        return entry
+    return {field: field_value(kind, entry, field) for field in fields}
+
+
+def select(
+    kind: str,
+    entries: Any,
+    entry_filter: Optional[EntryFilter] = None,
+    fields: Optional[List[str]] = None,
+) -> List[Any]:
+    """Filter parsed entries and project the remainder."""
+    entries = entries if isinstance(entries, list) else [entries] if entries else []
+    if entry_filter is not None:
+        entries = [e for e in entries if entry_filter.matches(kind, e)]
+    return [project(kind, e, fields) for e in entries]
+
+
+async def inspect_json(
+    kind: str,
+    command: Sequence[str],
+    entry_filter: Optional[EntryFilter] = None,
+    fields: Optional[List[str]] = None,
+) -> str:
+    """Run an inspect command and return its filtered, projected JSON."""
+    entries = select(kind, await run_json_command(*command), entry_filter, fields)
+    return json.dumps(entries, separators=(",", ":"))
@@ -0,0 +1,116 @@
+"""
+Parsed listings of containers, images, volumes and networks.
+
+Each kind is read with one `--format json` listing and normalized to
+records with the kind, an identifier the CLI accepts, the labels and the
+original entry, so tools that work across kinds share one view of state.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+
+from tools._common.selectors import labels_of
+from tools._common.utils import run_container_command
+
+KINDS = ("container", "image", "volume", "network")
+
+LIST_COMMANDS = {
+    "container": ("list", "--all", "--format", "json"),
+    "image": ("image", "ls", "--format", "json"),
+    "volume": ("volume", "ls", "--format", "json"),
+    "network": ("network", "ls", "--format", "json"),
+}
+
+# Keys holding the identifier the CLI accepts, in order of preference
+ID_KEYS = {
+    "container": ("id",),
+    "image": ("reference", "name"),
+    "volume": ("name", "id"),
+    "network": ("id", "name"),
+}
+
+
+async def run_json_command(*args: str) -> Any:
+    """
+    Run a container command and parse its JSON output.
+
+    Raises:
+        RuntimeError: If the command fails
+        ValueError: If the output is not JSON
+    """
+    result = await run_container_command(*args)
+    if result["return_code"] != 0:
+        raise RuntimeError(f"`container {' '.join(args)}` failed: {result['stderr'].strip()}")
+    return json.loads(result["stdout"] or "null")
+
+
+def resource_id(kind: str, entry: Dict[str, Any]) -> Optional[str]:
+    """Return the identifier of a listed resource, looking in its configuration too."""
+    for source in (entry, entry.get("configuration")):
+        if isinstance(source, dict):
+            for key in ID_KEYS[kind]:
+                if isinstance(source.get(key), str):
+                    return source[key]
+    return None
+
+
+def resource_status(entry: Dict[str, Any]) -> Optional[str]:
+    status = entry.get("status")
+    return status if isinstance(status, str) else None
+
+
+async def list_resources(kind: str) -> List[Dict[str, Any]]:
+    """
+    List resources of one kind as normalized records.
+
+    Image listings carry no labels, so images are inspected in a single
+    additional call when their labels are needed.
+
+    Args:
+        kind: container, image, volume or network
+
+    Returns:
+        Records with "kind", "id", "labels", "status" and the raw "entry"
+
+    Raises:
+        RuntimeError: If a listing fails or image labels cannot be resolved
+    """
+    entries = await run_json_command(*LIST_COMMANDS[kind])
+    records = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        rid = resource_id(kind, entry)
+        if rid is None:
+            continue
+        records.append(
+            {
+                "kind": kind,
+                "id": rid,
+                "labels": labels_of(entry),
+                "status": resource_status(entry),
+                "entry": entry,
+            }
+        )
+
+    if kind == "image" and records and all(r["labels"] is None for r in records):
+        inspected = await run_json_command("image", "inspect", *(r["id"] for r in records))
+        if not isinstance(inspected, list) or len(inspected) != len(records):
+            raise RuntimeError(
+                f"`container image inspect` did not return one entry per image for "
+                f"{len(records)} images; cannot resolve image labels"
+            )
+        for record, details in zip(records, inspected):
+            if not isinstance(details, dict):
+                raise RuntimeError(f"Cannot resolve labels of image {record['id']}")
+            record["labels"] = labels_of(details)
+
+    for record in records:
+        record["labels"] = record["labels"] or {}
+    return records
+
+
+async def list_all(kinds: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """List several kinds concurrently."""
+    listings = await asyncio.gather(*(list_resources(kind) for kind in kinds))
+    return dict(zip(kinds, listings))
@@ -0,0 +1,128 @@
+"""
+Label selectors for matching containers, images, volumes and networks.
+
+The syntax follows Kubernetes label selectors: comma-separated
+requirements that must all hold.
+
+    key=value, key==value   label equals value
+    key!=value              label missing or not equal to value
+    key in (a, b)           label is one of the values
+    key notin (a, b)        label missing or none of the values
+    key                     label exists
+    !key                    label does not exist
+"""
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import re
+
+_KEY = r"[A-Za-z0-9][A-Za-z0-9._/-]*"
+_REQUIREMENT = re.compile(
+    rf"""\s*(?:
+        (?P<not_exists>!\s*{_KEY})
+      | (?P<set_key>{_KEY})\s+(?P<set_op>in|notin)\s*\((?P<values>[^)]*)\)
+      | (?P<eq_key>{_KEY})\s*(?P<eq_op>==|!=|=)\s*(?P<value>[^,\s]*)
+      | (?P<exists>{_KEY})
+    )\s*(?:,|$)""",
+    re.VERBOSE,
+)
+
+
+class LabelSelector:
+    """A parsed label selector."""
+
+    def __init__(self, requirements: List[Tuple[str, str, FrozenSet[str]]]):
+        self.requirements = requirements
+
+    @classmethod
+    def parse(cls, selector: str) -> "LabelSelector":
+        """
+        Parse a selector expression.
+
+        Args:
+            selector: Selector such as "job=1234,tier in (web, worker),!debug"
+
+        Returns:
+            The parsed selector
+
+        Raises:
+            ValueError: If the expression is empty or malformed
+        """
+        if not selector or not selector.strip():
+            raise ValueError("Label selector cannot be empty")
+
+        requirements: List[Tuple[str, str, FrozenSet[str]]] = []
+        position = 0
+        while position < len(selector):
+            match = _REQUIREMENT.match(selector, position)
+            if match is None or match.end() == position:
+                raise ValueError(
+                    f"Invalid label selector at '{selector[position:]}'; expected key=value, "
+                    "key!=value, key in (a,b), key notin (a,b), key or !key"
+                )
+            if match.group("not_exists"):
+                requirements.append((match.group("not_exists")[1:].strip(), "!", frozenset()))
+            elif match.group("set_key"):
+                values = frozenset(v.strip() for v in match.group("values").split(",") if v.strip())
+                if not values:
+                    raise ValueError(f"Empty value set in label selector '{match.group(0)}'")
+                requirements.append((match.group("set_key"), match.group("set_op"), values))
+            elif match.group("eq_key"):
+                op = "!=" if match.group("eq_op") == "!=" else "="
+                requirements.append((match.group("eq_key"), op, frozenset([match.group("value")])))
+            else:
+                requirements.append((match.group("exists"), "exists", frozenset()))
+            position = match.end()
+        return cls(requirements)
+
+    @property
+    def positive(self) -> bool:
+        """True if some requirement needs a label to be present (=, in or exists)."""
+        return any(op in ("=", "in", "exists") for _, op, _ in self.requirements)
+
+    def matches(self, labels: Dict[str, str]) -> bool:
+        """Return True if labels satisfy every requirement."""
+        for key, op, values in self.requirements:
+            present = key in labels
+            value = labels.get(key)
+            if op in ("=", "in") and (not present or value not in values):
+                return False
+            if op in ("!=", "notin") and present and value in values:
+                return False
+            if op == "exists" and not present:
+                return False
+            if op == "!" and present:
+                return False
+        return True
+
+
+def labels_of(entry: Any) -> Optional[Dict[str, str]]:
+    """
+    Find the labels in a resource's JSON from `list` or `inspect`.
+
+    Labels are looked for under a "labels" or "Labels" key at any depth, as a
+    mapping or a list of key=value strings.
+
+    Returns:
+        The labels, or None if the entry has no labels field at all
+    """
+    if isinstance(entry, dict):
+        for key in ("labels", "Labels"):
+            value = entry.get(key)
+            if isinstance(value, dict):
+                return {str(k): str(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return dict(
+                    item.split("=", 1) if "=" in item else (item, "")
+                    for item in value
+                    if isinstance(item, str)
+                )
+        children = list(entry.values())
+    elif isinstance(entry, list):
+        children = entry
+    else:
+        return None
+    for child in children:
+        if isinstance(child, (dict, list)):
+            found = labels_of(child)
+            if found is not None:
+                return found
+    return None
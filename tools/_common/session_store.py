@@ -0,0 +1,67 @@
+"""
+Pluggable session store for sharing server state between ACMS instances.
+"""
+from urllib.parse import urlparse
+from typing import Optional
+from pathlib import Path
+import logging
+
+from key_value.aio.wrappers.encryption import FernetEncryptionWrapper
+from key_value.aio.protocols import AsyncKeyValue
+from cryptography.fernet import Fernet
+
+from fastmcp.server.auth.jwt_issuer import derive_jwt_key
+
+logger = logging.getLogger("ACMS")
+
+SESSION_STORE_SCHEMES = ("sqlite", "disk", "memory", "redis", "rediss")
+
+
+def create_session_store(url: str, encryption_secret: Optional[str] = None) -> AsyncKeyValue:
+    """
+    Create a key-value session store from a URL.
+
+    Supported URLs:
+        sqlite:///path/to/dir  SQLite-backed store in a local directory (also disk://)
+        memory://              In-process store, for tests and single instances
+        redis://host:port/db   Redis store shared by instances on several hosts
+
+    Args:
+        url: Store URL
+        encryption_secret: High-entropy secret every instance shares; when given,
+            stored values are encrypted with a key derived from it
+
+    Returns:
+        Store implementing the AsyncKeyValue protocol
+
+    Raises:
+        ValueError: If the URL scheme is not supported
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+
+    if scheme in ("sqlite", "disk"):
+        from key_value.aio.stores.disk import DiskStore
+
+        directory = Path((parsed.netloc + parsed.path) or ".").expanduser()
+        store: AsyncKeyValue = DiskStore(directory=directory)
+    elif scheme == "memory":
+        from key_value.aio.stores.memory import MemoryStore
+
+        store = MemoryStore()
+    elif scheme in ("redis", "rediss"):
+        from key_value.aio.stores.redis import RedisStore
+
+        store = RedisStore(url=url)
+    else:
+        raise ValueError(
+            f"Unsupported session store URL '{url}'. "
+            f"Expected one of: {', '.join(s + '://' for s in SESSION_STORE_SCHEMES)}"
+        )
+
+    if encryption_secret:
+        key = derive_jwt_key(high_entropy_material=encryption_secret, salt="acms-session-store")
+        store = FernetEncryptionWrapper(key_value=store, fernet=Fernet(key=key))
+
+    logger.info(f"Session store: {scheme} ({'encrypted' if encryption_secret else 'unencrypted'})")
+    return store
@@ -0,0 +1,271 @@
+"""
+Per-call tracing for ACMS tool calls.
+
+Each tools/call request becomes a trace correlated by its MCP request ID,
+with one span per phase:
+
+    validate        FastMCP parameter validation and the tool's own argument
+                    checks, up to the first container command
+    semaphore.wait  Waiting for a command slot
+    process.spawn   Starting the container CLI process
+    container.run   The container CLI running to completion
+    format_result   format_command_result
+
+Finished traces are exported as OTLP/JSON (ExportTraceServiceRequest) by a
+background thread, to a JSON-lines file (ACMS_TRACE_FILE, readable by the
+OpenTelemetry collector's otlpjsonfile receiver) and/or an OTLP/HTTP
+collector (ACMS_TRACE_ENDPOINT). Tracing is off unless one is configured.
+
+This module has no FastMCP dependency so that tools can import it cheaply;
+the middleware that opens traces is in tracing_middleware.py.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import threading
+import logging
+import queue
+import json
+import time
+import os
+
+logger = logging.getLogger("ACMS")
+
+# Configuration from environment variables
+TRACE_FILE = os.getenv("ACMS_TRACE_FILE")  # JSON-lines file of OTLP export requests
+TRACE_ENDPOINT = os.getenv("ACMS_TRACE_ENDPOINT")  # OTLP/HTTP collector, e.g. http://localhost:4318
+TRACE_SLOW_MS = float(os.getenv("ACMS_TRACE_SLOW_MS", "0"))  # Log a phase breakdown above this
+
+SERVICE_NAME = "acms"
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def tracing_enabled() -> bool:
+    """Return True when an export destination is configured."""
+    return bool(TRACE_FILE or TRACE_ENDPOINT)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: str, kind: int = SPAN_KIND_INTERNAL):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [
+                {"key": key, "value": _attribute_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": (
+                {"code": STATUS_ERROR, "message": self.error}
+                if self.error
+                else {"code": STATUS_OK}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """All spans of one tool call, exported together when the root span ends."""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(self, name, parent_id="", kind=SPAN_KIND_SERVER)
+        self.root.attributes.update(attributes or {})
+        self.spans: List[Span] = [self.root]
+        # Open until the first phase span starts
+        self.validate: Optional[Span] = self.start_span("validate", self.root)
+
+    def start_span(self, name: str, parent: Span) -> Span:
+        span = Span(self, name, parent.span_id)
+        self.spans.append(span)
+        return span
+
+    def end_validation(self) -> None:
+        if self.validate is not None:
+            self.validate.end()
+            self.validate = None
+
+    def phase_breakdown(self) -> Dict[str, float]:
+        """Return total milliseconds per phase name, excluding the root span."""
+        phases: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            phases[span.name] = phases.get(span.name, 0.0) + span.duration_ms
+        return phases
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                            {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "acms.tracing"},
+                            "spans": [span.to_otlp() for span in self.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("acms_current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the tool call running in this context, if any."""
+    span = _current_span.get()
+    return span.trace if span is not None else None
+
+
+@contextmanager
+def trace_call(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Trace]:
+    """
+    Trace a tool call; phases recorded with span() in this context join the trace.
+
+    Args:
+        name: Root span name
+        attributes: Root span attributes, such as the MCP request ID
+    """
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.end_validation()
+        trace.root.end()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Record a phase of the current tool call.
+
+    Yields None without recording anything when the call is not being traced,
+    so phases can be instrumented unconditionally.
+
+    Args:
+        name: Phase name
+        **attributes: Span attributes
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    trace = parent.trace
+    trace.end_validation()
+    child = trace.start_span(name, parent)
+    child.attributes.update(attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+
+class TraceExporter:
+    """Write finished traces from a background thread so exporting never blocks a request."""
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        self._queue: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="acms-trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        self._queue.put(trace)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        client = None
+        if self.endpoint:
+            import httpx
+
+            client = httpx.Client(timeout=10)
+
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                break
+            payload = json.dumps(trace.to_otlp(), separators=(",", ":"))
+            if self.path:
+                try:
+                    # One write per trace keeps lines whole when workers share the file
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(payload + "\n")
+                except OSError as e:
+                    logger.warning(f"Failed to write trace to {self.path}: {e}")
+            if client is not None:
+                try:
+                    client.post(
+                        self.endpoint,
+                        content=payload,
+                        headers={"Content-Type": "application/json"},
+                    ).raise_for_status()
+                except Exception as e:
+                    logger.warning(f"Failed to export trace to {self.endpoint}: {e}")
+
+        if client is not None:
+            client.close()
@@ -0,0 +1,44 @@
+"""
+FastMCP middleware that traces every tool call.
+"""
+from typing import Any, Dict
+import logging
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext, CallNext
+
+from tools._common.tracing import TRACE_SLOW_MS, TraceExporter, trace_call
+
+logger = logging.getLogger("ACMS")
+
+
+class TracingMiddleware(Middleware):
+    """Open a trace for every tools/call request and export it when the call ends."""
+
+    def __init__(self, exporter: TraceExporter, slow_ms: float = TRACE_SLOW_MS):
+        self.exporter = exporter
+        self.slow_ms = slow_ms
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        tool_name = getattr(context.message, "name", "unknown")
+        attributes: Dict[str, Any] = {"mcp.method": "tools/call", "mcp.tool.name": tool_name}
+        ctx = context.fastmcp_context
+        if ctx is not None and ctx.request_context is not None:
+            attributes["mcp.request_id"] = ctx.request_id
+            attributes["mcp.session_id"] = ctx.session_id
+
+        trace = None
+        try:
+            with trace_call(f"tools/call {tool_name}", attributes) as trace:
+                return await call_next(context)
+        finally:
+            if trace is not None:
+                self.exporter.export(trace)
+                if self.slow_ms and trace.root.duration_ms >= self.slow_ms:
+                    breakdown = ", ".join(
+                        f"{name}={ms:.1f}ms" for name, ms in trace.phase_breakdown().items()
+                    )
+                    logger.warning(
+                        f"Slow call {tool_name} "
+                        f"(request {attributes.get('mcp.request_id', '-')}, "
+                        f"trace {trace.trace_id}): {trace.root.duration_ms:.1f}ms [{breakdown}]"
+                    )
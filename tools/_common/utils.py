@@ -1,12 +1,19 @@
 """
 Shared utilities for ACMS MCP tools.
 """
-from typing import TypeAlias, Optional, List, Dict, Any, Set
+from typing import TypeAlias, Optional, List, Dict, Any, Set, AsyncIterator, Union
+from contextlib import asynccontextmanager
 import asyncio
 import logging
 import json
 import os
+import signal
 import time
+import re
+
+from tools._common.limiter import SharedSemaphore, is_recorded_process, pid_alive
+from tools._common.output_budget import apply_budget, compact_streams, validate_budget
+from tools._common.tracing import span
 
 logger = logging.getLogger("ACMS")
 
@@ -16,12 +23,48 @@ CommandResult: TypeAlias = Dict[str, Any]
 COMMAND_TIMEOUT = int(os.getenv("ACMS_COMMAND_TIMEOUT", "300"))  # 5 minutes default
 MAX_CONCURRENT_COMMANDS = int(os.getenv("ACMS_MAX_CONCURRENT", "10"))
 MAX_ARG_LENGTH = int(os.getenv("ACMS_MAX_ARG_LENGTH", "65536"))  # 64KB per argument
-
-# Concurrency control
-_command_semaphore = asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+SHARED_LIMIT_DIR = os.getenv("ACMS_SHARED_LIMIT_DIR")  # Set by acms.py in multi-worker mode
+
+# Concurrency control - shared across worker processes when SHARED_LIMIT_DIR is set
+_command_semaphore: Union[asyncio.Semaphore, SharedSemaphore] = (
+    SharedSemaphore(SHARED_LIMIT_DIR, MAX_CONCURRENT_COMMANDS)
+    if SHARED_LIMIT_DIR
+    else asyncio.Semaphore(MAX_CONCURRENT_COMMANDS)
+)
 _active_processes: Set[asyncio.subprocess.Process] = set()
 
 
+def _available_slots() -> int:
+    """Return the number of free command slots, across all workers in multi-worker mode."""
+    if isinstance(_command_semaphore, SharedSemaphore):
+        return _command_semaphore.available()
+    return _command_semaphore._value
+
+
+@asynccontextmanager
+async def _command_slot() -> AsyncIterator[Optional[int]]:
+    """Hold a command slot, yielding the shared slot index in multi-worker mode."""
+    if isinstance(_command_semaphore, SharedSemaphore):
+        with span("semaphore.wait") as wait_span:
+            # Only probe the shared slots when the call is being traced
+            if wait_span is not None:
+                wait_span.set_attribute("acms.slots.available", _available_slots())
+            slot = await _command_semaphore.acquire()
+        try:
+            yield slot
+        finally:
+            _command_semaphore.release(slot)
+    else:
+        with span("semaphore.wait") as wait_span:
+            if wait_span is not None:
+                wait_span.set_attribute("acms.slots.available", _available_slots())
+            await _command_semaphore.acquire()
+        try:
+            yield None
+        finally:
+            _command_semaphore.release()
+
+
 def _validate_container_arg(arg: str) -> str:
     """
     Validate container command arguments to prevent command injection.
@@ -58,13 +101,18 @@ def _validate_container_arg(arg: str) -> str:
     return arg
 
 
-async def run_container_command(*args: str, timeout: Optional[int] = None) -> CommandResult:
+async def run_container_command(
+    *args: str, timeout: Optional[int] = None, max_output_bytes: Optional[int] = None
+) -> CommandResult:
     """
     Execute a container command and return the result with timeout and concurrency control.
 
     Args:
         *args: Command arguments to pass to container CLI
         timeout: Optional timeout in seconds (defaults to COMMAND_TIMEOUT env var)
+        max_output_bytes: Compact stdout and stderr to about this many bytes before
+            decoding them, for output that is only formatted, never parsed
+            (default: keep output whole)
 
     Returns:
         Dict[str, Any]: Command execution result containing stdout, stderr, return_code, command, and duration
@@ -81,33 +129,45 @@ async def run_container_command(*args: str, timeout: Optional[int] = None) -> Co
         raise ValueError(f"Invalid command argument: {e}")
 
     cmd = ["container"] + validated_args
+    if max_output_bytes:
+        validate_budget(max_output_bytes)
     timeout_value = timeout if timeout is not None else COMMAND_TIMEOUT
 
     # Use semaphore to limit concurrent commands
-    async with _command_semaphore:
-        active_count = MAX_CONCURRENT_COMMANDS - _command_semaphore._value
-        logger.info(
-            f"Executing: {' '.join(cmd)} "
-            f"(active: {active_count}/{MAX_CONCURRENT_COMMANDS}, timeout: {timeout_value}s)"
-        )
+    async with _command_slot() as slot:
+        # Counting free shared slots probes the lock of each one, so only do it when debugging
+        if isinstance(_command_semaphore, asyncio.Semaphore) or logger.isEnabledFor(logging.DEBUG):
+            active_count = MAX_CONCURRENT_COMMANDS - _available_slots()
+            active = f"active: {active_count}/{MAX_CONCURRENT_COMMANDS}, "
+        else:
+            active = ""
+        logger.info(f"Executing: {' '.join(cmd)} ({active}timeout: {timeout_value}s)")
 
         start_time = time.time()
         process = None
 
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-            )
+            with span("process.spawn", **{"process.command": " ".join(cmd)}) as spawn_span:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                if spawn_span is not None:
+                    spawn_span.set_attribute("process.pid", process.pid)
 
             # Track active process for graceful shutdown
             _active_processes.add(process)
+            if slot is not None:
+                _command_semaphore.record_pid(slot, process.pid)
 
             try:
                 # Execute with timeout
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=timeout_value
-                )
+                with span("container.run") as run_span:
+                    stdout, stderr = await asyncio.wait_for(
+                        process.communicate(),
+                        timeout=timeout_value
+                    )
+                    if run_span is not None:
+                        run_span.set_attribute("process.exit_code", process.returncode)
             except asyncio.TimeoutError:
                 # Kill the process on timeout
                 logger.error(f"Command timed out after {timeout_value}s, killing process")
@@ -121,6 +181,11 @@ async def run_container_command(*args: str, timeout: Optional[int] = None) -> Co
                 )
 
             duration = time.time() - start_time
+            if max_output_bytes:
+                # Only the output that is kept is ever decoded
+                stdout, stderr = compact_streams(
+                    stdout or b"", stderr or b"", max_output_bytes, " ".join(cmd)
+                )
             stdout_text = stdout.decode("utf-8", errors="replace") if stdout else ""
             stderr_text = stderr.decode("utf-8", errors="replace") if stderr else ""
 
@@ -216,16 +281,48 @@ def validate_array_parameter(param: Any, param_name: str) -> Optional[List[str]]
     )
 
 
-def format_command_result(result: CommandResult) -> str:
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4, "P": 1024**5}
+
+
+def parse_size(value: str) -> int:
+    """
+    Parse a container CLI size such as 2048MB, 4G or 512MiB into bytes.
+
+    Args:
+        value: Size with an optional binary unit suffix
+
+    Returns:
+        int: Size in bytes
+
+    Raises:
+        ValueError: If the size cannot be parsed
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)(?:I?B)?\s*", value.upper())
+    if not match:
+        raise ValueError(f"Invalid size '{value}', expected e.g. 2048MB or 4G")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_command_result(result: CommandResult, max_output_bytes: Optional[int] = None) -> str:
     """
     Format the result from a container command execution.
 
     Args:
         result: Dictionary containing command execution results
+        max_output_bytes: Compact stdout and stderr to about this many bytes, collapsing
+            repeated lines and keeping the head and tail (default: keep output verbatim).
+            Only pass it for line-oriented output: a head/tail cut breaks JSON
 
     Returns:
         str: Formatted result string for client response
     """
+    with span("format_result"):
+        if max_output_bytes:
+            result = apply_budget(result, validate_budget(max_output_bytes))
+        return _format_command_result(result)
+
+
+def _format_command_result(result: CommandResult) -> str:
     try:
         duration = result.get("duration", 0)
 
@@ -305,6 +402,48 @@ async def shutdown_gracefully(timeout: int = 30) -> None:
         logger.info("Graceful shutdown: no active commands")
 
 
+async def shutdown_workers_gracefully(directory: str, timeout: int = 30) -> None:
+    """
+    Wait for container commands left running by exited worker processes.
+
+    Args:
+        directory: Shared limiter directory used by the workers
+        timeout: Maximum seconds to wait before killing remaining commands
+
+    Worker processes record the PID of each command they run in the shared
+    limiter, so the supervisor can account for them after the workers exit.
+    Only PIDs that are still the recorded `container` commands are waited for
+    and killed; a PID reused by another process is left alone.
+    """
+    semaphore = SharedSemaphore(directory, MAX_CONCURRENT_COMMANDS)
+    recorded = dict(semaphore.recorded_pids())
+    pids = [pid for pid, recorded_at in recorded.items() if is_recorded_process(pid, recorded_at)]
+    if not pids:
+        logger.info("Graceful shutdown: no commands left by workers")
+        return
+
+    logger.info(
+        f"Graceful shutdown: waiting for {len(pids)} commands left by workers "
+        f"(timeout: {timeout}s)"
+    )
+    deadline = time.monotonic() + timeout
+    while pids and time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        pids = [pid for pid in pids if pid_alive(pid)]
+
+    for pid in pids:
+        # The PID may have been reused while waiting
+        if not is_recorded_process(pid, recorded[pid]):
+            continue
+        logger.warning(f"Graceful shutdown timeout: killing command PID {pid}")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except Exception as e:
+            logger.error(f"Error killing process during shutdown: {e}")
+
+
 def get_command_stats() -> Dict[str, Any]:
     """
     Get statistics about command execution.
@@ -315,7 +454,7 @@ def get_command_stats() -> Dict[str, Any]:
     return {
         "active_processes": len(_active_processes),
         "max_concurrent": MAX_CONCURRENT_COMMANDS,
-        "available_slots": _command_semaphore._value,
+        "available_slots": _available_slots(),
         "command_timeout": COMMAND_TIMEOUT,
         "max_arg_length": MAX_ARG_LENGTH,
     }
@@ -1,6 +1,7 @@
 """
 Builder start tool - Start the BuildKit builder container.
 """
+from tools._common.builder_manager import builder_manager
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -26,6 +27,8 @@ async def acms_builder_start(cpus: float = 2.0, memory: str = "2048MB") -> str:
         cmd_args.extend(["--memory", memory])
 
     result = await run_container_command(*cmd_args)
+    if result["return_code"] == 0:
+        builder_manager.mark_running(True)
     return format_command_result(result)
 
 
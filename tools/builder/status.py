@@ -1,6 +1,7 @@
 """
 Builder status tool - Show the current status of the BuildKit builder.
 """
+from tools._common.builder_manager import BUILDER_MANAGED, builder_manager
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -24,7 +25,20 @@ async def acms_builder_status(format: str = "table") -> str:
         cmd_args.extend(["--format", format])
 
     result = await run_container_command(*cmd_args)
-    return format_command_result(result)
+    # Only the table gets the summary, so JSON output stays parseable
+    if not BUILDER_MANAGED or format != "table":
+        return format_command_result(result)
+
+    manager = builder_manager.status()
+    next_start = manager["next_start"]
+    idle_stop = (
+        f"after {manager['idle_timeout']:g}s idle" if manager["idle_timeout"] > 0 else "disabled"
+    )
+    return format_command_result(result) + (
+        f"\n\nBuilder manager: {manager['pending_builds']} pending builds, "
+        f"idle {manager['idle_seconds']}s, auto-stop {idle_stop}, "
+        f"next start {next_start['cpus']} CPUs / {next_start['memory']}"
+    )
 
 
 def register(mcp) -> None:
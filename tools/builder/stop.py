@@ -1,6 +1,7 @@
 """
 Builder stop tool - Stop the BuildKit builder.
 """
+from tools._common.builder_manager import builder_manager
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -20,6 +21,8 @@ TOOL_METADATA = {
 async def acms_builder_stop() -> str:
     """Stop the BuildKit builder."""
     result = await run_container_command("builder", "stop")
+    if result["return_code"] == 0:
+        builder_manager.mark_running(False)
     return format_command_result(result)
 
 
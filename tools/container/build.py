@@ -1,9 +1,14 @@
 """
 Container build tool - Build an OCI image from a local build context.
 """
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 import logging
+import asyncio
+import time
 
+from tools._common.build_cache import BUILD_CACHE_ENABLED, build_cache
+from tools._common.builder_manager import BUILDER_MANAGED, builder_manager
+from tools._common.image_gc import image_usage
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -26,6 +31,118 @@ TOOL_METADATA = {
 }
 
 
+async def build_image(
+    path: str = ".",
+    tags: Optional[List[str]] = None,
+    file: Optional[str] = None,
+    build_args: Optional[List[str]] = None,
+    labels: Optional[List[str]] = None,
+    no_cache: bool = False,
+    target: Optional[str] = None,
+    arch: Optional[str] = None,
+    os: Optional[str] = None,
+    platform: Optional[str] = None,
+    cpus: float = 2.0,
+    memory: str = "2048MB",
+    output: Optional[str] = None,
+    progress: str = "auto",
+    vsock_port: int = 8088,
+    quiet: bool = False,
+) -> Dict[str, Any]:
+    """
+    Build an image unless the build cache shows it is already up to date.
+
+    Args:
+        Same as acms_container_build, with array parameters already validated
+
+    Returns:
+        Dict with "cached" (the build cache entry on a hit, else None) and
+        "result" (the CommandResult of the build, or None on a cache hit)
+    """
+    cmd_args = ["build"]
+    if tags:
+        for t in tags:
+            cmd_args.extend(["--tag", t])
+    if file:
+        cmd_args.extend(["--file", file])
+    if build_args:
+        for arg in build_args:
+            cmd_args.extend(["--build-arg", arg])
+    if labels:
+        for lbl in labels:
+            cmd_args.extend(["--label", lbl])
+    if no_cache:
+        cmd_args.append("--no-cache")
+    if target:
+        cmd_args.extend(["--target", target])
+    if arch:
+        cmd_args.extend(["--arch", arch])
+    if os:
+        cmd_args.extend(["--os", os])
+    if platform:
+        cmd_args.extend(["--platform", platform])
+    if cpus != 2.0:
+        cmd_args.extend(["--cpus", str(cpus)])
+    if memory != "2048MB":
+        cmd_args.extend(["--memory", memory])
+    if output:
+        cmd_args.extend(["--output", output])
+    if progress != "auto":
+        cmd_args.extend(["--progress", progress])
+    if vsock_port != 8088:
+        cmd_args.extend(["--vsock-port", str(vsock_port)])
+    if quiet:
+        cmd_args.append("--quiet")
+    cmd_args.append(path)
+
+    # Builds that produce tagged images can be skipped when nothing changed
+    cache_key = None
+    if BUILD_CACHE_ENABLED and tags and not no_cache and not output:
+        cache_key = await build_cache.key(
+            path,
+            file,
+            {
+                "build_args": build_args or [],
+                "labels": labels or [],
+                "target": target,
+                "arch": arch,
+                "os": os,
+                "platform": platform,
+            },
+        )
+    if cache_key:
+        entry = await build_cache.lookup(cache_key, tags)
+        if entry is not None:
+            logger.info(f"Build cache hit for {', '.join(tags)}")
+            await asyncio.to_thread(image_usage.touch, tags)
+            return {"cached": entry, "result": None}
+
+    if BUILDER_MANAGED:
+        # Explicit resources win over the manager's plan when it has to start the builder
+        async with builder_manager.session(
+            cpus=cpus if cpus != 2.0 else None, memory=memory if memory != "2048MB" else None
+        ):
+            result = await run_container_command(*cmd_args)
+    else:
+        result = await run_container_command(*cmd_args)
+    if tags and result["return_code"] == 0:
+        await asyncio.to_thread(image_usage.touch, tags)
+    if cache_key and result["return_code"] == 0:
+        await build_cache.record(cache_key, tags, path)
+    return {"cached": None, "result": result}
+
+
+def format_cache_hit(entry: Dict[str, Any], tags: List[str]) -> str:
+    """Describe a build skipped because of a build cache hit."""
+    built_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["built_at"]))
+    return (
+        f"Build skipped: inputs unchanged since the build at {built_at}\n"
+        f"Image: {', '.join(tags)}\n"
+        f"Digest: {entry.get('digest') or 'unknown'}\n"
+        "Use no_cache=true to force a rebuild."
+    )
+
+
 async def acms_container_build(
     path: str = ".",
     tag: Optional[List[str]] = None,
@@ -44,7 +161,14 @@ async def acms_container_build(
     vsock_port: int = 8088,
     quiet: bool = False,
 ) -> str:
-    """Build an OCI image from a local build context."""
+    """
+    Build an OCI image from a local build context.
+
+    When the context, Dockerfile, build args, labels, target and platform are
+    unchanged since a previous successful build whose tagged image still
+    exists, that image is returned without building. Set no_cache to always
+    build.
+    """
     try:
         # Validate array parameters
         validated_tag = (
@@ -57,44 +181,27 @@ async def acms_container_build(
             validate_array_parameter(label, "label") if label is not None else None
         )
 
-        cmd_args = ["build"]
-        if validated_tag:
-            for t in validated_tag:
-                cmd_args.extend(["--tag", t])
-        if file:
-            cmd_args.extend(["--file", file])
-        if validated_build_arg:
-            for arg in validated_build_arg:
-                cmd_args.extend(["--build-arg", arg])
-        if validated_label:
-            for lbl in validated_label:
-                cmd_args.extend(["--label", lbl])
-        if no_cache:
-            cmd_args.append("--no-cache")
-        if target:
-            cmd_args.extend(["--target", target])
-        if arch:
-            cmd_args.extend(["--arch", arch])
-        if os:
-            cmd_args.extend(["--os", os])
-        if platform:
-            cmd_args.extend(["--platform", platform])
-        if cpus != 2.0:
-            cmd_args.extend(["--cpus", str(cpus)])
-        if memory != "2048MB":
-            cmd_args.extend(["--memory", memory])
-        if output:
-            cmd_args.extend(["--output", output])
-        if progress != "auto":
-            cmd_args.extend(["--progress", progress])
-        if vsock_port != 8088:
-            cmd_args.extend(["--vsock-port", str(vsock_port)])
-        if quiet:
-            cmd_args.append("--quiet")
-        cmd_args.append(path)
-
-        result = await run_container_command(*cmd_args)
-        return format_command_result(result)
+        build = await build_image(
+            path=path,
+            tags=validated_tag,
+            file=file,
+            build_args=validated_build_arg,
+            labels=validated_label,
+            no_cache=no_cache,
+            target=target,
+            arch=arch,
+            os=os,
+            platform=platform,
+            cpus=cpus,
+            memory=memory,
+            output=output,
+            progress=progress,
+            vsock_port=vsock_port,
+            quiet=quiet,
+        )
+        if build["cached"] is not None:
+            return format_cache_hit(build["cached"], validated_tag)
+        return format_command_result(build["result"])
     except Exception as e:
         logger.error(f"Failed to build container: {e}", exc_info=True)
         raise
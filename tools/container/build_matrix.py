@@ -0,0 +1,245 @@
+"""
+Container build matrix tool - Build platform and target variants of an image in parallel.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import asyncio
+import logging
+import math
+import string
+import time
+
+from fastmcp import Context
+
+from tools._common.builder_manager import BUILDER_MANAGED, builder_manager
+from tools._common.utils import parse_size, validate_array_parameter
+from tools.container.build import build_image
+
+logger = logging.getLogger("ACMS")
+
+TOOL_METADATA = {
+    "name": "acms_container_build_matrix",
+    "category": "container",
+    "description": "Build several platform and target variants of an image in parallel",
+    "annotations": {
+        "readOnlyHint": False,
+        "destructiveHint": False,
+        "idempotentHint": False,
+        "openWorldHint": False,
+    },
+    "keywords": ["build", "matrix", "multi-arch", "platform", "target", "parallel", "image"],
+}
+
+# Builder resources the container CLI starts a builder with by default
+DEFAULT_BUILDER_CPUS = 2.0
+DEFAULT_BUILDER_MEMORY = "2048MB"
+
+# Placeholders a tag template may use
+TAG_FIELDS = ("platform", "os", "arch", "target")
+
+
+def _builder_budget(cpus: Optional[float], memory: Optional[str]) -> Tuple[float, str]:
+    """
+    Return the builder cpus and memory the variants are fitted into.
+
+    Values given by the caller win. Otherwise the builder manager's view is
+    used: the resources it started the running builder with, or those it will
+    start the builder with. A builder started outside ACMS is assumed to have
+    the container CLI defaults.
+    """
+    known = None
+    if BUILDER_MANAGED:
+        if builder_manager.resources is not None:
+            known = builder_manager.resources
+        elif not builder_manager.running:
+            known = (float(builder_manager.cpus), builder_manager.memory)
+    budget_cpus, budget_memory = known or (DEFAULT_BUILDER_CPUS, DEFAULT_BUILDER_MEMORY)
+    return (
+        cpus if cpus is not None else budget_cpus,
+        memory if memory is not None else budget_memory,
+    )
+
+
+def _validate_tag_template(template: str) -> None:
+    """
+    Check that a tag template only uses the known placeholders.
+
+    Raises:
+        ValueError: If the template has an unknown placeholder or unbalanced braces
+    """
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template)]
+    except ValueError as e:
+        raise ValueError(f"Invalid tag template '{template}': {e}")
+    for field in fields:
+        if field is not None and field not in TAG_FIELDS:
+            raise ValueError(
+                f"Unknown placeholder '{{{field}}}' in tag template '{template}'; "
+                f"expected {', '.join('{' + f + '}' for f in TAG_FIELDS)}"
+            )
+
+
+def _render_tag(template: str, platform: Optional[str], target: Optional[str]) -> str:
+    os_name, _, arch = (platform or "").partition("/")
+    return template.format(
+        platform=(platform or "default").replace("/", "-"),
+        os=os_name or "default",
+        arch=arch.split("/")[0] if arch else "default",
+        target=target or "default",
+    )
+
+
+async def acms_container_build_matrix(
+    path: str = ".",
+    platforms: Optional[List[str]] = None,
+    targets: Optional[List[str]] = None,
+    tag: Optional[List[str]] = None,
+    file: Optional[str] = None,
+    build_arg: Optional[List[str]] = None,
+    label: Optional[List[str]] = None,
+    no_cache: bool = False,
+    cpus: Optional[float] = None,
+    memory: Optional[str] = None,
+    variant_cpus: float = 1.0,
+    variant_memory: str = "1024MB",
+    max_parallel: Optional[int] = None,
+    ctx: Optional[Context] = None,
+) -> str:
+    """
+    Build every combination of platforms and targets concurrently.
+
+    Tags are templates rendered per variant with {platform} (e.g. linux-arm64),
+    {os}, {arch} and {target}, e.g. "myapp:{target}-{arch}". Variants run in
+    parallel up to the number that fit in the builder's cpus and memory at
+    variant_cpus and variant_memory each, capped by max_parallel.
+
+    cpus and memory size the builder if it has to be started. When omitted,
+    the budget is what the builder manager started the builder with or will
+    start it with; a builder started outside ACMS is assumed to have 2 CPUs
+    and 2048MB, so pass its actual cpus and memory in that case.
+
+    Raises:
+        ValueError: If any parameter validation fails or tags would collide
+    """
+    validated_platforms = (
+        validate_array_parameter(platforms, "platforms") if platforms is not None else None
+    )
+    validated_targets = (
+        validate_array_parameter(targets, "targets") if targets is not None else None
+    )
+    validated_tag = validate_array_parameter(tag, "tag") if tag is not None else None
+    for template in validated_tag or []:
+        _validate_tag_template(template)
+    validated_build_arg = (
+        validate_array_parameter(build_arg, "build_arg") if build_arg is not None else None
+    )
+    validated_label = validate_array_parameter(label, "label") if label is not None else None
+
+    variants = list(
+        itertools.product(validated_platforms or [None], validated_targets or [None])
+    )
+    variant_tags = [
+        [_render_tag(t, platform, target) for t in validated_tag or []]
+        for platform, target in variants
+    ]
+    all_tags = [t for tags in variant_tags for t in tags]
+    if len(all_tags) != len(set(all_tags)):
+        raise ValueError(
+            "Tags would collide between variants; include {platform}, {arch} or {target} "
+            "in the tag templates"
+        )
+
+    if variant_cpus <= 0:
+        raise ValueError("variant_cpus must be positive")
+    budget_cpus, budget_memory = _builder_budget(cpus, memory)
+    by_cpu = math.floor(budget_cpus / variant_cpus)
+    by_memory = parse_size(budget_memory) // parse_size(variant_memory)
+    parallel = max(1, min(by_cpu, by_memory, len(variants)))
+    if max_parallel is not None:
+        parallel = max(1, min(parallel, max_parallel))
+
+    logger.info(
+        f"Matrix build: {len(variants)} variants, {parallel} in parallel "
+        f"(builder {budget_cpus:g} CPUs / {budget_memory}, "
+        f"{variant_cpus:g} CPUs / {variant_memory} each)"
+    )
+
+    semaphore = asyncio.Semaphore(parallel)
+    completed = 0
+
+    async def build_variant(index: int) -> Dict[str, Any]:
+        nonlocal completed
+        platform, target = variants[index]
+        name = f"{platform or 'default'}/{target or 'default'}"
+        row: Dict[str, Any] = {"variant": name, "tags": variant_tags[index], "detail": ""}
+
+        async with semaphore:
+            if ctx is not None:
+                await ctx.info(f"[{name}] building")
+            start = time.monotonic()
+            try:
+                build = await build_image(
+                    path=path,
+                    tags=variant_tags[index],
+                    file=file,
+                    build_args=validated_build_arg,
+                    labels=validated_label,
+                    no_cache=no_cache,
+                    target=target,
+                    platform=platform,
+                    # The defaults leave sizing a builder start to the builder manager
+                    cpus=cpus if cpus is not None else DEFAULT_BUILDER_CPUS,
+                    memory=memory if memory is not None else DEFAULT_BUILDER_MEMORY,
+                )
+                if build["cached"] is not None:
+                    row["status"] = "cached"
+                elif build["result"]["return_code"] == 0:
+                    row["status"] = "built"
+                else:
+                    row["status"] = f"failed ({build['result']['return_code']})"
+                    stderr = build["result"]["stderr"].strip().splitlines()
+                    row["detail"] = stderr[-1] if stderr else ""
+            except Exception as e:
+                logger.error(f"Matrix variant {name} failed: {e}")
+                row["status"] = "error"
+                row["detail"] = str(e)
+            row["duration"] = time.monotonic() - start
+
+        completed += 1
+        if ctx is not None:
+            await ctx.info(f"[{name}] {row['status']} in {row['duration']:.1f}s")
+            await ctx.report_progress(completed, len(variants), f"{name}: {row['status']}")
+        return row
+
+    start = time.monotonic()
+    rows = await asyncio.gather(*(build_variant(i) for i in range(len(variants))))
+    wall = time.monotonic() - start
+
+    ok = sum(1 for row in rows if row["status"] in ("built", "cached"))
+    lines = [
+        f"Matrix build: {ok}/{len(rows)} variants succeeded, {parallel} in parallel",
+        f"Wall time: {wall:.1f}s (sum of variant times: {sum(r['duration'] for r in rows):.1f}s)",
+        "",
+    ]
+    width = max(len("VARIANT"), *(len(r["variant"]) for r in rows))
+    lines.append(f"{'VARIANT':<{width}}  {'STATUS':<12}  {'DURATION':>8}  TAGS")
+    for row in rows:
+        lines.append(
+            f"{row['variant']:<{width}}  {row['status']:<12}  {row['duration']:>7.1f}s  "
+            f"{', '.join(row['tags']) or '-'}"
+        )
+    failures = [row for row in rows if row["detail"]]
+    if failures:
+        lines.append("")
+        lines.append("Failures:")
+        for row in failures:
+            lines.append(f"  {row['variant']}: {row['detail']}")
+    return "\n".join(lines)
+
+
+def register(mcp) -> None:
+    """Register this tool with the MCP server."""
+    mcp.tool(
+        description=TOOL_METADATA["description"],
+        annotations=TOOL_METADATA["annotations"],
+    )(acms_container_build_matrix)
@@ -3,7 +3,9 @@ Container create tool - Create a new container from an image without starting it
 """
 from typing import Optional, List
 import logging
+import asyncio
 
+from tools._common.image_gc import image_usage
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -96,6 +98,8 @@ async def acms_container_create(
             cmd_args.extend(validated_command)
 
         result = await run_container_command(*cmd_args)
+        if result["return_code"] == 0:
+            await asyncio.to_thread(image_usage.touch, [image])
         return format_command_result(result)
     except Exception as e:
         logger.error(f"Failed to create container: {e}", exc_info=True)
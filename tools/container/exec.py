@@ -5,6 +5,7 @@ from typing import Optional, List
 import shlex
 import logging
 
+from tools._common.output_budget import current_budget
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -64,7 +65,7 @@ async def acms_container_exec(
             )
             cmd_args.append(command)
 
-        result = await run_container_command(*cmd_args)
+        result = await run_container_command(*cmd_args, max_output_bytes=current_budget())
         return format_command_result(result)
     except Exception as e:
         logger.error(f"Failed to execute command in container: {e}", exc_info=True)
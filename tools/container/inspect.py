@@ -1,6 +1,9 @@
 """
 Container inspect tool - Display detailed container information.
 """
+from typing import List, Optional
+
+from tools._common.projection import EntryFilter, inspect_json, parse_fields
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -17,8 +20,21 @@ TOOL_METADATA = {
 }
 
 
-async def acms_container_inspect(container: str) -> str:
-    """Display detailed container information in JSON."""
+async def acms_container_inspect(
+    container: str, filter: Optional[List[str]] = None, fields: Optional[List[str]] = None
+) -> str:
+    """
+    Display detailed container information in JSON.
+
+    Pass filter (state=, name=, image=, label= expressions) or fields (id,
+    state, image, labels or dotted paths) to get filtered, projected JSON.
+    """
+    entry_filter = EntryFilter.parse(filter)
+    selected_fields = parse_fields(fields)
+    if entry_filter or selected_fields:
+        cmd_args = ["inspect", container]
+        return await inspect_json("container", cmd_args, entry_filter, selected_fields)
+
     result = await run_container_command("inspect", container)
     return format_command_result(result)
 
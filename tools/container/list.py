@@ -1,6 +1,13 @@
 """
 Container list tool - List containers with formatting options.
 """
+from typing import Any, Dict, List, Optional, Union
+import json
+
+from tools._common.columnar import validate_encoding
+from tools._common.deltas import list_delta
+from tools._common.pagination import list_json
+from tools._common.projection import EntryFilter, parse_fields
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -18,8 +25,16 @@ TOOL_METADATA = {
 
 
 async def acms_container_list(
-    all: bool = False, quiet: bool = False, format: str = "table"
-) -> str:
+    all: bool = False,
+    quiet: bool = False,
+    format: str = "table",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    filter: Optional[List[str]] = None,
+    fields: Optional[List[str]] = None,
+    encoding: str = "records",
+    since: Optional[str] = None,
+) -> Union[str, Dict[str, Any]]:
     """
     List containers with formatting options.
 
@@ -27,10 +42,36 @@ async def acms_container_list(
         all: Show all containers (default shows only running)
         quiet: Only display container IDs
         format: Output format (table, json, or template)
+        limit: Return a JSON page of at most this many containers, with a next_cursor
+        cursor: next_cursor from the previous page; pages come from the first call's snapshot
+        filter: Return JSON of containers matching state=, name=, image= (globs) and
+            label= (label selector) expressions
+        fields: Return JSON with only these fields (id, state, image, labels or dotted paths)
+        encoding: records, or columnar for a header row of columns, row arrays and
+            dictionaries of repeated strings
+        since: Version token from a previous versioned response ("" to start polling);
+            returns only containers added, changed or removed since, or not_modified
 
     Returns:
         Formatted container list output
     """
+    entry_filter = EntryFilter.parse(filter)
+    selected_fields = parse_fields(fields)
+    columnar = validate_encoding(encoding) == "columnar"
+    if since is not None:
+        if limit is not None or cursor or columnar:
+            raise ValueError("since cannot be combined with limit, cursor or columnar encoding")
+        cmd_args = ["list"] + (["--all"] if all else []) + ["--format", "json"]
+        scope = json.dumps(["acms_container_list", all, quiet, filter, fields])
+        return await list_delta(
+            "container", cmd_args, since, scope, entry_filter, selected_fields, quiet
+        )
+    if limit is not None or cursor or entry_filter or selected_fields or columnar:
+        cmd_args = ["list"] + (["--all"] if all else []) + ["--format", "json"]
+        return await list_json(
+            "container", cmd_args, limit, cursor, quiet, entry_filter, selected_fields, encoding
+        )
+
     cmd_args = ["list"]
     if all:
         cmd_args.append("--all")
@@ -45,7 +86,9 @@ async def acms_container_list(
 
 def register(mcp) -> None:
     """Register this tool with the MCP server."""
+    # Text results are sent once, as text; columnar tables also as structured content
     mcp.tool(
         description=TOOL_METADATA["description"],
         annotations=TOOL_METADATA["annotations"],
+        output_schema=None,
     )(acms_container_list)
@@ -3,7 +3,9 @@ Container run tool - Run a command in a new container.
 """
 from typing import Optional, List
 import logging
+import asyncio
 
+from tools._common.image_gc import image_usage
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -200,6 +202,8 @@ async def acms_container_run(
         cmd_args.extend(validated_command)
 
     result = await run_container_command(*cmd_args)
+    if result["return_code"] == 0:
+        await asyncio.to_thread(image_usage.touch, [image])
     return format_command_result(result)
 
 
@@ -1,9 +1,12 @@
 """
 Container stats tool - Display real-time resource consumption metrics.
 """
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Union
 import logging
 
+from tools._common.columnar import encode_output, validate_encoding
+from tools._common.deltas import list_delta
+from tools._common.resources import run_json_command
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -30,7 +33,9 @@ async def acms_container_stats(
     containers: Optional[List[str]] = None,
     format: str = "table",
     no_stream: bool = False,
-) -> str:
+    encoding: str = "records",
+    since: Optional[str] = None,
+) -> Union[str, Dict[str, Any]]:
     """
     Display real-time resource consumption metrics.
 
@@ -38,6 +43,10 @@ async def acms_container_stats(
         containers: Optional list of container IDs (all running if omitted)
         format: Output format (json|table; default: table)
         no_stream: Single snapshot instead of continuous update
+        encoding: records, or columnar for one JSON snapshot as a header row of columns,
+            row arrays and dictionaries of repeated strings
+        since: Version token from a previous versioned response ("" to start polling);
+            returns only the containers whose stats were added, changed or removed since
 
     Returns:
         Resource usage statistics (CPU, memory, I/O, processes)
@@ -50,6 +59,17 @@ async def acms_container_stats(
             else None
         )
 
+        columnar = validate_encoding(encoding) == "columnar"
+        if since is not None:
+            if columnar:
+                raise ValueError("since cannot be combined with columnar encoding")
+            cmd_args = ["stats", "--format", "json", "--no-stream"] + (validated_containers or [])
+            return await list_delta("container", cmd_args, since, " ".join(cmd_args))
+
+        if columnar:
+            cmd_args = ["stats", "--format", "json", "--no-stream"] + (validated_containers or [])
+            return encode_output(await run_json_command(*cmd_args) or [], encoding)
+
         cmd_args = ["stats"]
 
         if format != "table":
@@ -71,7 +91,9 @@ async def acms_container_stats(
 
 def register(mcp) -> None:
     """Register this tool with the MCP server."""
+    # Text results are sent once, as text; columnar tables also as structured content
     mcp.tool(
         description=TOOL_METADATA["description"],
         annotations=TOOL_METADATA["annotations"],
+        output_schema=None,
     )(acms_container_stats)
@@ -0,0 +1,100 @@
+"""
+Image GC tool - Remove least recently used images to fit a disk budget.
+"""
+from typing import Any, Dict, List, Optional
+import datetime
+
+from tools._common.image_gc import execute_gc, plan_gc
+from tools._common.utils import format_command_result, parse_size, validate_array_parameter
+
+TOOL_METADATA = {
+    "name": "acms_image_gc",
+    "category": "image",
+    "description": "Remove least recently used images until image storage fits a disk budget",
+    "annotations": {
+        "readOnlyHint": False,
+        "destructiveHint": True,
+        "idempotentHint": True,
+        "openWorldHint": False,
+    },
+    "keywords": ["gc", "garbage", "cleanup", "lru", "disk", "budget", "evict", "images"],
+}
+
+
+def _format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return "unknown"
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _format_plan(plan: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"Image storage: {_format_bytes(plan['total'])}, "
+        f"budget {_format_bytes(plan['budget'])}",
+    ]
+    if not plan["evict"]:
+        lines.append("Within budget, nothing to remove")
+        return lines
+
+    lines.append(f"Least recently used images to remove ({len(plan['evict'])}):")
+    for entry in plan["evict"]:
+        last_used = (
+            datetime.datetime.fromtimestamp(entry["last_used"]).isoformat(timespec="seconds")
+            if entry["last_used"]
+            else "never seen in use"
+        )
+        lines.append(f"  {entry['reference']}  {_format_bytes(entry['size'])}  {last_used}")
+    lines.append(f"Estimated storage afterwards: {_format_bytes(plan['estimated_total'])}")
+    if plan["over_budget"]:
+        lines.append(f"Still over budget: {len(plan['in_use'])} images are used by containers")
+    return lines
+
+
+async def acms_image_gc(
+    budget: str, execute: bool = False, keep: Optional[List[str]] = None
+) -> str:
+    """
+    Plan or run least-recently-used image eviction under a disk budget.
+
+    Images used by any container, running or not, and those listed in keep
+    are never removed. Last use is tracked from acms_container_run,
+    acms_container_create and acms_container_build. Without execute, only
+    the plan is reported.
+
+    Args:
+        budget: Image storage to stay under, e.g. 20G or 512MB
+        execute: Remove the planned images instead of reporting them
+        keep: Image references never to remove
+
+    Raises:
+        ValueError: If any parameter validation fails
+    """
+    budget_bytes = parse_size(budget)
+    validated_keep = validate_array_parameter(keep, "keep") if keep is not None else None
+
+    plan = await plan_gc(budget_bytes, validated_keep)
+    lines = _format_plan(plan)
+    if not execute:
+        if plan["evict"]:
+            lines.append("Dry run: pass execute=true to remove these images")
+        return "\n".join(lines)
+
+    outcome = await execute_gc(plan)
+    if outcome["result"] is not None:
+        lines.append("")
+        lines.append(format_command_result(outcome["result"]))
+        lines.append(f"Image storage now: {_format_bytes(outcome['total'])}")
+    return "\n".join(lines)
+
+
+def register(mcp) -> None:
+    """Register this tool with the MCP server."""
+    mcp.tool(
+        description=TOOL_METADATA["description"],
+        annotations=TOOL_METADATA["annotations"],
+    )(acms_image_gc)
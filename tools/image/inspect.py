@@ -1,6 +1,9 @@
 """
 Image inspect tool - Show detailed information for images.
 """
+from typing import List, Optional
+
+from tools._common.projection import EntryFilter, inspect_json, parse_fields
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -17,8 +20,21 @@ TOOL_METADATA = {
 }
 
 
-async def acms_image_inspect(image: str) -> str:
-    """Show detailed information for one or more images in JSON."""
+async def acms_image_inspect(
+    image: str, filter: Optional[List[str]] = None, fields: Optional[List[str]] = None
+) -> str:
+    """
+    Show detailed information for one or more images in JSON.
+
+    Pass filter (state=, name=, image=, label= expressions) or fields (id,
+    state, image, labels or dotted paths) to get filtered, projected JSON.
+    """
+    entry_filter = EntryFilter.parse(filter)
+    selected_fields = parse_fields(fields)
+    if entry_filter or selected_fields:
+        cmd_args = ["image", "inspect", image]
+        return await inspect_json("image", cmd_args, entry_filter, selected_fields)
+
     result = await run_container_command("image", "inspect", image)
     return format_command_result(result)
 
@@ -2,7 +2,9 @@
 Image load tool - Load images from a tar archive.
 """
 from typing import Optional
+import os
 
+from tools._common.image_archive import is_compressed_archive, load_images
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -20,7 +22,23 @@ TOOL_METADATA = {
 
 
 async def acms_image_load(input: Optional[str] = None) -> str:
-    """Load images from a tar archive."""
+    """
+    Load images from a tar archive.
+
+    Compressed archives written by acms_image_save are detected, verified
+    and decompressed before loading.
+
+    Raises:
+        ValueError: If a compressed archive is corrupt
+    """
+    path = os.path.expanduser(input) if input else None
+    if path and os.path.isfile(path) and is_compressed_archive(path):
+        summary = await load_images(path)
+        return (
+            f"Verified {summary['blobs_verified']} blobs ({summary['bytes']} bytes)\n"
+            + format_command_result(summary["result"])
+        )
+
     cmd_args = ["image", "load"]
     if input:
         cmd_args.extend(["--input", input])
@@ -3,6 +3,7 @@ Image pull tool - Pull an image from a registry.
 """
 from typing import Optional
 
+from tools._common.output_budget import current_budget
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -35,7 +36,7 @@ async def acms_image_pull(
         cmd_args.append("--disable-progress-updates")
     cmd_args.append(reference)
 
-    result = await run_container_command(*cmd_args)
+    result = await run_container_command(*cmd_args, max_output_bytes=current_budget())
     return format_command_result(result)
 
 
@@ -1,9 +1,14 @@
 """
 Image save tool - Save an image to a tar archive.
 """
-from typing import Optional
+from typing import List, Optional
 
-from tools._common.utils import run_container_command, format_command_result
+from tools._common.image_archive import save_images
+from tools._common.utils import (
+    run_container_command,
+    format_command_result,
+    validate_array_parameter,
+)
 
 TOOL_METADATA = {
     "name": "acms_image_save",
@@ -15,20 +20,54 @@ TOOL_METADATA = {
         "idempotentHint": True,
         "openWorldHint": False,
     },
-    "keywords": ["save", "export", "archive", "tar", "image", "backup"],
+    "keywords": ["save", "export", "archive", "tar", "image", "backup", "zstd", "compress"],
 }
 
 
 async def acms_image_save(
-    reference: str, output: Optional[str] = None, platform: Optional[str] = None
+    reference: str,
+    output: Optional[str] = None,
+    platform: Optional[str] = None,
+    references: Optional[List[str]] = None,
+    compress: bool = False,
+    compression_level: int = 3,
 ) -> str:
-    """Save an image to a tar archive."""
+    """
+    Save an image to a tar archive.
+
+    With compress, the images are written to output as a zstd-compressed,
+    checksummed archive with layers shared between references stored once.
+    acms_image_load reads it back.
+
+    Raises:
+        ValueError: If any parameter validation fails
+    """
+    all_references = [reference]
+    if references is not None:
+        all_references.extend(validate_array_parameter(references, "references"))
+
+    if compress:
+        if not output:
+            raise ValueError("output is required for compressed archives")
+        if not 1 <= compression_level <= 22:
+            raise ValueError("compression_level must be between 1 and 22")
+        summary = await save_images(all_references, output, platform, compression_level)
+        if "error" in summary:
+            return format_command_result(summary["error"])
+        ratio = summary["bytes_out"] / summary["bytes_in"] if summary["bytes_in"] else 0
+        return (
+            f"Saved {len(all_references)} image(s) to {output}\n"
+            f"Blobs: {summary['blobs']} ({summary['duplicate_bytes']} duplicate bytes skipped)\n"
+            f"Size: {summary['bytes_in']} bytes -> {summary['bytes_out']} bytes "
+            f"({ratio:.1%}) in {summary['frames']} checksummed frames"
+        )
+
     cmd_args = ["image", "save"]
     if platform:
         cmd_args.extend(["--platform", platform])
     if output:
         cmd_args.extend(["--output", output])
-    cmd_args.append(reference)
+    cmd_args.extend(all_references)
 
     result = await run_container_command(*cmd_args)
     return format_command_result(result)
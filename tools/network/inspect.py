@@ -1,6 +1,9 @@
 """
 Network inspect tool - Show detailed information about networks.
 """
+from typing import List, Optional
+
+from tools._common.projection import EntryFilter, inspect_json, parse_fields
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -17,8 +20,21 @@ TOOL_METADATA = {
 }
 
 
-async def acms_network_inspect(name: str) -> str:
-    """Show detailed information about networks."""
+async def acms_network_inspect(
+    name: str, filter: Optional[List[str]] = None, fields: Optional[List[str]] = None
+) -> str:
+    """
+    Show detailed information about networks.
+
+    Pass filter (state=, name=, image=, label= expressions) or fields (id,
+    state, image, labels or dotted paths) to get filtered, projected JSON.
+    """
+    entry_filter = EntryFilter.parse(filter)
+    selected_fields = parse_fields(fields)
+    if entry_filter or selected_fields:
+        cmd_args = ["network", "inspect", name]
+        return await inspect_json("network", cmd_args, entry_filter, selected_fields)
+
     result = await run_container_command("network", "inspect", name)
     return format_command_result(result)
 
@@ -1,6 +1,11 @@
 """
 Network list tool - List user-defined networks.
 """
+from typing import Any, Dict, List, Optional, Union
+
+from tools._common.columnar import validate_encoding
+from tools._common.pagination import list_json
+from tools._common.projection import EntryFilter, parse_fields
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -17,8 +22,34 @@ TOOL_METADATA = {
 }
 
 
-async def acms_network_list(quiet: bool = False, format: str = "table") -> str:
-    """List user-defined networks."""
+async def acms_network_list(
+    quiet: bool = False,
+    format: str = "table",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    filter: Optional[List[str]] = None,
+    fields: Optional[List[str]] = None,
+    encoding: str = "records",
+) -> Union[str, Dict[str, Any]]:
+    """
+    List user-defined networks.
+
+    Pass limit or cursor to get a JSON page of the listing with a
+    next_cursor; later pages are sliced from the first call's snapshot.
+    Pass filter (state=, name=, image=, label= expressions) or fields (id,
+    state, image, labels or dotted paths) to get filtered, projected JSON.
+    Pass encoding="columnar" for a header row of columns, row arrays and
+    dictionaries of repeated strings instead of one object per record.
+    """
+    entry_filter = EntryFilter.parse(filter)
+    selected_fields = parse_fields(fields)
+    columnar = validate_encoding(encoding) == "columnar"
+    if limit is not None or cursor or entry_filter or selected_fields or columnar:
+        cmd_args = ["network", "ls", "--format", "json"]
+        return await list_json(
+            "network", cmd_args, limit, cursor, quiet, entry_filter, selected_fields, encoding
+        )
+
     cmd_args = ["network", "ls"]
     if quiet:
         cmd_args.append("--quiet")
@@ -31,7 +62,9 @@ async def acms_network_list(quiet: bool = False, format: str = "table") -> str:
 
 def register(mcp) -> None:
     """Register this tool with the MCP server."""
+    # Text results are sent once, as text; columnar tables also as structured content
     mcp.tool(
         description=TOOL_METADATA["description"],
         annotations=TOOL_METADATA["annotations"],
+        output_schema=None,
     )(acms_network_list)
@@ -0,0 +1,79 @@
+"""
+Apply tool - Converge containers, networks and volumes to a declarative spec.
+"""
+from typing import Any, Dict, Union
+import json
+
+from tools._common.converge import execute_plan, plan_apply
+
+TOOL_METADATA = {
+    "name": "acms_apply",
+    "category": "system",
+    "description": (
+        "Converge a project's networks, volumes and containers to a declarative spec, "
+        "running only the create, start, stop and delete operations needed"
+    ),
+    "annotations": {
+        "readOnlyHint": False,
+        "destructiveHint": True,
+        "idempotentHint": True,
+        "openWorldHint": False,
+    },
+    "keywords": ["apply", "declarative", "spec", "compose", "converge", "environment", "deploy"],
+}
+
+
+async def acms_apply(
+    spec: Union[Dict[str, Any], str], project: str = "default", dry_run: bool = False
+) -> str:
+    """
+    Converge a project to a compose-like spec.
+
+    The spec has "networks", "volumes" and "containers" sections keyed by
+    name. Containers take image, command, env, ports, volumes, mounts,
+    network(s), cpus, memory, labels, user, cwd, entrypoint, depends_on and
+    state (running or stopped). A container whose configuration changed is
+    recreated; project resources missing from the spec are removed.
+    Re-applying an unchanged spec lists current state once and changes
+    nothing.
+
+    Args:
+        spec: The desired state, as an object or a JSON string
+        project: Project name; only resources labelled with it are removed
+        dry_run: Report the plan without running it
+
+    Raises:
+        ValueError: If the spec is invalid or a container name is taken outside the project
+    """
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"spec is not valid JSON: {e}")
+    if not project or not project.strip():
+        raise ValueError("project cannot be empty")
+
+    operations = await plan_apply(project, spec)
+    if not operations:
+        return f"Project '{project}' is up to date"
+
+    if dry_run:
+        lines = [f"Plan for project '{project}' ({len(operations)} operations):"]
+        lines += [f"  {op.description}" for op in operations]
+        return "\n".join(lines)
+
+    await execute_plan(operations)
+    ok = sum(1 for op in operations if op.status == "ok")
+    lines = [f"Applied project '{project}': {ok} of {len(operations)} operations succeeded"]
+    for op in operations:
+        detail = f" ({op.detail})" if op.detail else ""
+        lines.append(f"  {op.status:<8} {op.description}{detail}")
+    return "\n".join(lines)
+
+
+def register(mcp) -> None:
+    """Register this tool with the MCP server."""
+    mcp.tool(
+        description=TOOL_METADATA["description"],
+        annotations=TOOL_METADATA["annotations"],
+    )(acms_apply)
@@ -1,6 +1,7 @@
 """
 System logs tool - Display logs from the container services.
 """
+from tools._common.output_budget import current_budget
 from tools._common.utils import run_container_command, format_command_result
 
 TOOL_METADATA = {
@@ -25,7 +26,7 @@ async def acms_system_logs(last: str = "5m", follow: bool = False) -> str:
     if follow:
         cmd_args.append("--follow")
 
-    result = await run_container_command(*cmd_args)
+    result = await run_container_command(*cmd_args, max_output_bytes=current_budget())
     return format_command_result(result)
 
 
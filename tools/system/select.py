@@ -0,0 +1,140 @@
+"""
+System select tool - Find, stop or delete resources across kinds by label selector.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from tools._common.resources import KINDS, list_all
+from tools._common.selectors import LabelSelector
+from tools._common.utils import run_container_command, validate_array_parameter
+
+logger = logging.getLogger("ACMS")
+
+TOOL_METADATA = {
+    "name": "acms_system_select",
+    "category": "system",
+    "description": (
+        "Find containers, images, volumes and networks matching a label selector, "
+        "and optionally stop or delete them all in one call"
+    ),
+    "annotations": {
+        "readOnlyHint": False,
+        "destructiveHint": True,
+        "idempotentHint": True,
+        "openWorldHint": False,
+    },
+    "keywords": ["label", "selector", "bulk", "teardown", "cleanup", "delete", "stop", "find"],
+}
+
+ACTIONS = ("list", "stop", "delete")
+
+DELETE_COMMANDS = {
+    "container": ("rm",),
+    "image": ("image", "rm"),
+    "volume": ("volume", "rm"),
+    "network": ("network", "rm"),
+}
+
+
+async def _act(action: str, record: Dict[str, Any], force: bool) -> Dict[str, Any]:
+    kind, rid = record["kind"], record["id"]
+    if action == "stop":
+        cmd_args = ["stop", rid]
+    else:
+        cmd_args = list(DELETE_COMMANDS[kind])
+        if kind == "container" and force:
+            cmd_args.append("--force")
+        cmd_args.append(rid)
+    try:
+        result = await run_container_command(*cmd_args)
+    except Exception as e:
+        return {"kind": kind, "id": rid, "ok": False, "detail": str(e)}
+    stderr = result["stderr"].strip().splitlines()
+    return {
+        "kind": kind,
+        "id": rid,
+        "ok": result["return_code"] == 0,
+        "detail": stderr[-1] if result["return_code"] != 0 and stderr else "",
+    }
+
+
+async def acms_system_select(
+    selector: str,
+    kinds: Optional[List[str]] = None,
+    action: str = "list",
+    force: bool = False,
+) -> str:
+    """
+    Resolve a label selector across resource kinds and act on every match.
+
+    Selectors are comma-separated requirements that must all hold:
+    key=value, key!=value, key in (a,b), key notin (a,b), key (exists) and
+    !key (does not exist). Each kind is listed once, matches are resolved on
+    the server and actions run in parallel. On delete, containers are
+    removed first so the volumes and networks they used can then be deleted.
+
+    Args:
+        selector: Label selector, e.g. "job=1234" or "env in (ci,dev),!keep"
+        kinds: Kinds to search: container, image, volume, network (default: all)
+        action: list (report matches only), stop (containers) or delete
+        force: Delete running containers too
+
+    Stop and delete need at least one =, in or exists requirement, so a
+    selector of only negative terms cannot reach every unlabelled resource.
+
+    Raises:
+        ValueError: If any parameter validation fails
+    """
+    parsed = LabelSelector.parse(selector)
+    validated_kinds = validate_array_parameter(kinds, "kinds") if kinds is not None else None
+    selected_kinds = validated_kinds or list(KINDS)
+    unknown = [k for k in selected_kinds if k not in KINDS]
+    if unknown:
+        raise ValueError(f"Unknown kinds {unknown}; expected {', '.join(KINDS)}")
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+    if action != "list" and not parsed.positive:
+        # Negative terms alone match every unlabelled resource on the host
+        raise ValueError(
+            f"Selector '{selector}' has no =, in or exists requirement; "
+            f"refusing to {action} every resource without the label"
+        )
+    if action == "stop":
+        selected_kinds = [k for k in selected_kinds if k == "container"]
+
+    listings = await list_all(selected_kinds)
+    matches = {
+        kind: [r for r in records if parsed.matches(r["labels"])]
+        for kind, records in listings.items()
+    }
+    total = sum(len(m) for m in matches.values())
+
+    lines = [f"Selector '{selector}' matched {total} resources"]
+    for kind in selected_kinds:
+        if matches[kind]:
+            lines.append(f"  {kind}: {', '.join(r['id'] for r in matches[kind])}")
+    if action == "list" or total == 0:
+        return "\n".join(lines)
+
+    logger.info(f"Bulk {action} of {total} resources matching '{selector}'")
+    outcomes = await asyncio.gather(*(_act(action, r, force) for r in matches.get("container", [])))
+    if action == "delete":
+        rest = [r for kind in selected_kinds if kind != "container" for r in matches[kind]]
+        outcomes += await asyncio.gather(*(_act(action, r, force) for r in rest))
+
+    done = [o for o in outcomes if o["ok"]]
+    failed = [o for o in outcomes if not o["ok"]]
+    verb = "Stopped" if action == "stop" else "Deleted"
+    lines.append(f"{verb} {len(done)} of {len(outcomes)}")
+    for outcome in failed:
+        lines.append(f"  failed {outcome['kind']} {outcome['id']}: {outcome['detail']}")
+    return "\n".join(lines)
+
+
+def register(mcp) -> None:
+    """Register this tool with the MCP server."""
+    mcp.tool(
+        description=TOOL_METADATA["description"],
+        annotations=TOOL_METADATA["annotations"],
+    )(acms_system_select)
@@ -1,9 +1,10 @@
 """
 Volume inspect tool - Display detailed information for volumes.
 """
-from typing import List
+from typing import List, Optional
 import logging
 
+from tools._common.projection import EntryFilter, inspect_json, parse_fields
 from tools._common.utils import (
     run_container_command,
     format_command_result,
@@ -26,8 +27,15 @@ TOOL_METADATA = {
 }
 
 
-async def acms_volume_inspect(names: List[str]) -> str:
-    """Display detailed information for volumes."""
+async def acms_volume_inspect(
+    names: List[str], filter: Optional[List[str]] = None, fields: Optional[List[str]] = None
+) -> str:
+    """
+    Display detailed information for volumes.
+
+    Pass filter (state=, name=, image=, label= expressions) or fields (id,
+    state, image, labels or dotted paths) to get filtered, projected JSON.
+    """
     try:
         # Validate names parameter
         validated_names = validate_array_parameter(names, "names")
@@ -40,6 +48,11 @@ async def acms_volume_inspect(names: List[str]) -> str:
         cmd_args = ["volume", "inspect"]
         cmd_args.extend(validated_names)
 
+        entry_filter = EntryFilter.parse(filter)
+        selected_fields = parse_fields(fields)
+        if entry_filter or selected_fields:
+            return await inspect_json("volume", cmd_args, entry_filter, selected_fields)
+
         result = await run_container_command(*cmd_args)
         return format_command_result(result)
     except Exception as e: